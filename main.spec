@@ -8,7 +8,7 @@ a = Analysis(
     ['src/h5viewer/main.py'],
     pathex=[],
     binaries=[],
-    datas=[('src/h5viewer/favicons/favicon.ico', '.')],
+    datas=[('src/h5viewer/favicons/favicon.ico', '.'), ('src/h5viewer/kernel.py', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
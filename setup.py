@@ -22,9 +22,11 @@ setuptools.setup(
         "Operating System :: OS Independent",
     ],
     python_requires='>=3.8',
-    entry_points={"console_scripts": ["h5viewer = h5viewer.main:main"]},
+    entry_points={"console_scripts": ["h5viewer = h5viewer.cli:main"]},
     install_requires=[
         "PyQt6",
         "labmate",
+        "h5py",
+        "numpy",
     ],
 )
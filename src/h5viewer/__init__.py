@@ -1,2 +1,20 @@
 # flake8: noqa
-from .main import *
+"""
+The names of the viewer are imported on first use, so the command line
+(h5viewer.cli) runs without importing PyQt.
+"""
+import importlib
+import importlib.util
+
+
+def __getattr__(name: str):
+    # Submodules are imported by the import system, e.g. by `from . import diff`
+    if name.startswith("__") or (name != "main" and importlib.util.find_spec(f"{__name__}.{name}")):
+        raise AttributeError(name)
+    viewer = importlib.import_module(f"{__name__}.main")
+
+    # Same names as `from .main import *`
+    globals().update({key: value for key, value in vars(viewer).items() if not key.startswith("_")})
+    if name not in globals():
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return globals()[name]
@@ -0,0 +1,313 @@
+"""
+Command line of the h5viewer.
+
+`h5viewer ls|cat|diff|export|collect ...` inspects the files without starting the
+window, so it can be used in scripts and on headless machines. Any other
+arguments start the viewer as before.
+This module should not depend on PyQt.
+"""
+import argparse
+import os
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import h5py
+import numpy as np
+
+try:
+    from . import diff, export, h5io
+except ImportError:  # started as a script, e.g. from the pyinstaller bundle
+    import diff  # type: ignore
+    import export  # type: ignore
+    import h5io  # type: ignore
+
+COMMANDS = ("ls", "cat", "diff", "export", "collect")
+
+# Less files than this are listed without starting the processes
+PARALLEL_MIN_FILES = 8
+
+# Number of elements written at once by export
+EXPORT_CHUNK = 2**20
+
+
+class CommandError(Exception):
+    """Error shown to the user without a traceback."""
+
+
+def expand_paths(paths: Iterable[str]) -> List[str]:
+    """Files of the paths. Folders are replaced by their `.h5` files, the last modified first."""
+    filepaths = []
+    for path in paths:
+        if os.path.isdir(path):
+            filepaths.extend(entry.path for entry in h5io.scan_folder(path))
+        else:
+            filepaths.append(path)
+    return filepaths
+
+
+# ====== ls ======
+
+
+def list_file(filepath: str, key: str = "", recursive: bool = False) -> List[str]:
+    """Lines of `ls` for one file. Runs inside a worker process if there are many files."""
+    if not recursive:
+        return [f"{name}/" if is_group else name for name, is_group in h5io.list_children(filepath, key)]
+    prefix = f"{key.strip('/')}/" if key.strip("/") else ""
+    return [
+        f"{name}/" if info.shape is None else f"{name}  {info.describe()}"
+        for name, info in sorted(diff.describe_file(filepath).items())
+        if name.startswith(prefix)
+    ]
+
+
+def _list_file(arguments) -> Tuple[List[str], bool]:
+    """Lines of `ls` for one file, and whether the file was read."""
+    filepath, key, recursive = arguments
+    try:
+        return list_file(filepath, key, recursive), True
+    except (OSError, KeyError) as error:
+        return [f"error: {error}"], False
+
+
+def run_ls(args) -> int:
+    """Exit code is 1 if any of the files couldn't be listed."""
+    filepaths = expand_paths(args.paths)
+    tasks = [(filepath, args.key, args.recursive) for filepath in filepaths]
+    results: Iterator[Tuple[List[str], bool]]
+    if args.workers == 1 or len(tasks) < PARALLEL_MIN_FILES:
+        results = map(_list_file, tasks)
+        return _print_listings(filepaths, results)
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        return _print_listings(filepaths, executor.map(_list_file, tasks, chunksize=16))
+
+
+def _print_listings(filepaths: List[str], results: Iterable[Tuple[List[str], bool]]) -> int:
+    failed = False
+    for filepath, (lines, read) in zip(filepaths, results):
+        failed = failed or not read
+        if len(filepaths) > 1:
+            print(f"{filepath}:")
+            lines = [f"  {line}" for line in lines]
+        if lines:
+            print("\n".join(lines))
+    return int(failed)
+
+
+# ====== cat ======
+
+
+def format_value(value) -> str:
+    if isinstance(value, h5io.ArrayPreview):
+        return h5io.format_preview(value)
+    if isinstance(value, np.ndarray):
+        return np.array2string(value, threshold=sys.maxsize)
+    return str(value)
+
+
+def run_cat(args) -> int:
+    try:
+        if args.all:
+            value = h5io.read_key(args.file, args.key)
+        elif args.page is not None:
+            value = h5io.read_preview(args.file, args.key, args.page)
+        else:
+            value = h5io.read_key(args.file, args.key, max_size=h5io.PREVIEW_SIZE)
+    except KeyError as error:
+        raise CommandError(f"{args.file} doesn't have the key {args.key}") from error
+    print(format_value(value))
+    return 0
+
+
+# ====== diff ======
+
+
+def format_text_difference(difference: diff.TextDifference) -> List[str]:
+    lines = []
+    for hunk in difference.hunks:
+        i1, j1 = hunk[0][1], hunk[0][3]
+        i2, j2 = hunk[-1][2], hunk[-1][4]
+        lines.append(f"@@ -{i1 + 1},{i2 - i1} +{j1 + 1},{j2 - j1} @@")
+        for tag, a1, a2, b1, b2 in hunk:
+            if tag == "equal":
+                lines.extend(f" {line}" for line in difference.lines_a[a1:a2])
+                continue
+            lines.extend(f"-{line}" for line in difference.lines_a[a1:a2])
+            lines.extend(f"+{line}" for line in difference.lines_b[b1:b2])
+    return lines
+
+
+def run_diff(args) -> int:
+    """Exit code is 0 if the files are identical, 1 otherwise, as for diff."""
+    if args.key is None:
+        # The keys of B are compared with the previous file A
+        differences = diff.compare_files(args.file_b, args.file_a, args.workers)
+        symbols = {diff.ADDED: "+", diff.REMOVED: "-", diff.CHANGED: "~"}
+        for difference in differences:
+            print(f"{symbols[difference.status]} {difference.key}  {difference.detail}")
+        return int(bool(differences))
+
+    try:
+        difference = diff.compare_keys(args.file_a, args.file_b, args.key)
+    except KeyError as error:
+        raise CommandError(f"The key {args.key} is not inside both files") from error
+    if isinstance(difference, diff.ArrayDifference):
+        print(diff.format_array_difference(difference))
+        return int(bool(difference.changed) or difference.shape_a != difference.shape_b)
+    print("\n".join(format_text_difference(difference)))
+    return int(bool(difference.hunks))
+
+
+# ====== export ======
+
+
+def export_dataset(dataset: h5py.Dataset, output: str):
+    """Write the dataset to a `.npy` or `.csv` file by chunks of rows, so it's never loaded entirely."""
+    rows = h5io.page_rows(dataset.shape, EXPORT_CHUNK) if dataset.shape else 1
+    if output.endswith(".npy"):
+        if dataset.dtype.hasobject:
+            # Variable length strings, references, ... have no fixed size inside a .npy file
+            raise CommandError(f"The dtype {dataset.dtype} can't be exported to .npy, export it to a .npz file")
+        array = np.lib.format.open_memmap(output, mode="w+", dtype=dataset.dtype, shape=dataset.shape)
+        if not dataset.shape:
+            array[()] = dataset[()]
+        for start in range(0, dataset.shape[0] if dataset.shape else 0, rows):
+            array[start : start + rows] = dataset[start : start + rows]
+        array.flush()
+        return
+    if dataset.ndim > 2 or dataset.dtype.kind not in "iufb":
+        raise CommandError("Only numeric datasets with 1 or 2 dimensions can be exported to csv")
+    fmt = "%.17g" if dataset.dtype.kind == "f" else "%d"
+    with open(output, "w", encoding="utf-8") as file:
+        for start in range(0, dataset.shape[0] if dataset.shape else 1, rows):
+            values = dataset[start : start + rows] if dataset.shape else dataset[()]
+            np.savetxt(file, np.atleast_1d(values), fmt=fmt, delimiter=",")
+
+
+def write_npz_member(archive: zipfile.ZipFile, name: str, dataset: h5py.Dataset):
+    """Write the dataset as the array `name` of the npz archive, by chunks of rows as export_dataset."""
+    with archive.open(f"{name}.npy", "w", force_zip64=True) as file:
+        if dataset.dtype.hasobject or not dataset.shape:
+            # Pickled objects (e.g. variable length strings) can't be written by parts
+            np.lib.format.write_array(file, np.asarray(dataset[()]))
+            return
+        header = {"descr": np.lib.format.dtype_to_descr(dataset.dtype), "fortran_order": False, "shape": dataset.shape}
+        np.lib.format.write_array_header_1_0(file, header)
+        rows = h5io.page_rows(dataset.shape, EXPORT_CHUNK)
+        for start in range(0, dataset.shape[0], rows):
+            file.write(np.ascontiguousarray(dataset[start : start + rows]).tobytes())
+
+
+def run_export(args) -> int:
+    output = args.output
+    if not output.endswith((".csv", ".npy", ".npz")):
+        raise CommandError("The output should be a .csv, .npy or .npz file")
+    key = args.key.strip("/")
+    with h5py.File(h5io.h5_filepath(args.file), "r") as file:
+        item = file.get(key) if key else file
+        if item is None:
+            raise CommandError(f"{args.file} doesn't have the key {args.key}")
+        if output.endswith(".npz"):
+            with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+                if isinstance(item, h5py.Dataset):
+                    write_npz_member(archive, key, item)
+                else:
+
+                    def visit(name: str, value):
+                        if isinstance(value, h5py.Dataset):
+                            write_npz_member(archive, name, value)
+
+                    item.visititems(visit)
+            return 0
+        if not isinstance(item, h5py.Dataset):
+            raise CommandError(f"{args.key} is a group, it can be exported only to a .npz file")
+        export_dataset(item, output)
+    return 0
+
+
+# ====== collect ======
+
+
+def run_collect(args) -> int:
+    filepaths = expand_paths(args.paths)
+    try:
+        result = export.export_key(args.key, filepaths, args.output, args.workers)
+    except ValueError as error:
+        raise CommandError(str(error)) from error
+    print(f"{args.output}: {result.describe()}", file=sys.stderr)
+    return 0
+
+
+# ====== Main ======
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="h5viewer", description="Inspect hdf5 files. Run without a command to open the viewer."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ls = commands.add_parser("ls", help="list the keys of files")
+    ls.add_argument("paths", nargs="+", help="files or folders (their .h5 files are listed)")
+    ls.add_argument("-k", "--key", default="", help="group to list, the root by default")
+    ls.add_argument("-r", "--recursive", action="store_true", help="list all the keys with their shape and dtype")
+    ls.add_argument("-j", "--workers", type=int, default=None, help="number of processes, all the cpus by default")
+    ls.set_defaults(run=run_ls)
+
+    cat = commands.add_parser("cat", help="print the value of a key")
+    cat.add_argument("file")
+    cat.add_argument("key", help="e.g. group/dataset")
+    cat.add_argument("-p", "--page", type=int, default=None, help="page of a big dataset, negative from the end")
+    cat.add_argument("-a", "--all", action="store_true", help="print big datasets entirely")
+    cat.set_defaults(run=run_cat)
+
+    difference = commands.add_parser("diff", help="compare two files, or one key of two files")
+    difference.add_argument("file_a")
+    difference.add_argument("file_b")
+    difference.add_argument("key", nargs="?", default=None)
+    difference.add_argument("-j", "--workers", type=int, default=None, help="number of processes to hash the datasets")
+    difference.set_defaults(run=run_diff)
+
+    export_command = commands.add_parser("export", help="write a dataset to .csv or .npy, or datasets to .npz")
+    export_command.add_argument("file")
+    export_command.add_argument("key", nargs="?", default="", help="dataset or group, the whole file by default")
+    export_command.add_argument("-o", "--output", required=True)
+    export_command.set_defaults(run=run_export)
+
+    collect = commands.add_parser("collect", help="write the key of many files into one table, one row per file")
+    collect.add_argument("key", help="e.g. fit/params or a config entry")
+    collect.add_argument("paths", nargs="+", help="files or folders (their .h5 files are read)")
+    collect.add_argument("-o", "--output", required=True, help="a .csv, .npz or .parquet (needs pyarrow) file")
+    collect.add_argument("-j", "--workers", type=int, default=None, help="number of processes, all the cpus by default")
+    collect.set_defaults(run=run_collect)
+    return parser
+
+
+def is_command(argv: List[str]) -> bool:
+    """Whether the arguments are for the command line rather than for the viewer."""
+    return bool(argv) and argv[0] in COMMANDS + ("-h", "--help")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not is_command(argv):
+        from .main import main as run_viewer  # pylint: disable=import-outside-toplevel
+
+        run_viewer()
+        return 0
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        return args.run(args)
+    except BrokenPipeError:  # the output is piped to `head` or similar
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except (CommandError, OSError, KeyError) as error:
+        parser.exit(2, f"h5viewer: error: {error}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
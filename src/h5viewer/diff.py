@@ -0,0 +1,428 @@
+"""
+Comparison of the values of two files.
+
+Text is compared line by line with the linear space Myers algorithm on
+hashed lines. Numeric datasets are compared element-wise by chunks directly
+from the files, without being converted to text.
+Whole files are compared by their structure and by checksums of the datasets
+computed in parallel processes.
+This module should not depend on PyQt.
+"""
+import hashlib
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import h5py
+import numpy as np
+
+try:
+    from . import h5io
+except ImportError:  # started as a script, e.g. from the pyinstaller bundle
+    import h5io  # type: ignore
+
+if TYPE_CHECKING:
+    from .hashindex import HashIndex
+
+# (tag, i1, i2, j1, j2) as in difflib.SequenceMatcher.get_opcodes
+Opcode = Tuple[str, int, int, int, int]
+
+CHUNK_SIZE = 2**20
+# Steps of the line diff after which the remaining lines are given as replaced
+MAX_DIFF_COST = 2 * 10**6
+MAX_CHANGED_INDICES = 20
+# Less datasets than this are hashed without starting the processes
+PARALLEL_MIN_KEYS = 64
+
+ADDED, REMOVED, CHANGED = "added", "removed", "changed"
+
+
+class TextDifference(NamedTuple):
+    lines_a: List[str]
+    lines_b: List[str]
+    hunks: List[List[Opcode]]
+
+
+class ArrayDifference(NamedTuple):
+    shape_a: Tuple[int, ...]
+    shape_b: Tuple[int, ...]
+    dtype_a: str
+    dtype_b: str
+    changed: int
+    max_deviation: Optional[float]
+    changed_indices: List[Tuple[int, ...]]
+
+
+def _hash_lines(a: Sequence[str], b: Sequence[str]) -> Tuple[List[int], List[int]]:
+    """Replace lines with integers, so the comparison of two lines is cheap."""
+    ids: Dict[str, int] = {}
+    return [ids.setdefault(line, len(ids)) for line in a], [ids.setdefault(line, len(ids)) for line in b]
+
+
+def _middle_snake(
+    a: List[int], b: List[int], a0: int, a1: int, b0: int, b1: int, budget: List[int]
+) -> Optional[Tuple[int, int, int, int]]:
+    """Return the middle snake (x, y, u, v) of the shortest edit script of a[a0:a1] and b[b0:b1].
+
+    Each step of the search is taken from `budget`. None is returned once it is spent.
+    """
+    n, m = a1 - a0, b1 - b0
+    budget[0] -= n + m
+    delta = n - m
+    odd = delta % 2 == 1
+    offset = 2 * (n + m) + 2
+    forward = [0] * (2 * offset + 1)
+    backward = [0] * (2 * offset + 1)
+    forward[offset + 1] = 0
+    backward[offset + delta + 1] = n + 1
+
+    for d in range((n + m + 1) // 2 + 1):
+        budget[0] -= 2 * d + 2
+        if budget[0] < 0:
+            return None
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[offset + k - 1] < forward[offset + k + 1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            x_start, y_start = x, y
+            while x < n and y < m and a[a0 + x] == b[b0 + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+            if odd and delta - (d - 1) <= k <= delta + (d - 1) and x >= backward[offset + k]:
+                return a0 + x_start, b0 + y_start, a0 + x, b0 + y
+
+        for k in range(-d, d + 1, 2):
+            kk = k + delta
+            if k == -d or (k != d and backward[offset + kk + 1] - 1 < backward[offset + kk - 1]):
+                x = backward[offset + kk + 1] - 1
+            else:
+                x = backward[offset + kk - 1]
+            y = x - kk
+            x_end, y_end = x, y
+            while x > 0 and y > 0 and a[a0 + x - 1] == b[b0 + y - 1]:
+                x -= 1
+                y -= 1
+            backward[offset + kk] = x
+            if not odd and -d <= kk <= d and x <= forward[offset + kk]:
+                return a0 + x, b0 + y, a0 + x_end, b0 + y_end
+
+    raise RuntimeError("Middle snake not found")  # pragma: no cover
+
+
+def myers_opcodes(a: Sequence[str], b: Sequence[str], max_cost: int = MAX_DIFF_COST) -> List[Opcode]:
+    """Opcodes transforming lines `a` into lines `b`, like difflib but in O((N+M)D) time.
+
+    The search stops after about `max_cost` steps: the parts of the texts that
+    are not matched yet are then given as a single "replace", so very different
+    texts are still compared quickly.
+    """
+    ha, hb = _hash_lines(a, b)
+    budget = [max_cost]
+    edits: List[Opcode] = []
+    stack = [(0, len(ha), 0, len(hb))]
+    while stack:
+        a0, a1, b0, b1 = stack.pop()
+        while a0 < a1 and b0 < b1 and ha[a0] == hb[b0]:
+            a0, b0 = a0 + 1, b0 + 1
+        while a0 < a1 and b0 < b1 and ha[a1 - 1] == hb[b1 - 1]:
+            a1, b1 = a1 - 1, b1 - 1
+        if a0 == a1 or b0 == b1:
+            if a0 < a1 or b0 < b1:
+                edits.append(("delete" if b0 == b1 else "insert", a0, a1, b0, b1))
+            continue
+        snake = _middle_snake(ha, hb, a0, a1, b0, b1, budget)
+        if snake is None:
+            edits.append(("replace", a0, a1, b0, b1))
+            continue
+        x, y, u, v = snake
+        if (x, y, u, v) in ((a0, b0, a0, b0), (a1, b1, a1, b1)):
+            edits.append(("replace", a0, a1, b0, b1))
+            continue
+        stack.append((u, a1, v, b1))
+        stack.append((a0, x, b0, y))
+
+    edits.sort(key=lambda edit: (edit[1], edit[3]))
+    opcodes: List[Opcode] = []
+    i = j = 0
+    for tag, i1, i2, j1, j2 in edits:
+        if i < i1 or j < j1:
+            opcodes.append(("equal", i, i1, j, j1))
+        if opcodes and opcodes[-1][0] != "equal" and opcodes[-1][2] == i1 and opcodes[-1][4] == j1:
+            _, pi1, _, pj1, _ = opcodes.pop()
+            tag, i1, j1 = "replace", pi1, pj1
+        opcodes.append((tag, i1, i2, j1, j2))
+        i, j = i2, j2
+    if i < len(ha) or j < len(hb):
+        opcodes.append(("equal", i, len(ha), j, len(hb)))
+    return opcodes
+
+
+def group_opcodes(opcodes: List[Opcode], context: int = 3) -> List[List[Opcode]]:
+    """Hunks of changes with `context` equal lines around, as difflib.get_grouped_opcodes."""
+    hunks: List[List[Opcode]] = []
+    hunk: List[Opcode] = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag != "equal":
+            hunk.append((tag, i1, i2, j1, j2))
+            continue
+        if not hunk:
+            if i2 - i1 > context:
+                i1, j1 = i2 - context, j2 - context
+            hunk.append((tag, i1, i2, j1, j2))
+            continue
+        if i2 - i1 > 2 * context:
+            hunk.append((tag, i1, i1 + context, j1, j1 + context))
+            hunks.append(hunk)
+            hunk = [(tag, i2 - context, i2, j2 - context, j2)]
+        else:
+            hunk.append((tag, i1, i2, j1, j2))
+    if hunk and any(opcode[0] != "equal" for opcode in hunk):
+        if hunk[-1][0] == "equal":
+            tag, i1, i2, j1, j2 = hunk[-1]
+            hunk[-1] = (tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context))
+        hunks.append(hunk)
+    return hunks
+
+
+def compare_text(text_a: str, text_b: str, context: int = 3) -> TextDifference:
+    lines_a, lines_b = text_a.splitlines(), text_b.splitlines()
+    return TextDifference(lines_a, lines_b, group_opcodes(myers_opcodes(lines_a, lines_b), context))
+
+
+def is_numeric(dataset: Any) -> bool:
+    return isinstance(dataset, h5py.Dataset) and bool(dataset.shape) and dataset.dtype.kind in "iufcb"
+
+
+def _compare_chunk(values_a: np.ndarray, values_b: np.ndarray) -> np.ndarray:
+    changed = values_a != values_b
+    if values_a.dtype.kind in "fc" or values_b.dtype.kind in "fc":
+        changed &= ~(np.isnan(values_a) & np.isnan(values_b))
+    return changed
+
+
+def compare_datasets(dataset_a: h5py.Dataset, dataset_b: h5py.Dataset, chunk_size: int = CHUNK_SIZE) -> ArrayDifference:
+    """Compare two numeric datasets element-wise, reading `chunk_size` elements at once."""
+    changed = 0
+    max_deviation: Optional[float] = None
+    changed_indices: List[Tuple[int, ...]] = []
+    if dataset_a.shape == dataset_b.shape:
+        rows = h5io.page_rows(dataset_a.shape, chunk_size)
+        for start in range(0, dataset_a.shape[0], rows):
+            values_a, values_b = dataset_a[start : start + rows], dataset_b[start : start + rows]
+            mask = _compare_chunk(values_a, values_b)
+            count = int(np.count_nonzero(mask))
+            if not count:
+                continue
+            changed += count
+            deviation = np.abs(values_a[mask].astype(complex) - values_b[mask].astype(complex))
+            deviation = float(np.nanmax(deviation)) if not np.isnan(deviation).all() else float("nan")
+            max_deviation = deviation if max_deviation is None else max(max_deviation, deviation)
+            if len(changed_indices) < MAX_CHANGED_INDICES:
+                for index in np.argwhere(mask)[: MAX_CHANGED_INDICES - len(changed_indices)]:
+                    changed_indices.append((start + int(index[0]),) + tuple(int(i) for i in index[1:]))
+    return ArrayDifference(
+        shape_a=dataset_a.shape,
+        shape_b=dataset_b.shape,
+        dtype_a=str(dataset_a.dtype),
+        dtype_b=str(dataset_b.dtype),
+        changed=changed,
+        max_deviation=max_deviation,
+        changed_indices=changed_indices,
+    )
+
+
+def format_array_difference(difference: ArrayDifference) -> str:
+    if difference.shape_a != difference.shape_b:
+        return f"Shapes are different: {difference.shape_a} and {difference.shape_b}"
+    total = int(np.prod(difference.shape_a, dtype=np.int64))
+    lines = [f"shape: {difference.shape_a}, dtype: {difference.dtype_a} and {difference.dtype_b}"]
+    if not difference.changed:
+        lines.append("Values are identical")
+        return "\n".join(lines)
+    lines.append(f"{difference.changed} of {total} elements are different")
+    lines.append(f"max deviation: {difference.max_deviation}")
+    lines.append("first different indices:")
+    lines.extend(f"  {index}" for index in difference.changed_indices)
+    return "\n".join(lines)
+
+
+def value_to_text(value) -> str:
+    """Whole text of a value read from a file. Arrays are never shortened, groups give a line per key."""
+    if isinstance(value, dict):
+        lines = []
+        for name, item in value.items():
+            text = value_to_text(item)
+            if "\n" in text:
+                lines.append(f"{name}:")
+                lines.extend(f"    {line}" for line in text.splitlines())
+            else:
+                lines.append(f"{name}: {text}")
+        return "\n".join(lines)
+    if isinstance(value, np.ndarray):
+        return np.array2string(value, threshold=sys.maxsize)
+    return str(value)
+
+
+def compare_keys(filepath_a: str, filepath_b: str, key: str):
+    """Compare the `key` of two files.
+
+    Numeric datasets are compared element-wise and give ArrayDifference.
+    Other values are compared as text and give TextDifference.
+    Raises KeyError if the key is not inside one of the files.
+    """
+    with h5io.HANDLES.open(filepath_a) as file_a, h5io.HANDLES.open(filepath_b) as file_b:
+        dataset_a, dataset_b = file_a.get(key), file_b.get(key)
+        if dataset_a is None or dataset_b is None:
+            raise KeyError(key)
+        if is_numeric(dataset_a) and is_numeric(dataset_b):
+            return compare_datasets(dataset_a, dataset_b)
+    return compare_text(value_to_text(h5io.read_key(filepath_a, key)), value_to_text(h5io.read_key(filepath_b, key)))
+
+
+# ====== Whole file comparison ======
+
+
+class KeyInfo(NamedTuple):
+    """Shape and dtype of a dataset. Both are None for a group."""
+
+    shape: Optional[Tuple[int, ...]]
+    dtype: Optional[str]
+
+    def describe(self) -> str:
+        return "group" if self.shape is None else f"{self.shape} {self.dtype}"
+
+
+class KeyDifference(NamedTuple):
+    key: str
+    status: str
+    detail: str
+
+
+def describe_file(filepath: str) -> Dict[str, KeyInfo]:
+    """Return all the keys of the file with their shape and dtype, without reading the values."""
+    keys: Dict[str, KeyInfo] = {}
+
+    def visit(name: str, item):
+        if isinstance(item, h5py.Dataset):
+            keys[name] = KeyInfo(item.shape, str(item.dtype))
+        else:
+            keys[name] = KeyInfo(None, None)
+
+    with h5py.File(h5io.h5_filepath(filepath), "r") as file:
+        file.visititems(visit)
+    return keys
+
+
+def _element_bytes(value) -> bytes:
+    """Bytes of an element of a variable length (string, array) or compound dataset."""
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode()
+    if isinstance(value, np.void) and value.dtype.names:
+        return b"".join(_framed(_element_bytes(value[name])) for name in value.dtype.names)
+    array = np.asarray(value)
+    if not array.dtype.hasobject:
+        return array.tobytes()
+    if array.ndim == 0:  # e.g. an object reference
+        return str(value).encode()
+    return b"".join(_framed(_element_bytes(item)) for item in array.flat)
+
+
+def _framed(data: bytes) -> bytes:
+    """Data prefixed by its size, so the boundaries of the elements are part of the checksum."""
+    return len(data).to_bytes(8, "little") + data
+
+
+def _update_checksum(checksum, values: np.ndarray):
+    if not values.dtype.hasobject:
+        checksum.update(np.ascontiguousarray(values).tobytes())
+        return
+    for value in values.flat:
+        checksum.update(_framed(_element_bytes(value)))
+
+
+def dataset_checksum(dataset: h5py.Dataset, chunk_size: int = CHUNK_SIZE) -> str:
+    """Checksum of the content of the dataset, read by chunks of `chunk_size` elements."""
+    checksum = hashlib.blake2b(digest_size=16)
+    if not dataset.shape:
+        value = dataset[()]
+        _update_checksum(checksum, np.array([value], dtype=object if dataset.dtype.hasobject else dataset.dtype))
+        return checksum.hexdigest()
+    rows = h5io.page_rows(dataset.shape, chunk_size)
+    for start in range(0, dataset.shape[0], rows):
+        _update_checksum(checksum, dataset[start : start + rows])
+    return checksum.hexdigest()
+
+
+def hash_datasets(filepath: str, keys: List[str], chunk_size: int = CHUNK_SIZE) -> Dict[str, str]:
+    """Checksums of the `keys` datasets. Runs inside a worker process, so it opens the file itself."""
+    with h5py.File(h5io.h5_filepath(filepath), "r") as file:
+        return {key: dataset_checksum(file[key], chunk_size) for key in keys}
+
+
+def _batches(keys: List[str], count: int) -> Iterable[List[str]]:
+    size = max(1, -(-len(keys) // count))
+    for start in range(0, len(keys), size):
+        yield keys[start : start + size]
+
+
+def hash_files(
+    keys_by_file: Dict[str, List[str]], workers: Optional[int] = None
+) -> Dict[str, Dict[str, str]]:
+    """Checksums of the datasets of several files, computed by `workers` processes."""
+    workers = workers or os.cpu_count() or 1
+    total = sum(len(keys) for keys in keys_by_file.values())
+    if workers == 1 or total < PARALLEL_MIN_KEYS:
+        return {filepath: hash_datasets(filepath, keys) for filepath, keys in keys_by_file.items()}
+
+    checksums: Dict[str, Dict[str, str]] = {filepath: {} for filepath in keys_by_file}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            (filepath, executor.submit(hash_datasets, filepath, batch))
+            for filepath, keys in keys_by_file.items()
+            for batch in _batches(keys, workers * 4)
+        ]
+        for filepath, future in futures:
+            checksums[filepath].update(future.result())
+    return checksums
+
+
+def compare_files(
+    filepath_a: str, filepath_b: str, workers: Optional[int] = None, index: Optional["HashIndex"] = None
+) -> List[KeyDifference]:
+    """Compare all the keys of the file `a` with the previous file `b`.
+
+    Keys only inside `a` are ADDED, keys only inside `b` are REMOVED.
+    Keys with a different shape, dtype or content are CHANGED.
+    Contents are compared by checksums, so the values are never loaded together.
+    If the `index` is given, the files are read only for the checksums missing in it.
+    """
+    if index is not None:
+        keys_a, keys_b = index.describe(filepath_a), index.describe(filepath_b)
+    else:
+        keys_a, keys_b = describe_file(filepath_a), describe_file(filepath_b)
+    differences = [KeyDifference(key, ADDED, keys_a[key].describe()) for key in keys_a if key not in keys_b]
+    differences += [KeyDifference(key, REMOVED, keys_b[key].describe()) for key in keys_b if key not in keys_a]
+
+    to_hash = []
+    for key in keys_a.keys() & keys_b.keys():
+        info_a, info_b = keys_a[key], keys_b[key]
+        if info_a != info_b:
+            differences.append(KeyDifference(key, CHANGED, f"{info_b.describe()} -> {info_a.describe()}"))
+        elif info_a.shape is not None:
+            to_hash.append(key)
+
+    to_hash.sort()
+    if index is not None:
+        checksums_a = index.checksums(filepath_a, to_hash, workers)
+        checksums_b = index.checksums(filepath_b, to_hash, workers)
+    else:
+        checksums = hash_files({filepath_a: to_hash, filepath_b: to_hash}, workers)
+        checksums_a, checksums_b = checksums[filepath_a], checksums[filepath_b]
+    differences += [KeyDifference(key, CHANGED, "content") for key in to_hash if checksums_a[key] != checksums_b[key]]
+    return sorted(differences)
@@ -0,0 +1,318 @@
+"""
+Export of one key of many files into a single table.
+
+Each file gives one row: its path and the value of the key, flattened into
+columns (groups and dicts by their keys, small arrays by their indices).
+The files are read in parallel processes and the rows are written one by
+one, so the memory stays constant whatever the number of files. The columns
+are the ones of the first file that has the key.
+The table is written to `.csv`, `.npz` or `.parquet` (needs pyarrow).
+This module should not depend on PyQt.
+"""
+import abc
+import csv
+import json
+import os
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import h5py
+import numpy as np
+
+try:
+    from . import h5io
+except ImportError:  # started as a script, e.g. from the pyinstaller bundle
+    import h5io  # type: ignore
+
+FORMATS = (".csv", ".npz", ".parquet")
+
+# Arrays with more elements are exported as their description, not as columns
+MAX_ARRAY_COLUMNS = 64
+
+# Less files than this are read without starting the processes
+PARALLEL_MIN_FILES = 32
+
+# Number of files read by one task of a worker process
+BATCH_FILES = 32
+
+# Number of values converted at once when the npz file is written, and rows per parquet batch
+BATCH_ROWS = 2**16
+
+
+class Row(NamedTuple):
+    """Values of the key in the file. Both `values` and `error` are None if the file doesn't have the key."""
+
+    filepath: str
+    values: Optional[Dict[str, Any]]
+    error: Optional[str]
+
+
+class ExportResult(NamedTuple):
+    rows: int
+    missing: int
+    errors: int
+    # Values of the columns that the first file didn't have
+    dropped: int
+
+    def describe(self) -> str:
+        return (
+            f"{self.rows} rows, {self.missing} files without the key, "
+            f"{self.errors} files not read, {self.dropped} values not in the columns"
+        )
+
+
+def flatten(value, name: str) -> Dict[str, Any]:
+    """Columns of the value: dicts by their keys (name/key) and arrays by their indices (name[i])."""
+    if isinstance(value, dict):
+        columns: Dict[str, Any] = {}
+        for key, item in value.items():
+            columns.update(flatten(item, f"{name}/{key}"))
+        return columns
+    if isinstance(value, (list, tuple)):
+        value = np.asarray(value, dtype=object)
+    if isinstance(value, np.ndarray):
+        if value.ndim == 0:
+            return flatten(value[()], name)
+        if value.size > MAX_ARRAY_COLUMNS:
+            return {name: f"<array {value.shape} {value.dtype}>"}
+        columns = {}
+        for index in np.ndindex(value.shape):
+            columns.update(flatten(value[index], f"{name}[{','.join(str(i) for i in index)}]"))
+        return columns
+    if isinstance(value, bytes):
+        return {name: value.decode(errors="replace")}
+    if isinstance(value, np.generic):
+        return {name: value.item()}
+    return {name: value}
+
+
+def _dataset_columns(dataset: h5py.Dataset, name: str) -> Dict[str, Any]:
+    if dataset.shape and dataset.size > MAX_ARRAY_COLUMNS:
+        # Not read, it would give too many columns anyway
+        return {name: f"<array {dataset.shape} {dataset.dtype}>"}
+    return flatten(h5io.decode_value(dataset[()]), name)
+
+
+def read_row(filepath: str, key: str) -> Row:
+    """Runs inside a worker process, so it opens the file itself."""
+    try:
+        with h5py.File(h5io.h5_filepath(filepath), "r") as file:
+            item = file.get(key)
+            if item is None:
+                return Row(filepath, None, None)
+            if isinstance(item, h5py.Dataset):
+                return Row(filepath, _dataset_columns(item, key), None)
+            columns: Dict[str, Any] = {}
+
+            def visit(name: str, value):
+                if isinstance(value, h5py.Dataset):
+                    columns.update(_dataset_columns(value, f"{key}/{name}"))
+
+            item.visititems(visit)
+    except (OSError, ValueError) as error:
+        return Row(filepath, None, str(error))
+    return Row(filepath, columns, None)
+
+
+def read_rows(filepaths: List[str], key: str) -> List[Row]:
+    return [read_row(filepath, key) for filepath in filepaths]
+
+
+def iter_rows(key: str, filepaths: List[str], workers: Optional[int] = None) -> Iterator[Row]:
+    """Rows of the files in their order. At most a few batches per worker are kept in memory."""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(filepaths) < PARALLEL_MIN_FILES:
+        for filepath in filepaths:
+            yield read_row(filepath, key)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: Deque = deque()
+        for start in range(0, len(filepaths), BATCH_FILES):
+            pending.append(executor.submit(read_rows, filepaths[start : start + BATCH_FILES], key))
+            if len(pending) >= workers * 4:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+# ====== Writers ======
+
+
+class TableWriter(abc.ABC):
+    """Writes the rows one by one. The columns are set by the first row."""
+
+    def __init__(self, output: str):
+        self.output = output
+        self.columns: Optional[List[str]] = None
+        self.rows = 0
+
+    def write(self, filepath: str, values: Dict[str, Any]) -> int:
+        """Write the row. Return the number of values dropped as they are not in the columns."""
+        if self.columns is None:
+            self.columns = ["file"] + list(values)
+            self.start(self.columns)
+        self.write_row([filepath] + [values.get(column) for column in self.columns[1:]])
+        self.rows += 1
+        return len(values.keys() - set(self.columns))
+
+    @abc.abstractmethod
+    def start(self, columns: List[str]):
+        """Called once before the first row, with the names of the columns."""
+
+    @abc.abstractmethod
+    def write_row(self, row: List[Any]):
+        """Values of the columns, None for the missing ones."""
+
+    @abc.abstractmethod
+    def close(self):
+        """Finish the file, even if an error happened while writing the rows."""
+
+
+class CsvWriter(TableWriter):
+    def __init__(self, output: str):
+        super().__init__(output)
+        self.file = open(output, "w", newline="", encoding="utf-8")  # pylint: disable=consider-using-with
+        self.writer = csv.writer(self.file)
+
+    def start(self, columns: List[str]):
+        self.writer.writerow(columns)
+
+    def write_row(self, row: List[Any]):
+        self.writer.writerow(["" if value is None else value for value in row])
+
+    def close(self):
+        self.file.close()
+
+
+def _is_number(value) -> bool:
+    return value is None or (isinstance(value, (int, float)) and not isinstance(value, bool))
+
+
+class NpzWriter(TableWriter):
+    """Each column is written to a temporary file, and converted to an array of the npz by chunks.
+
+    Columns of numbers (and missing values) become float64, the others strings.
+    """
+
+    def __init__(self, output: str):
+        super().__init__(output)
+        self.folder = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.files: List[Any] = []
+        self.numeric: List[bool] = []
+        self.lengths: List[int] = []
+
+    def start(self, columns: List[str]):
+        for i in range(len(columns)):
+            path = os.path.join(self.folder.name, f"{i}.jsonl")
+            self.files.append(open(path, "w+", encoding="utf-8"))  # pylint: disable=consider-using-with
+        self.numeric = [True] * len(columns)
+        self.lengths = [1] * len(columns)
+
+    def write_row(self, row: List[Any]):
+        for i, value in enumerate(row):
+            if not _is_number(value):
+                self.numeric[i] = False
+                value = str(value)
+                self.lengths[i] = max(self.lengths[i], len(value))
+            self.files[i].write(json.dumps(value) + "\n")
+
+    def _column_chunks(self, i: int) -> Iterator[np.ndarray]:
+        file = self.files[i]
+        file.seek(0)
+        while True:
+            values = [json.loads(line) for _, line in zip(range(BATCH_ROWS), file)]
+            if not values:
+                return
+            if self.numeric[i]:
+                yield np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+            else:
+                yield np.array(["" if value is None else str(value) for value in values], dtype=f"<U{self.lengths[i]}")
+
+    def close(self):
+        try:
+            with zipfile.ZipFile(self.output, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+                for i, column in enumerate(self.columns or []):
+                    dtype = np.dtype(np.float64 if self.numeric[i] else f"<U{self.lengths[i]}")
+                    with archive.open(f"{column}.npy", "w", force_zip64=True) as file:
+                        header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (self.rows,)}
+                        np.lib.format.write_array_header_1_0(file, header)
+                        for chunk in self._column_chunks(i):
+                            file.write(chunk.tobytes())
+        finally:
+            for file in self.files:
+                file.close()
+            self.folder.cleanup()
+
+
+class ParquetWriter(TableWriter):
+    """Rows are written by batches of BATCH_ROWS. The types of the columns are the ones of the first batch."""
+
+    def __init__(self, output: str):
+        super().__init__(output)
+        try:
+            import pyarrow  # pylint: disable=import-outside-toplevel
+            import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+        except ImportError as error:
+            raise ValueError("Parquet export needs pyarrow: pip install pyarrow") from error
+        self.pyarrow = pyarrow
+        self.writer = None
+        self.batch: List[List[Any]] = []
+
+    def start(self, columns: List[str]):
+        pass
+
+    def write_row(self, row: List[Any]):
+        self.batch.append(row)
+        if len(self.batch) >= BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if not self.batch or self.columns is None:
+            return
+        data = {column: [row[i] for row in self.batch] for i, column in enumerate(self.columns)}
+        self.batch = []
+        try:
+            if self.writer is None:
+                table = self.pyarrow.Table.from_pydict(data)
+                self.writer = self.pyarrow.parquet.ParquetWriter(self.output, table.schema)
+            else:
+                table = self.pyarrow.Table.from_pydict(data, schema=self.writer.schema)
+        except (self.pyarrow.ArrowException, TypeError) as error:
+            raise ValueError(f"The values of the key have different types in the files: {error}") from error
+        self.writer.write_table(table)
+
+    def close(self):
+        self._flush()
+        if self.writer is not None:
+            self.writer.close()
+
+
+def open_writer(output: str) -> TableWriter:
+    if output.endswith(".csv"):
+        return CsvWriter(output)
+    if output.endswith(".npz"):
+        return NpzWriter(output)
+    if output.endswith(".parquet"):
+        return ParquetWriter(output)
+    raise ValueError(f"The output should be a {', '.join(FORMATS)} file")
+
+
+def export_key(key: str, filepaths: Iterable[str], output: str, workers: Optional[int] = None) -> ExportResult:
+    """Write the values of the `key` of all the files into the table `output`, one row per file."""
+    key = key.strip("/")
+    writer = open_writer(output)
+    missing = errors = dropped = 0
+    try:
+        for row in iter_rows(key, list(filepaths), workers):
+            if row.error is not None:
+                errors += 1
+            elif row.values is None:
+                missing += 1
+            else:
+                dropped += writer.write(row.filepath, row.values)
+    finally:
+        writer.close()
+    return ExportResult(writer.rows, missing, errors, dropped)
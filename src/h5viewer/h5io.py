@@ -0,0 +1,507 @@
+"""
+Direct access to the hdf5 files.
+
+Helpers here read only what was asked, so they never load a whole SyncData
+into memory. Files are borrowed from HANDLES, which keeps a bounded number of
+them open between the requests.
+This module should not depend on PyQt.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, List, NamedTuple, Optional, Tuple
+
+import h5py
+import numpy as np
+
+# Datasets bigger than this number of elements are shown by pages
+PREVIEW_SIZE = 1000
+
+# 2D datasets with more columns than this are not plotted, one curve per column
+MAX_CURVES = 8
+
+# Number of elements read at once to compute an envelope
+ENVELOPE_CHUNK = 2**20
+
+
+class ArrayPreview(NamedTuple):
+    """Page of the rows [start, stop) of a dataset along its first axis.
+
+    If a row is bigger than a page, the page is `dataset[index][start:stop]` instead:
+    the first axes are fixed by `index` and [start, stop) is along the next one.
+    """
+
+    key: str
+    shape: Tuple[int, ...]
+    dtype: str
+    page: int
+    page_count: int
+    start: int
+    stop: int
+    values: Any
+    index: Tuple[int, ...] = ()
+
+
+class DatasetInfo(NamedTuple):
+    key: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+def is_table(dataset: h5py.Dataset) -> bool:
+    """Numeric 1D and 2D datasets can be shown as a table."""
+    return dataset.ndim in (1, 2) and dataset.dtype.kind in "iufcb"
+
+
+def value_size(value) -> int:
+    """Approximate memory used by a decoded value."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(sys.getsizeof(k) + value_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(value_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ValueCache:
+    """LRU cache of decoded values limited by their total size in bytes.
+
+    Values are stored by (file path, file mtime, key), so a modified file is
+    never served from the cache. Safe to use from several threads.
+    """
+
+    MISSING = object()
+
+    def __init__(self, max_bytes: int = 256 * 2**20):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._values: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(filepath: str, key: str) -> Hashable:
+        filepath = os.path.abspath(h5_filepath(filepath))
+        return filepath, os.path.getmtime(filepath), key
+
+    def get(self, filepath: str, key: str, accept: Optional[Callable[[Any], bool]] = None):
+        """Return the cached value or MISSING. Values rejected by `accept` count as missing."""
+        cache_key = self.cache_key(filepath, key)
+        with self._lock:
+            if cache_key not in self._values or (accept is not None and not accept(self._values[cache_key][0])):
+                self.misses += 1
+                return self.MISSING
+            self.hits += 1
+            self._values.move_to_end(cache_key)
+            return self._values[cache_key][0]
+
+    def put(self, filepath: str, key: str, value):
+        size = value_size(value)
+        if size > self.max_bytes:
+            return
+        cache_key = self.cache_key(filepath, key)
+        with self._lock:
+            if cache_key in self._values:
+                self._size -= self._values.pop(cache_key)[1]
+            self._values[cache_key] = (value, size)
+            self._size += size
+            self._shrink()
+
+    def _shrink(self):
+        while self._size > self.max_bytes and self._values:
+            self._size -= self._values.popitem(last=False)[1][1]
+
+    def set_max_bytes(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._shrink()
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._size = 0
+
+    def stats(self) -> str:
+        return (
+            f"{self.hits} hits, {self.misses} misses, {len(self._values)} values, "
+            f"{self._size / 2**20:.1f}/{self.max_bytes / 2**20:.0f} MB"
+        )
+
+
+VALUE_CACHE = ValueCache()
+
+
+def h5_filepath(filepath: str) -> str:
+    """Return the path with the `.h5` extension as SyncData does."""
+    return filepath if filepath.endswith(".h5") else filepath + ".h5"
+
+
+class _Handle:
+    def __init__(self, file: h5py.File, state: Tuple[float, int]):
+        self.file = file
+        self.state = state
+        self.users = 0
+        self.last_used = time.monotonic()
+
+
+class HandlePool:
+    """LRU of the files open for reading, shared by all the threads.
+
+    At most `max_handles` files are kept open, so the number of file descriptors
+    stays bounded whatever the number of open tabs. A file modified since it was
+    opened is opened again. Files unused for `max_idle` seconds are closed by
+    close_idle(), so the acquisition can write to them.
+    """
+
+    def __init__(self, max_handles: int = 8, max_idle: float = 2.0):
+        self.max_handles = max_handles
+        self.max_idle = max_idle
+        self._handles: "OrderedDict[str, _Handle]" = OrderedDict()
+        # Outdated handles still used by another thread
+        self._stale: List[_Handle] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def open(self, filepath: str) -> Iterator[h5py.File]:
+        filepath = os.path.abspath(h5_filepath(filepath))
+        handle = self._acquire(filepath)
+        try:
+            yield handle.file
+        finally:
+            with self._lock:
+                handle.users -= 1
+                handle.last_used = time.monotonic()
+                if handle in self._stale and not handle.users:
+                    self._stale.remove(handle)
+                    handle.file.close()
+
+    def _acquire(self, filepath: str) -> _Handle:
+        stat = os.stat(filepath)
+        state = (stat.st_mtime, stat.st_size)
+        with self._lock:
+            handle = self._handles.get(filepath)
+            if handle is not None and handle.state == state:
+                self._handles.move_to_end(filepath)
+                handle.users += 1
+                return handle
+            if handle is not None:
+                self._discard(self._handles.pop(filepath))
+            handle = _Handle(h5py.File(filepath, "r"), state)
+            handle.users += 1
+            self._handles[filepath] = handle
+            self._shrink()
+            return handle
+
+    def _discard(self, handle: _Handle):
+        if handle.users:
+            self._stale.append(handle)
+        else:
+            handle.file.close()
+
+    def _shrink(self):
+        for filepath in list(self._handles):
+            if len(self._handles) <= self.max_handles:
+                break
+            if not self._handles[filepath].users:
+                self._handles.pop(filepath).file.close()
+
+    def close_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            for filepath, handle in list(self._handles.items()):
+                if not handle.users and now - handle.last_used > self.max_idle:
+                    self._handles.pop(filepath).file.close()
+
+    def set_max_handles(self, max_handles: int):
+        with self._lock:
+            self.max_handles = max_handles
+            self._shrink()
+
+    def close_all(self):
+        with self._lock:
+            for handle in self._handles.values():
+                self._discard(handle)
+            self._handles.clear()
+
+    def stats(self) -> str:
+        return f"{len(self._handles)}/{self.max_handles} files open"
+
+
+HANDLES = HandlePool()
+
+
+def has_key(filepath: str, key: str) -> bool:
+    with HANDLES.open(filepath) as file:
+        return key in file
+
+
+def list_children(filepath: str, key: Optional[str] = None) -> List[Tuple[str, bool]]:
+    """Return sorted (name, is_group) pairs of the children of the `key` group.
+
+    Only the names and the types of the children are read, not their content.
+    """
+    with HANDLES.open(filepath) as file:
+        group = file if not key else file[key]
+        if not isinstance(group, h5py.Group):
+            return []
+        return sorted(
+            (name, group.get(name, getclass=True) is h5py.Group) for name in group.keys()
+        )
+
+
+def list_groups(filepath: str, keys: Dict[int, str]) -> Dict[int, Optional[List[Tuple[str, bool]]]]:
+    """list_children of several groups at once. Groups that don't exist anymore are None."""
+    listed: Dict[int, Optional[List[Tuple[str, bool]]]] = {}
+    with HANDLES.open(filepath) as file:
+        for node, key in keys.items():
+            group = file.get(key) if key else file
+            if not isinstance(group, h5py.Group):
+                listed[node] = None
+                continue
+            listed[node] = sorted(
+                (name, group.get(name, getclass=True) is h5py.Group) for name in group.keys()
+            )
+    return listed
+
+
+def decode_value(value):
+    """Decode a value read from the file the same way SyncData does."""
+    if isinstance(value, bytes):
+        value = value.decode()
+    if isinstance(value, str) and value.startswith("__json__"):
+        return json.loads(value[8:])
+    return value
+
+
+def read_group(group: h5py.Group) -> dict:
+    data = {}
+    for name, value in group.items():
+        if isinstance(value, h5py.Group):
+            data[name] = read_group(value)
+        else:
+            data[name] = decode_value(value[()])
+    return data
+
+
+def page_rows(shape: Tuple[int, ...], page_size: int = PREVIEW_SIZE) -> int:
+    """Number of rows along the first axis that fit inside one page."""
+    row_size = int(np.prod(shape[1:], dtype=np.int64)) if len(shape) > 1 else 1
+    return max(1, page_size // max(row_size, 1))
+
+
+def page_axis(shape: Tuple[int, ...], page_size: int = PREVIEW_SIZE) -> int:
+    """First axis whose slices fit inside one page, the axes before it are fixed for each page."""
+    axis = 0
+    while 0 not in shape and axis < len(shape) - 1 and int(np.prod(shape[axis + 1 :], dtype=np.int64)) > page_size:
+        axis += 1
+    return axis
+
+
+def _read_page(dataset: h5py.Dataset, key: str, page: int, page_size: int) -> ArrayPreview:
+    shape = dataset.shape
+    axis = page_axis(shape, page_size)
+    rows = page_rows(shape[axis:], page_size)
+    axis_pages = max(1, -(-shape[axis] // rows))
+    page_count = int(np.prod(shape[:axis], dtype=np.int64)) * axis_pages
+    if page < 0:
+        page += page_count
+    page = min(max(page, 0), page_count - 1)
+    index = tuple(int(i) for i in np.unravel_index(page // axis_pages, shape[:axis])) if axis else ()
+    start = page % axis_pages * rows
+    stop = min(start + rows, shape[axis])
+    return ArrayPreview(
+        key=key,
+        shape=shape,
+        dtype=str(dataset.dtype),
+        page=page,
+        page_count=page_count,
+        start=start,
+        stop=stop,
+        values=dataset[index + (slice(start, stop),)],
+        index=index,
+    )
+
+
+def read_preview(filepath: str, key: str, page: int = 0, page_size: int = PREVIEW_SIZE) -> ArrayPreview:
+    """Read only one page of the dataset. Negative pages are counted from the end."""
+    with HANDLES.open(filepath) as file:
+        dataset = file.get(key)
+        if not isinstance(dataset, h5py.Dataset) or not dataset.shape:
+            raise KeyError(key)
+        return _read_page(dataset, key, page, page_size)
+
+
+def read_key(filepath: str, key: str, max_size: Optional[int] = None, tables: bool = False):
+    """Read only the `key` item (e.g. 'a/b/c') from the file.
+
+    Datasets are read and decoded, groups are returned as a dict.
+    If `max_size` is given, datasets with more elements are not read entirely,
+    the ArrayPreview of their first page is returned instead.
+    If `tables` is True, datasets that can be shown as a table are not read,
+    their DatasetInfo is returned instead.
+    Values read entirely are kept in VALUE_CACHE.
+    Raises KeyError if the key is not inside the file.
+    """
+    def should_be_read(value) -> bool:
+        """Arrays that are shown as a preview or a table, even if they are cached."""
+        return isinstance(value, np.ndarray) and bool(value.shape) and (
+            (max_size is not None and value.size > max_size)
+            or (tables and value.ndim in (1, 2) and value.dtype.kind in "iufcb")
+        )
+
+    cached = VALUE_CACHE.get(filepath, key, accept=lambda value: not should_be_read(value))
+    if cached is not ValueCache.MISSING:
+        return cached
+
+    with HANDLES.open(filepath) as file:
+        value = file.get(key) if key else file
+        if value is None:
+            raise KeyError(key)
+        if isinstance(value, h5py.Group):
+            data = read_group(value)
+        elif tables and is_table(value):
+            return DatasetInfo(key=key, shape=value.shape, dtype=str(value.dtype))
+        elif max_size is not None and value.shape and value.size > max_size:
+            return _read_page(value, key, 0, max_size)
+        else:
+            data = decode_value(value[()])
+    VALUE_CACHE.put(filepath, key, data)
+    return data
+
+
+class Envelope(NamedTuple):
+    """Min and max of the rows [start, stop) of a dataset inside bins of `bin_size` rows.
+
+    `x` is the first row of each bin. `ymin` and `ymax` have one column per curve.
+    If the rows fit inside the bins, bin_size is 1 and ymin and ymax are the values.
+    """
+
+    key: str
+    length: int
+    start: int
+    stop: int
+    bin_size: int
+    x: np.ndarray
+    ymin: np.ndarray
+    ymax: np.ndarray
+
+
+def is_plottable(shape: Tuple[int, ...], dtype) -> bool:
+    """Real 1D datasets and 2D datasets with a few columns are plotted."""
+    if np.dtype(dtype).kind not in "iufb" or not shape or not shape[0]:
+        return False
+    return len(shape) == 1 or (len(shape) == 2 and 0 < shape[1] <= MAX_CURVES)
+
+
+def _as_curves(values: np.ndarray) -> np.ndarray:
+    return values.astype(np.float64, copy=False).reshape(len(values), -1)
+
+
+def read_envelope(filepath: str, key: str, start: int = 0, stop: Optional[int] = None, bins: int = 1000) -> Envelope:
+    """Envelope of the rows [start, stop) of the dataset decimated to `bins` bins.
+
+    The dataset is read by chunks of ENVELOPE_CHUNK elements, so memory stays
+    bounded whatever its size. NaN are ignored unless a whole bin is NaN.
+    """
+    with HANDLES.open(filepath) as file:
+        dataset = file.get(key)
+        if not isinstance(dataset, h5py.Dataset) or not is_plottable(dataset.shape, dataset.dtype):
+            raise KeyError(key)
+        length = dataset.shape[0]
+        stop = length if stop is None else min(max(stop, 0), length)
+        start = min(max(start, 0), stop)
+        bins = max(bins, 1)
+        if stop - start <= 2 * bins:
+            values = _as_curves(dataset[start:stop])
+            return Envelope(key, length, start, stop, 1, np.arange(start, stop), values, values)
+
+        bin_size = -(-(stop - start) // bins)
+        curves = 1 if dataset.ndim == 1 else dataset.shape[1]
+        chunk = max(1, ENVELOPE_CHUNK // (bin_size * curves)) * bin_size
+        ymin, ymax = [], []
+        for chunk_start in range(start, stop, chunk):
+            values = _as_curves(dataset[chunk_start : min(chunk_start + chunk, stop)])
+            full = len(values) // bin_size * bin_size
+            if full:
+                binned = values[:full].reshape(-1, bin_size, curves)
+                ymin.append(np.fmin.reduce(binned, axis=1))
+                ymax.append(np.fmax.reduce(binned, axis=1))
+            if full < len(values):  # last bin of the dataset
+                ymin.append(np.fmin.reduce(values[full:], axis=0, keepdims=True))
+                ymax.append(np.fmax.reduce(values[full:], axis=0, keepdims=True))
+    return Envelope(
+        key, length, start, stop, bin_size, np.arange(start, stop, bin_size), np.concatenate(ymin), np.concatenate(ymax)
+    )
+
+
+class FileEntry(NamedTuple):
+    path: str
+    mtime: float
+    size: int
+
+
+def scan_folder(folder: str) -> List[FileEntry]:
+    """All the `.h5` files of the folder and its subfolders, the last modified first.
+
+    Uses os.scandir, so the file attributes come with the listing on most systems.
+    """
+    entries: List[FileEntry] = []
+    folders = [folder]
+    while folders:
+        try:
+            iterator = os.scandir(folders.pop())
+        except OSError:
+            continue
+        with iterator:
+            for entry in iterator:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        folders.append(entry.path)
+                    elif entry.name.endswith(".h5") and entry.is_file():
+                        stat = entry.stat()
+                        entries.append(FileEntry(entry.path, stat.st_mtime, stat.st_size))
+                except OSError:
+                    continue
+    entries.sort(key=lambda entry: entry.mtime, reverse=True)
+    return entries
+
+
+def peek_key_counts(filepaths: List[str]) -> Dict[str, Optional[int]]:
+    """Number of top-level keys of the files. Only the root group is read, None if it cannot be read."""
+    counts: Dict[str, Optional[int]] = {}
+    for filepath in filepaths:
+        try:
+            with h5py.File(filepath, "r") as file:
+                counts[filepath] = len(file)
+        except OSError:
+            counts[filepath] = None
+    return counts
+
+
+def format_preview(preview: ArrayPreview) -> str:
+    values = preview.values
+    if preview.index:
+        selection = ", ".join([str(i) for i in preview.index] + [f"{preview.start}:{preview.stop}"])
+        position = f"values [{selection}]"
+    else:
+        position = f"rows {preview.start}-{preview.stop - 1} of {preview.shape[0]}"
+    lines = [
+        f"shape: {preview.shape}, dtype: {preview.dtype}",
+        f"{position} (page {preview.page + 1}/{preview.page_count})",
+    ]
+    if values.dtype.kind in "iuf" and values.size:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            lines.append(f"min: {np.nanmin(values)}, max: {np.nanmax(values)} (on this page)")
+    if values.dtype.kind in "OS":
+        values = np.array([decode_value(v) for v in values.flat], dtype=object).reshape(values.shape)
+    lines.append("")
+    lines.append(np.array2string(values, threshold=sys.maxsize))
+    return "\n".join(lines)
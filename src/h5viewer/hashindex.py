@@ -0,0 +1,145 @@
+"""
+Index of the datasets of the files cached on disk.
+
+For every file path and mtime the index stores the shape, dtype, size in bytes
+and the content checksum of each dataset, so unchanged files are never read
+again to be compared. The index is a SQLite database, it can be used from
+several threads and processes.
+This module should not depend on PyQt.
+"""
+import os
+import sqlite3
+from contextlib import closing, contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+try:
+    from . import diff, h5io
+except ImportError:  # started as a script, e.g. from the pyinstaller bundle
+    import diff  # type: ignore
+    import h5io  # type: ignore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    filepath TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS datasets (
+    filepath TEXT NOT NULL,
+    key TEXT NOT NULL,
+    shape TEXT,
+    dtype TEXT,
+    nbytes INTEGER,
+    checksum TEXT,
+    PRIMARY KEY (filepath, key)
+);
+"""
+
+# Version of the checksums. Stored checksums of another version are computed again
+CHECKSUM_VERSION = 2
+
+
+def _shape_to_text(shape) -> Optional[str]:
+    return None if shape is None else ",".join(str(i) for i in shape)
+
+
+def _text_to_shape(text: Optional[str]):
+    if text is None:
+        return None
+    return tuple(int(i) for i in text.split(",")) if text else ()
+
+
+def _nbytes(info: diff.KeyInfo) -> Optional[int]:
+    if info.shape is None:
+        return None
+    try:
+        itemsize = np.dtype(info.dtype).itemsize
+    except TypeError:  # compound dtypes are stored by their description
+        return None
+    return int(np.prod(info.shape, dtype=np.int64)) * itemsize
+
+
+class HashIndex:
+    """Checksums and descriptions of the datasets stored in the SQLite file `path`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            if connection.execute("PRAGMA user_version").fetchone()[0] != CHECKSUM_VERSION:
+                connection.execute("UPDATE datasets SET checksum = NULL")
+                connection.execute(f"PRAGMA user_version = {CHECKSUM_VERSION}")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """New connection for each request, so the index can be used from any thread."""
+        with closing(sqlite3.connect(self.path, timeout=30)) as connection:
+            with connection:
+                yield connection
+
+    @staticmethod
+    def _file_state(filepath: str):
+        filepath = os.path.abspath(h5io.h5_filepath(filepath))
+        stat = os.stat(filepath)
+        return filepath, stat.st_mtime, stat.st_size
+
+    def _is_indexed(self, connection: sqlite3.Connection, filepath: str, mtime: float, size: int) -> bool:
+        row = connection.execute("SELECT mtime, size FROM files WHERE filepath = ?", (filepath,)).fetchone()
+        return row is not None and row[0] == mtime and row[1] == size
+
+    def describe(self, filepath: str) -> Dict[str, diff.KeyInfo]:
+        """Keys of the file with their shape and dtype. Read from the file only if it changed."""
+        filepath, mtime, size = self._file_state(filepath)
+        with self._connect() as connection:
+            if self._is_indexed(connection, filepath, mtime, size):
+                rows = connection.execute("SELECT key, shape, dtype FROM datasets WHERE filepath = ?", (filepath,))
+                return {key: diff.KeyInfo(_text_to_shape(shape), dtype) for key, shape, dtype in rows}
+
+        keys = diff.describe_file(filepath)
+        rows = [
+            (filepath, key, _shape_to_text(info.shape), info.dtype, _nbytes(info)) for key, info in keys.items()
+        ]
+        with self._connect() as connection:
+            connection.execute("DELETE FROM datasets WHERE filepath = ?", (filepath,))
+            connection.executemany(
+                "INSERT INTO datasets (filepath, key, shape, dtype, nbytes) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (filepath, mtime, size))
+        return keys
+
+    def checksums(self, filepath: str, keys: List[str], workers: Optional[int] = None) -> Dict[str, str]:
+        """Checksums of the `keys` datasets. Only the datasets missing in the index are read."""
+        self.describe(filepath)
+        filepath = os.path.abspath(h5io.h5_filepath(filepath))
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT key, checksum FROM datasets WHERE filepath = ? AND checksum IS NOT NULL", (filepath,)
+            )
+            known = dict(rows)
+
+        checksums = {key: known[key] for key in keys if key in known}
+        missing = [key for key in keys if key not in known]
+        if missing:
+            computed = diff.hash_files({filepath: missing}, workers)[filepath]
+            with self._connect() as connection:
+                connection.executemany(
+                    "UPDATE datasets SET checksum = ? WHERE filepath = ? AND key = ?",
+                    [(checksum, filepath, key) for key, checksum in computed.items()],
+                )
+            checksums.update(computed)
+        return checksums
+
+    def index_file(self, filepath: str, workers: Optional[int] = None) -> int:
+        """Compute the checksums of all the datasets of the file. Return the number of datasets read."""
+        keys = [key for key, info in self.describe(filepath).items() if info.shape is not None]
+        filepath = os.path.abspath(h5io.h5_filepath(filepath))
+        with self._connect() as connection:
+            (known,) = connection.execute(
+                "SELECT COUNT(*) FROM datasets WHERE filepath = ? AND checksum IS NOT NULL", (filepath,)
+            ).fetchone()
+        if known < len(keys):
+            self.checksums(filepath, keys, workers)
+        return len(keys) - known
@@ -0,0 +1,86 @@
+"""
+Analysis kernel of the h5viewer.
+
+Long-lived python process started inside the directory of the data file.
+It imports `init_analyse.py` once and then executes the cells sent by the
+viewer, so the imports of `init_analyse` are paid only on the first run.
+
+Protocol: the viewer writes to stdin a line with the size of the code in bytes
+followed by the code itself (utf-8). When a cell is done, the kernel writes
+the line `DONE_MARKER + status` to stdout, where status is 'ok' or 'error'.
+`READY_MARKER` is written once `init_analyse` is imported.
+
+This file is started as a script by any python environment, so it should
+import only the standard library.
+"""
+import os
+import signal
+import sys
+import traceback
+
+READY_MARKER = "__h5viewer_kernel_ready__"
+DONE_MARKER = "__h5viewer_kernel_done__:"
+
+# SIGINT interrupts the running cell, and is ignored between the cells
+cell_running = False
+
+
+def send_marker(marker: str):
+    sys.stderr.flush()
+    sys.stdout.write(f"\n{marker}\n")
+    sys.stdout.flush()
+
+
+def init_namespace() -> dict:
+    namespace = {"__name__": "__main__"}
+    sys.path.insert(0, os.getcwd())
+    if os.path.exists("init_analyse.py"):
+        try:
+            exec("from init_analyse import *", namespace)  # pylint: disable=W0122
+        except BaseException:  # pylint: disable=W0718
+            traceback.print_exc()
+    return namespace
+
+
+def interrupt_cell(signum, frame):
+    del signum, frame
+    if cell_running:
+        raise KeyboardInterrupt
+
+
+def run_cell(code: str, init_ns: dict) -> bool:
+    global cell_running  # pylint: disable=W0603
+    namespace = dict(init_ns)
+    try:
+        try:
+            cell_running = True
+            exec(compile(code, "<analysis_cell>", "exec"), namespace)  # pylint: disable=W0122
+        finally:
+            cell_running = False
+    except SystemExit:
+        pass
+    except BaseException as error:  # pylint: disable=W0718
+        # Skip the frame of the kernel itself
+        traceback.print_exception(type(error), error, error.__traceback__.tb_next)
+        return False
+    return True
+
+
+def main():
+    signal.signal(signal.SIGINT, interrupt_cell)
+    init_ns = init_namespace()
+    send_marker(READY_MARKER)
+    stdin = sys.stdin.buffer
+    while True:
+        header = stdin.readline()
+        if not header:
+            return
+        if not header.strip():
+            continue
+        code = stdin.read(int(header)).decode("utf-8")
+        success = run_cell(code, init_ns)
+        send_marker(DONE_MARKER + ("ok" if success else "error"))
+
+
+if __name__ == "__main__":
+    main()
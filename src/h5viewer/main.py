@@ -8,26 +8,52 @@ after: kyrylo-gr
 
 https://stackoverflow.com/questions/63611190/python-macos-builds-run-from-terminal-but-crash-on-finder-launch
 """
+import bisect
+import html
+import importlib.util
 import logging
+import multiprocessing
 import os
+import signal
 import sys
 import subprocess
+import threading
 
 from labmate.path import Path
 import time
 import re
+from collections import OrderedDict, deque
+from functools import partial
 import os.path as osp
-from typing import List, NamedTuple, Optional
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+import h5py
+import numpy as np
 from PyQt6 import QtWidgets
 from PyQt6 import QtGui, QtCore
 
 from labmate.syncdata import SyncData  # pylint: disable=E0401
-import labmate  # pylint: disable=E0401
 
-logging.basicConfig(level=logging.NOTSET)
+try:
+    from . import cli, diff, h5io, hashindex, kernel, recent, resolver, searchindex, thumbnails
+except ImportError:  # started as a script, e.g. from the pyinstaller bundle
+    import cli  # type: ignore
+    import diff  # type: ignore
+    import h5io  # type: ignore
+    import hashindex  # type: ignore
+    import kernel  # type: ignore
+    import recent  # type: ignore
+    import resolver  # type: ignore
+    import searchindex  # type: ignore
+    import thumbnails  # type: ignore
+
+# Only the warnings of the other libraries are shown, h5py and PyQt debug messages are dropped
+logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 STARTED_FROM_CMD = True
+KERNEL_PATH = osp.join(osp.dirname(osp.abspath(__file__)), "kernel.py")
+# Folder that holds the h5viewer package, so `python -m h5viewer.cli` runs from the sources too
+PACKAGE_PARENT = osp.dirname(osp.dirname(osp.abspath(__file__)))
 
 
 if os.name == "nt" or os.environ.get("PYINSTALLER"):
@@ -42,6 +68,15 @@ else:
     LOCAL_PATH = os.getcwd()
     SETTINGS = QtCore.QSettings()
 
+# Indexes and recent files, kept between the sessions. Not in LOCAL_PATH, which is the current folder when not bundled
+DATA_PATH = osp.join(
+    QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.StandardLocation.GenericDataLocation), "labmate"
+)
+# Thumbnails, which can be computed again if the system removes them
+CACHE_PATH = osp.join(
+    QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.StandardLocation.GenericCacheLocation), "labmate"
+)
+
 
 def get_aqm_variable(code):
     code2 = code[: code.find(".analysis_cell")]
@@ -86,8 +121,83 @@ class ObjectNotExists:
     pass
 
 
+def load_file(file_path: str) -> Tuple[str, SyncData, List[Tuple[str, bool]], Tuple[float, int]]:
+    """Open the file and list its top-level keys. Runs inside the loader.
+
+    Returns the (mtime, size) of the file before it was listed as the last item.
+    """
+    state = recent.file_state(file_path)
+    return file_path, SyncData(file_path, open_on_init=False), h5io.list_children(file_path), state
+
+
+def refresh_groups(file_path: str, groups: Dict[int, str]):
+    """List again the `groups` (by their node) of the file. Runs inside the loader.
+
+    Returns the (mtime, size) before the listing and the children of the groups,
+    or None instead of the children if the file cannot be read right now.
+    """
+    state = recent.file_state(file_path)
+    try:
+        return state, h5io.list_groups(file_path, groups)
+    except OSError:
+        return state, None
+
+
+def read_data_by_key(data: SyncData, keys: List[str], max_size: Optional[int] = None, tables: bool = False):
+    try:
+        return h5io.read_key(data.filepath, "/".join(keys), max_size=max_size, tables=tables)
+    except KeyError:
+        return ObjectNotExists
+
+
+def read_preview_by_key(data: SyncData, keys: List[str], page: int) -> h5io.ArrayPreview:
+    return h5io.read_preview(data.filepath, "/".join(keys), page=page)
+
+
+def get_difference(data: SyncData, previous_data: SyncData, keys: List[str]):
+    """Compare the key inside two files.
+
+    Return (message if cannot be compared, ArrayDifference or TextDifference)."""
+    key = "/".join(keys)
+    if not h5io.has_key(previous_data.filepath, key):
+        return "Previous data doesn't have the following key", None
+
+    if not h5io.has_key(data.filepath, key):
+        return "Current data doesn't have the following key", None
+
+    return None, diff.compare_keys(data.filepath, previous_data.filepath, key)
+
+
+def format_hunks(difference: diff.TextDifference, hunks: List[List[diff.Opcode]]) -> str:
+    """Html of the hunks. Lines only in the current file are red, lines only in the previous one are green."""
+    diff_result = []
+    for hunk in hunks:
+        i1, j1 = hunk[0][1], hunk[0][3]
+        i2, j2 = hunk[-1][2], hunk[-1][4]
+        diff_result.append(f'<span style="color: #6e7781;">@@ -{i1 + 1},{i2 - i1} +{j1 + 1},{j2 - j1} @@</span>')
+        for tag, i1, i2, j1, j2 in hunk:
+            if tag == "equal":
+                diff_result.extend(f"<span>{html.escape(line)}</span>" for line in difference.lines_a[i1:i2])
+                continue
+            diff_result.extend(
+                f'<span style="background-color: #FFCCCC;">{html.escape(line)}</span>'
+                for line in difference.lines_a[i1:i2]
+            )
+            diff_result.extend(
+                f'<span style="background-color: #08A045;">{html.escape(line)}</span>'
+                for line in difference.lines_b[j1:j2]
+            )
+    return "<pre>" + "<br>".join(diff_result) + "</pre>"
+
+
 class AppSettings(NamedTuple):
     file_path: str
+    cache_size_mb: int
+    recent_files_count: int
+    watch_file: bool
+    max_open_files: int
+    log_level: str
+    log_lines: int
 
 
 # ====== Logger ======
@@ -106,20 +216,433 @@ def catch_and_log(function):
 
 
 class QTextLogger(logging.Handler):
-    def __init__(self):
+    """Log panel. Records can be emitted from any thread.
+
+    Messages are queued and appended to the widget by batches on a timer.
+    Both the queue and the widget keep only the last `max_lines` messages.
+    """
+
+    LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+    FLUSH_INTERVAL_MS = 100
+
+    def __init__(self, max_lines: int = 5000):
         super().__init__()
+        self._queue: deque = deque(maxlen=max_lines)
         self.widget = QtWidgets.QPlainTextEdit()
         self.widget.setReadOnly(True)
+        self.widget.setMaximumBlockCount(max_lines)
+
+        self.level_box = QtWidgets.QComboBox()
+        self.level_box.addItems(self.LEVELS)
+        self.level_box.currentTextChanged.connect(self.set_level)
+        level_layout = QtWidgets.QHBoxLayout()
+        level_layout.setContentsMargins(0, 0, 0, 0)
+        level_layout.addWidget(QtWidgets.QLabel("Log level"), 0)
+        level_layout.addWidget(self.level_box, 0)
+        level_layout.addStretch(1)
+        lay = QtWidgets.QVBoxLayout()
+        lay.setContentsMargins(0, 0, 0, 0)
+        lay.addLayout(level_layout)
+        lay.addWidget(self.widget)
+        self.panel = QtWidgets.QWidget()
+        self.panel.setLayout(lay)
+
+        self.flush_timer = QtCore.QTimer(self.widget)
+        self.flush_timer.timeout.connect(self.flush_to_widget)
+        self.flush_timer.start(self.FLUSH_INTERVAL_MS)
 
     def emit(self, record):
-        msg = self.format(record)
-        self.widget.appendPlainText(msg)
+        try:
+            self._queue.append(self.format(record))
+        except Exception:  # pylint: disable=W0718
+            self.handleError(record)
+
+    def flush_to_widget(self):
+        """Append the queued messages to the widget. Must be called from the main thread."""
+        messages = []
+        while self._queue:
+            messages.append(self._queue.popleft())
+        if messages:
+            self.widget.appendPlainText("\n".join(messages))
+
+    def set_level(self, level):
+        super().setLevel(level)
+        if isinstance(level, str) and self.level_box.currentText() != level:
+            self.level_box.setCurrentText(level)
+
+    def set_max_lines(self, max_lines: int):
+        self._queue = deque(self._queue, maxlen=max_lines)
+        self.widget.setMaximumBlockCount(max_lines)
+
+
+# ====== Background loading ======
+
+
+class LoaderSignals(QtCore.QObject):
+    finished = QtCore.pyqtSignal(int, object)
+    failed = QtCore.pyqtSignal(int, object)
+
+
+class LoaderTask(QtCore.QRunnable):
+    def __init__(self, task_id: int, signals: LoaderSignals, cancelled: threading.Event, function, args):
+        super().__init__()
+        self.task_id = task_id
+        self.signals = signals
+        self.cancelled = cancelled
+        self.function = function
+        self.args = args
+
+    def run(self):
+        if self.cancelled.is_set():
+            return
+        try:
+            result = self.function(*self.args)
+        except Exception as error:  # pylint: disable=W0718
+            self.signals.failed.emit(self.task_id, error)
+            return
+        self.signals.finished.emit(self.task_id, result)
+
+
+class Loader(QtCore.QObject):
+    """Run the reads of the files in a thread pool, so they never block the window.
+
+    Results are delivered back to `on_result` inside the main thread.
+    A task started on a channel cancels the previous task of this channel:
+    it's not started if it's still waiting and its result is dropped otherwise.
+    Background tasks (e.g. indexing) run one by one in their own thread,
+    so they never delay the reads asked by the user.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QtCore.QThreadPool.globalInstance()
+        self.background_pool = QtCore.QThreadPool(self)
+        self.background_pool.setMaxThreadCount(1)
+        self.signals = LoaderSignals(self)
+        self.signals.finished.connect(self._on_finished)
+        self.signals.failed.connect(self._on_failed)
+        self._last_id = 0
+        self._tasks: Dict[int, Tuple[threading.Event, Callable]] = {}
+        self._channels: Dict[str, int] = {}
+
+    def run(
+        self, channel: Optional[str], on_result: Callable, function: Callable, *args, background: bool = False
+    ) -> int:
+        if channel is not None:
+            self.cancel(channel)
+            self._channels[channel] = self._last_id + 1
+        self._last_id += 1
+        cancelled = threading.Event()
+        self._tasks[self._last_id] = (cancelled, on_result)
+        pool = self.background_pool if background else self.pool
+        pool.start(LoaderTask(self._last_id, self.signals, cancelled, function, args))
+        return self._last_id
+
+    def cancel(self, channel: str):
+        task = self._tasks.pop(self._channels.pop(channel, -1), None)
+        if task is not None:
+            task[0].set()
+
+    def _pop_task(self, task_id: int):
+        for channel, channel_task_id in list(self._channels.items()):
+            if channel_task_id == task_id:
+                del self._channels[channel]
+        return self._tasks.pop(task_id, None)
+
+    @QtCore.pyqtSlot(int, object)
+    def _on_finished(self, task_id: int, result):
+        task = self._pop_task(task_id)
+        if task is not None:
+            catch_and_log(task[1])(result)
+
+    @QtCore.pyqtSlot(int, object)
+    def _on_failed(self, task_id: int, error: Exception):
+        if self._pop_task(task_id) is not None:
+            logger.error(error, exc_info=error)
+
+
+# ====== File watching ======
+class FileWatcher(QtCore.QObject):
+    """Emit `changed` when the watched file is modified.
+
+    Changes are noticed by QFileSystemWatcher and by polling the mtime and the size
+    every POLL_MS, as the watcher doesn't work on every network share. Bursts of
+    writes are merged: `changed` is emitted DEBOUNCE_MS after the last write,
+    but at least every MAX_DELAY_MS while the file keeps being written.
+    """
+
+    POLL_MS = 2000
+    DEBOUNCE_MS = 500
+    MAX_DELAY_MS = 3000
+
+    changed = QtCore.pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.file_path: Optional[str] = None
+        self.state: Optional[Tuple[float, int]] = None
+        self._first_change: Optional[float] = None
+
+        self.watcher = QtCore.QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.check)
+        self.poll_timer = QtCore.QTimer(self)
+        self.poll_timer.setInterval(self.POLL_MS)
+        self.poll_timer.timeout.connect(self.check)
+        self.debounce_timer = QtCore.QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.timeout.connect(self._emit)
+
+    def watch(self, file_path: Optional[str], state: Optional[Tuple[float, int]] = None):
+        """Watch the `file_path` known in the `state` (mtime, size). None stops watching."""
+        if self.watcher.files():
+            self.watcher.removePaths(self.watcher.files())
+        self.debounce_timer.stop()
+        self._first_change = None
+        self.file_path = h5io.h5_filepath(file_path) if file_path else None
+        self.state = state
+        if self.file_path is None:
+            self.poll_timer.stop()
+            return
+        self.watcher.addPath(self.file_path)
+        self.poll_timer.start()
+
+    def set_state(self, state: Tuple[float, int]):
+        """The file was read in the `state`, so the changes before are handled."""
+        self.state = state
+
+    @catch_and_log
+    def check(self, *_):
+        if self.file_path is None:
+            return
+        # Files replaced by a new one are removed from the watcher
+        if self.file_path not in self.watcher.files() and osp.exists(self.file_path):
+            self.watcher.addPath(self.file_path)
+        try:
+            state = recent.file_state(self.file_path)
+        except OSError:
+            return
+        if state == self.state:
+            return
+        now = time.monotonic()
+        if self._first_change is None:
+            self._first_change = now
+        delay = self.MAX_DELAY_MS - (now - self._first_change) * 1000
+        self.debounce_timer.start(int(max(0, min(self.DEBOUNCE_MS, delay))))
+
+    @catch_and_log
+    def _emit(self):
+        self._first_change = None
+        if self.file_path is not None:
+            self.changed.emit(self.file_path)
+
+
+# ====== Analysis runner ======
+
+
+class AnalysisKernel(QtCore.QObject):
+    """Child process that keeps `init_analyse` imported and runs the cells sent to it.
+
+    Output is streamed to the log line by line. See kernel.py for the protocol.
+    """
+
+    cell_finished = QtCore.pyqtSignal(bool)
+    exited = QtCore.pyqtSignal()
+
+    def __init__(self, workdir: str, source: Optional[str] = None, parent=None):
+        super().__init__(parent)
+        self.workdir = workdir
+        self.source = source
+        self.busy = False
+        # Number of the cells executed, so an interruption concerns only the cell it was sent to
+        self.cell_id = 0
+        self._buffers = {"stdout": b"", "stderr": b""}
+
+        self.process = QtCore.QProcess(self)
+        self.process.setWorkingDirectory(workdir)
+        env = QtCore.QProcessEnvironment.systemEnvironment()
+        env.insert("PYTHONUNBUFFERED", "1")
+        self.process.setProcessEnvironment(env)
+        self.process.readyReadStandardOutput.connect(partial(self._read, "stdout"))
+        self.process.readyReadStandardError.connect(partial(self._read, "stderr"))
+        self.process.finished.connect(self._finished)
+        self.process.errorOccurred.connect(self._error)
+
+    def command(self) -> Tuple[str, List[str]]:
+        if self.source:
+            if os.name == "nt":
+                return "cmd.exe", ["/c", f'{self.source}&& python -u "{KERNEL_PATH}"']
+            return "/bin/sh", ["-c", f'{self.source}&& exec python -u "{KERNEL_PATH}"']
+        if getattr(sys, "frozen", False):
+            # The bundle has no python executable, it runs the kernel itself, see main()
+            return sys.executable, ["--kernel"]
+        return sys.executable, ["-u", KERNEL_PATH]
+
+    def start(self):
+        program, arguments = self.command()
+        logger.debug("Start analysis kernel in %s: %s %s", self.workdir, program, " ".join(arguments))
+        self.process.start(program, arguments)
+
+    def is_alive(self) -> bool:
+        return self.process.state() != QtCore.QProcess.ProcessState.NotRunning
+
+    def execute(self, code: str):
+        data = code.encode("utf-8")
+        self.busy = True
+        self.cell_id += 1
+        self.process.write(f"{len(data)}\n".encode() + data)
+
+    def interrupt(self):
+        """Interrupt the running cell, but keep the kernel. Kill it if impossible."""
+        pid = self.process.processId()
+        if os.name == "nt" or not pid:
+            self.kill()
+            return
+        os.kill(pid, signal.SIGINT)
+        cell_id = self.cell_id
+        QtCore.QTimer.singleShot(3000, lambda: self.busy and self.cell_id == cell_id and self.kill())
+
+    def kill(self):
+        if self.is_alive():
+            self.process.kill()
+
+    def _read(self, channel: str):
+        if channel == "stdout":
+            data = bytes(self.process.readAllStandardOutput().data())
+        else:
+            data = bytes(self.process.readAllStandardError().data())
+        data = self._buffers[channel] + data
+        end = data.rfind(b"\n") + 1
+        self._buffers[channel] = data[end:]
+        self._log_lines(channel, data[:end])
+
+    def _log_lines(self, channel: str, data: bytes):
+        for line in data.decode(errors="replace").splitlines():
+            if line == kernel.READY_MARKER:
+                logger.debug("Analysis kernel is ready")
+            elif line.startswith(kernel.DONE_MARKER):
+                self.busy = False
+                self.cell_finished.emit(line[len(kernel.DONE_MARKER) :] == "ok")
+            elif channel == "stdout":
+                if line:
+                    logger.info("%s", line)
+            else:
+                logger.error("%s", line)
+
+    @catch_and_log
+    def _finished(self, exit_code: int, exit_status: QtCore.QProcess.ExitStatus):
+        for channel in ("stdout", "stderr"):
+            self._log_lines(channel, self._buffers[channel])
+        if exit_status == QtCore.QProcess.ExitStatus.CrashExit:
+            logger.info("Analysis kernel was stopped")
+        else:
+            logger.info("Analysis kernel exited with code %d", exit_code)
+        self.busy = False
+        self.exited.emit()
+
+    @catch_and_log
+    def _error(self, error: QtCore.QProcess.ProcessError):
+        if error == QtCore.QProcess.ProcessError.FailedToStart:
+            logger.error("Cannot start the analysis kernel: %s", self.process.errorString())
+            self.busy = False
+            self.exited.emit()
+
+
+class AnalysisRunner(QtCore.QObject):
+    """Run the analysis code in a warm kernel, one per (source environment, data directory).
+
+    Kernels are stopped after IDLE_TIMEOUT_MS without cells or by restart().
+    """
+
+    IDLE_TIMEOUT_MS = 15 * 60 * 1000
+    running_changed = QtCore.pyqtSignal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.kernels: Dict[Tuple[Optional[str], str], AnalysisKernel] = {}
+        self.running: Optional[AnalysisKernel] = None
+        self.idle_timers: Dict[Tuple[Optional[str], str], QtCore.QTimer] = {}
+        app = QtCore.QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.shutdown)
+
+    def is_running(self) -> bool:
+        return self.running is not None
+
+    def get_kernel(self, workdir: str, source: Optional[str]) -> AnalysisKernel:
+        key = (source, workdir)
+        if key in self.kernels and self.kernels[key].is_alive():
+            return self.kernels[key]
+
+        kernel_process = AnalysisKernel(workdir, source, self)
+        kernel_process.cell_finished.connect(partial(self._cell_finished, key))
+        kernel_process.exited.connect(partial(self._kernel_exited, key, kernel_process))
+        self.kernels[key] = kernel_process
+
+        timer = QtCore.QTimer(self)
+        timer.setSingleShot(True)
+        timer.setInterval(self.IDLE_TIMEOUT_MS)
+        timer.timeout.connect(kernel_process.kill)
+        self.idle_timers[key] = timer
+
+        kernel_process.start()
+        return kernel_process
+
+    def run(self, code: str, workdir: str, source: Optional[str] = None):
+        if self.is_running():
+            logger.warning("Analysis is already running. Stop it first.")
+            return
+        kernel_process = self.get_kernel(workdir, source)
+        self.idle_timers[(source, workdir)].stop()
+        self.running = kernel_process
+        self.running_changed.emit(True)
+        kernel_process.execute(code)
+
+    def stop(self):
+        if self.running is not None:
+            logger.info("Stopping analysis")
+            self.running.interrupt()
+
+    def restart(self):
+        """Stop all the kernels, so the next run imports `init_analyse` again."""
+        for kernel_process in list(self.kernels.values()):
+            kernel_process.kill()
+
+    def shutdown(self):
+        for kernel_process in list(self.kernels.values()):
+            kernel_process.kill()
+            kernel_process.process.waitForFinished(1000)
+
+    def _cell_finished(self, key, success: bool):
+        logger.info("Analysis finished%s", "" if success else " with an error")
+        self.idle_timers[key].start()
+        self.running = None
+        self.running_changed.emit(False)
+
+    def _kernel_exited(self, key, kernel_process: AnalysisKernel):
+        if self.kernels.get(key) is kernel_process:
+            del self.kernels[key]
+            self.idle_timers.pop(key).deleteLater()
+        kernel_process.deleteLater()
+        if self.running is kernel_process:
+            self.running = None
+            self.running_changed.emit(False)
 
 
 # ====== Highlighter ======
 
 
 class PythonSyntaxHighlighter(QtGui.QSyntaxHighlighter):
+    """Highlighter of python code.
+
+    All the rules are compiled once into one tokenizer, so a block is scanned
+    only once. Multi-line strings are tracked with the block state, so editing
+    a block re-highlights only the blocks which state changed.
+    Documents longer than MAX_DOCUMENT_SIZE characters are not highlighted.
+    """
+
+    MAX_DOCUMENT_SIZE = 500_000
+    NORMAL, IN_DOUBLE_QUOTES, IN_SINGLE_QUOTES = 0, 1, 2
+
     def __init__(self, parent=None):
         super().__init__(parent)
 
@@ -155,46 +678,78 @@ class PythonSyntaxHighlighter(QtGui.QSyntaxHighlighter):
         self.class_format = QtGui.QTextCharFormat()
         self.class_format.setForeground(QtGui.QColor("#953800"))
 
-        keywords = "(?:True|False|None|def|class|if|else|elif|for|\
-            while|in|not|and|or|with|assert|return|raise|global|import|from)"
+        keywords = (
+            "True|False|None|def|class|if|else|elif|for|"
+            "while|in|not|and|or|with|assert|return|raise|global|import|from"
+        )
         var = "\\w+"
 
+        # The first rule that matches at a position wins, so the order matters
         self.highlighting_rules = [
+            # ...
+            ("comment", "#.*", self.comment_format),
+            # long comments on one line
+            ("long_string", "\"\"\".*?\"\"\"|'''.*?'''", self.string_format),
+            # long comments continued on the next lines
+            ("long_string_start", "\"\"\"|'''", self.string_format),
+            # "...", '...'
+            ("string", "\"[^\"]*\"|'[^']*'", self.string_format),
+            # if ...
+            ("keyword", f"\\b(?:{keywords})\\b", self.keyword_format),
+            # 123, 123.32, 123_123
+            ("number", "\\b\\d[\\d_]*\\.?\\d*(?:e\\-?[\\d_]+\\.?\\d*)?", self.number_format),
             # abc(
-            (f"\\b({var})\\(", self.function_format),
+            ("function", f"\\b{var}(?=\\()", self.function_format),
             # abc. ...
-            (f"\\b(({var}\\.)+)", self.class_format),
-            # if ...
-            (f"\\b({keywords})\\b", self.keyword_format),
-            # var =
-            # (f"\\b({var})(( )?=)", self.var_format),
-            # if var
-            # (f"\\b{keywords} {var}", self.var_format),
+            ("class", f"\\b(?:{var}\\.)+", self.class_format),
             # .var
-            (f"\\.({var})", self.function_format),
-            # def abc(var, var = ...)
-            # (f"\\bdef {var}(\\((({var})[, =]*)*\\))", self.classical_format),
-            # "...", '...'
-            ("((\"[^\"]*\")|('[^']*'))", self.string_format),
-            # 123, 123.32, 123_123
-            ("\\b((\\-?[\\d_]+\\.?\\d*)(e(\\-?[\\d_]+\\.?\\d*))?)", self.number_format),
+            ("attribute", f"(?<=\\.){var}", self.function_format),
             # equal format
-            ("(?:\\w| )(=)(?:\\w| )", self.equal_format),
-            # ...
-            ("(#[^\n]*)", self.comment_format),
-            # long comments
-            ('("""(.*\n?))?', self.string_format),
+            ("equal", "(?<=[\\w ])=(?=[\\w ])", self.equal_format),
+            # other words are skipped at once
+            ("word", var, None),
         ]
+        self.formats = {name: format_ for name, _, format_ in self.highlighting_rules}
+        self.tokenizer = re.compile(
+            "|".join(f"(?P<{name}>{pattern})" for name, pattern, _ in self.highlighting_rules)
+        )
+
+    def _continue_long_string(self, text: str, state: int) -> int:
+        """Format the end of a multi-line string. Return where the string ends or -1."""
+        quotes = '"""' if state == self.IN_DOUBLE_QUOTES else "'''"
+        end = text.find(quotes)
+        if end < 0:
+            self.setFormat(0, len(text), self.string_format)
+            self.setCurrentBlockState(state)
+            return -1
+        self.setFormat(0, end + 3, self.string_format)
+        return end + 3
 
     @catch_and_log
     def highlightBlock(self, text: str) -> None:
-        text = text.replace("\u2028", "\n")
-        for pattern, format_ in self.highlighting_rules:
-            for match in re.finditer(pattern, text):
-                if len(match.regs) < 2:
-                    continue
-                start_end = match.regs[1]
-                self.setFormat(start_end[0], start_end[1] - start_end[0], format_)
+        self.setCurrentBlockState(self.NORMAL)
+        if self.document().characterCount() > self.MAX_DOCUMENT_SIZE:  # type: ignore
+            return
+
+        start = 0
+        previous_state = self.previousBlockState()
+        if previous_state in (self.IN_DOUBLE_QUOTES, self.IN_SINGLE_QUOTES):
+            start = self._continue_long_string(text, previous_state)
+            if start < 0:
+                return
+
+        for match in self.tokenizer.finditer(text, start):
+            kind = match.lastgroup
+            format_ = self.formats[kind]
+            if format_ is None:
+                continue
+            if kind == "long_string_start":
+                self.setFormat(match.start(), len(text) - match.start(), format_)
+                self.setCurrentBlockState(
+                    self.IN_DOUBLE_QUOTES if match.group() == '"""' else self.IN_SINGLE_QUOTES
+                )
+                return
+            self.setFormat(match.start(), match.end() - match.start(), format_)
 
 
 # ====== TextCode ======
@@ -206,122 +761,1237 @@ class QTextCode(QtWidgets.QTextEdit):
         self.syntax_highlighter = PythonSyntaxHighlighter(self.document())
 
 
+# ====== Table ======
+class DatasetTableModel(QtCore.QAbstractTableModel):
+    """Table over a 1D or 2D dataset that reads only the rows that are shown.
+
+    Rows are read by blocks of at most BLOCK_SIZE values, aligned to the chunks
+    of the dataset if they are smaller, by the loader if there is one. The rows
+    of a block being read show PLACEHOLDER. The last `BLOCK_CACHE` blocks are
+    kept in memory. The file is borrowed from h5io.HANDLES for each block, so
+    the table doesn't keep it open.
+    """
+
+    BLOCK_SIZE = 2**16
+    BLOCK_CACHE = 32
+    PLACEHOLDER = "…"
+
+    loader: Optional[Loader] = None
+
+    def __init__(self, file_path: str, key: str, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.key = key
+        with h5io.HANDLES.open(file_path) as file:
+            dataset: h5py.Dataset = file[key]  # type: ignore
+            self.shape = dataset.shape
+            self.block_rows = self._get_block_rows(dataset.chunks)
+        self._blocks: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._pending: Set[int] = set()
+
+    def _get_block_rows(self, chunks: Optional[Tuple[int, ...]]) -> int:
+        columns = self.shape[1] if len(self.shape) == 2 else 1
+        rows = max(1, self.BLOCK_SIZE // max(columns, 1))
+        if chunks and chunks[0] <= rows:
+            # Whole chunks are read at once. Bigger chunks are read by parts, to stay within BLOCK_SIZE
+            rows = rows // chunks[0] * chunks[0]
+        return rows
+
+    def close(self):
+        if self.loader is not None:
+            for block_index in self._pending:
+                self.loader.cancel(self._channel(block_index))
+        self._pending.clear()
+        self._blocks.clear()
+
+    def _channel(self, block_index: int) -> str:
+        return f"table:{id(self)}:{block_index}"
+
+    def read_block(self, block_index: int) -> np.ndarray:
+        """Rows of the block as a 2D array. Runs inside the loader threads."""
+        start = block_index * self.block_rows
+        with h5io.HANDLES.open(self.file_path) as file:
+            values = file[self.key][start : start + self.block_rows]  # type: ignore
+        return values[:, np.newaxis] if values.ndim == 1 else values
+
+    def block(self, block_index: int) -> Optional[np.ndarray]:
+        """Rows of the block, None while they are read by the loader."""
+        if block_index in self._blocks:
+            self._blocks.move_to_end(block_index)
+            return self._blocks[block_index]
+        if self.loader is None:
+            self._store_block(block_index, self.read_block(block_index))
+            return self._blocks[block_index]
+        if block_index not in self._pending:
+            self._pending.add(block_index)
+            self.loader.run(
+                self._channel(block_index), partial(self._block_loaded, block_index), self.read_block, block_index
+            )
+        return None
+
+    def _store_block(self, block_index: int, values: np.ndarray):
+        self._blocks[block_index] = values
+        if len(self._blocks) > self.BLOCK_CACHE:
+            self._blocks.popitem(last=False)
+
+    def _block_loaded(self, block_index: int, values: np.ndarray):
+        if block_index not in self._pending:
+            return
+        self._pending.discard(block_index)
+        self._store_block(block_index, values)
+        first = block_index * self.block_rows
+        last = min(first + self.block_rows, self.rowCount()) - 1
+        if last >= first:
+            self.dataChanged.emit(
+                self.index(first, 0), self.index(last, self.columnCount() - 1), [QtCore.Qt.ItemDataRole.DisplayRole]
+            )
+
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else self.shape[0]
+
+    def columnCount(self, parent=QtCore.QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return self.shape[1] if len(self.shape) == 2 else 1
+
+    def data(self, index: QtCore.QModelIndex, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == QtCore.Qt.ItemDataRole.DisplayRole:
+            block_index, row = divmod(index.row(), self.block_rows)
+            values = self.block(block_index)
+            if values is None:
+                return self.PLACEHOLDER
+            # The dataset could be shrunk since the table was open
+            return str(values[row, index.column()]) if row < len(values) else ""
+        if role == QtCore.Qt.ItemDataRole.TextAlignmentRole:
+            return QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter
+        return None
+
+    def headerData(self, section: int, orientation, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if role == QtCore.Qt.ItemDataRole.DisplayRole:
+            return str(section)
+        return None
+
+
+class QTableDataset(QtWidgets.QTableView):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        header = self.verticalHeader()
+        header.setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Fixed)
+        header.setDefaultSectionSize(self.fontMetrics().height() + 6)
+        self.setVisible(False)
+
+
 # ====== FindField ======
+def find_matches(text: str, query: str, regex: bool = False, case_sensitive: bool = False) -> List[Tuple[int, int]]:
+    """(start, end) of the first MAX_MATCHES matches of the query. Positions are counted as in QTextDocument.
+
+    Raises re.error if the regex is not valid.
+    """
+    if not query:
+        return []
+    pattern = re.compile(query if regex else re.escape(query), 0 if case_sensitive else re.IGNORECASE)
+    matches = []
+    for match in pattern.finditer(text):
+        if match.end() > match.start():
+            matches.append((match.start(), match.end()))
+            if len(matches) >= QFindBar.MAX_MATCHES:
+                break
+    if matches and len(text.encode("utf-16-le")) != 2 * len(text):
+        # Characters outside of the BMP take two positions inside QTextDocument
+        astral = [i for i, char in enumerate(text) if ord(char) > 0xFFFF]
+        matches = [
+            (start + bisect.bisect_left(astral, start), end + bisect.bisect_left(astral, end)) for start, end in matches
+        ]
+    return matches
+
+
 class QFindField(QtWidgets.QLineEdit):
+    previous_requested = QtCore.pyqtSignal()
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setVisible(False)
         self.setPlaceholderText("Find")
 
+    def keyPressEvent(self, event):
+        if event.key() in (QtCore.Qt.Key.Key_Return, QtCore.Qt.Key.Key_Enter) and (
+            event.modifiers() & QtCore.Qt.KeyboardModifier.ShiftModifier
+        ):
+            self.previous_requested.emit()
+            return
+        super().keyPressEvent(event)
+
+
+class QFindBar(QtWidgets.QWidget):
+    """Find as you type inside the text_edit.
+
+    All the matches are highlighted and Enter/Shift+Enter go to the next/previous one.
+    Matches of documents longer than THREAD_SIZE are found by the loader,
+    so the typing is not blocked.
+    """
+
+    DEBOUNCE_MS = 150
+    THREAD_SIZE = 200_000
+    MAX_MATCHES = 100_000
+    # Only the matches around the current one are highlighted
+    MAX_HIGHLIGHTS = 1000
+
+    loader: Optional[Loader] = None
+    # Move to the match found after the query was changed, but not after the text was changed
+    follow = False
+
+    def __init__(self, text_edit: QtWidgets.QTextEdit, parent=None):
+        super().__init__(parent)
+        self.text_edit = text_edit
+        self.matches: List[Tuple[int, int]] = []
+        self.current = -1
+        self.invalid_regex = False
+
+        self.field = QFindField()
+        self.field.returnPressed.connect(lambda: self.go(1))
+        self.field.previous_requested.connect(lambda: self.go(-1))
+        self.regex = QtWidgets.QCheckBox(".*")
+        self.regex.setToolTip("Regular expression")
+        self.case_sensitive = QtWidgets.QCheckBox("Aa")
+        self.case_sensitive.setToolTip("Case sensitive")
+        self.count_label = QtWidgets.QLabel()
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.DEBOUNCE_MS)
+        self.timer.timeout.connect(self.search)
+        self.field.textChanged.connect(self.query_changed)
+        self.regex.toggled.connect(self.query_changed)
+        self.case_sensitive.toggled.connect(self.query_changed)
+        self.text_edit.textChanged.connect(self.schedule)
+
+        lay = QtWidgets.QHBoxLayout()
+        lay.setContentsMargins(0, 0, 0, 0)
+        lay.addWidget(self.field, 1)
+        lay.addWidget(self.regex)
+        lay.addWidget(self.case_sensitive)
+        lay.addWidget(self.count_label)
+        self.setLayout(lay)
+        self.setVisible(False)
+
+    def query_changed(self, *_):
+        self.follow = True
+        self.schedule()
+
+    def schedule(self, *_):
+        if self.isVisible():
+            self.timer.start()
+
+    def setVisible(self, visible: bool):  # pylint: disable=C0103
+        super().setVisible(visible)
+        if visible:
+            self.field.setFocus()
+            self.field.selectAll()
+            self.schedule()
+        else:
+            self.timer.stop()
+            if self.loader is not None:
+                self.loader.cancel("find")
+            self.set_matches([], self.text_edit.document().revision())  # type: ignore
+
+    @catch_and_log
+    def search(self):
+        text = self.text_edit.toPlainText()
+        revision = self.text_edit.document().revision()  # type: ignore
+        args = (text, self.field.text(), self.regex.isChecked(), self.case_sensitive.isChecked())
+        if self.loader is None or len(text) < self.THREAD_SIZE:
+            try:
+                self.set_matches(find_matches(*args), revision)
+            except re.error:
+                self.set_matches(None, revision)
+            return
+        self.count_label.setText("Searching...")
+        self.loader.run("find", partial(self.set_matches, revision=revision), self._find_matches, *args)
+
+    @staticmethod
+    def _find_matches(*args) -> Optional[List[Tuple[int, int]]]:
+        try:
+            return find_matches(*args)
+        except re.error:
+            return None
+
+    def set_matches(self, matches: Optional[List[Tuple[int, int]]], revision: int):
+        """Matches found in the document `revision`. None means that the regex is invalid."""
+        if revision != self.text_edit.document().revision():  # type: ignore
+            # The text was changed meanwhile, a new search is already scheduled
+            return
+        self.matches = matches or []
+        self.invalid_regex = matches is None
+        position = self.text_edit.textCursor().selectionStart()
+        self.current = bisect.bisect_left(self.matches, (position, 0)) % len(self.matches) if self.matches else -1
+        self.show_current(move_cursor=self.follow)
+        self.follow = False
+
+    def go(self, step: int):
+        if not self.matches:
+            return
+        self.current = (self.current + step) % len(self.matches)
+        self.show_current()
+
+    def show_current(self, move_cursor: bool = True):
+        if self.matches:
+            suffix = "+" if len(self.matches) >= self.MAX_MATCHES else ""
+            self.count_label.setText(f"{self.current + 1}/{len(self.matches)}{suffix}")
+        elif self.field.text():
+            self.count_label.setText("Invalid regex" if self.invalid_regex else "No results")
+        else:
+            self.count_label.setText("")
+
+        selections = []
+        first = max(0, self.current - self.MAX_HIGHLIGHTS // 2)
+        for index, (start, end) in enumerate(self.matches[first : first + self.MAX_HIGHLIGHTS], start=first):
+            selection = QtWidgets.QTextEdit.ExtraSelection()
+            selection.format.setBackground(QtGui.QColor("#FF9632" if index == self.current else "#FFFF00"))
+            cursor = self.text_edit.textCursor()
+            cursor.setPosition(start)
+            cursor.setPosition(end, QtGui.QTextCursor.MoveMode.KeepAnchor)
+            selection.cursor = cursor
+            selections.append(selection)
+        self.text_edit.setExtraSelections(selections)
+
+        if move_cursor and self.matches:
+            start, end = self.matches[self.current]
+            cursor = self.text_edit.textCursor()
+            cursor.setPosition(start)
+            cursor.setPosition(end, QtGui.QTextCursor.MoveMode.KeepAnchor)
+            self.text_edit.setTextCursor(cursor)
+            self.text_edit.ensureCursorVisible()
+
+
+# ====== Pager ======
+class QPager(QtWidgets.QWidget):
+    """Navigation between the pages of a dataset that is too big to be shown at once."""
+
+    page_requested = QtCore.pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.page = 0
+        self.page_count = 1
+
+        lay = QtWidgets.QHBoxLayout()
+        lay.setContentsMargins(0, 0, 0, 0)
+        self.label = QtWidgets.QLabel()
+        self.buttons = []
+        for text, step in (("<<", None), ("<", -1), (">", 1), (">>", None)):
+            button = QtWidgets.QPushButton(text)
+            button.clicked.connect(partial(self.go, text, step))
+            self.buttons.append(button)
+        for button in self.buttons[:2]:
+            lay.addWidget(button)
+        lay.addWidget(self.label, 1, QtCore.Qt.AlignmentFlag.AlignCenter)
+        for button in self.buttons[2:]:
+            lay.addWidget(button)
+        self.setLayout(lay)
+        self.setVisible(False)
+
+    def go(self, text: str, step: Optional[int], *_):
+        if step is None:
+            page = 0 if text == "<<" else self.page_count - 1
+        else:
+            page = self.page + step
+        if 0 <= page < self.page_count and page != self.page:
+            self.page_requested.emit(page)
+
+    def set_page(self, page: int, page_count: int):
+        self.page, self.page_count = page, page_count
+        self.label.setText(f"Page {page + 1} / {page_count}")
+        self.setVisible(page_count > 1)
+
+
+# ====== Plot ======
+class PlotWidget(QtWidgets.QWidget):
+    """Plot of a numeric dataset drawn from its min/max envelope.
+
+    The wheel zooms around the cursor, dragging pans, a double click shows the
+    whole dataset. The envelope is drawn scaled at once, and a new one at the
+    resolution of the view is requested after the view stops changing.
+    """
+
+    # start, stop, bins
+    range_requested = QtCore.pyqtSignal(int, int, int)
+
+    COLORS = ("#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f")
+    MARGINS = QtCore.QMargins(60, 10, 40, 25)
+    TICKS = 5
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.key: Optional[str] = None
+        self.length = 0
+        self.x_range = (0.0, 1.0)
+        self.envelope: Optional[h5io.Envelope] = None
+        self._drag_x: Optional[float] = None
+        self.request_timer = QtCore.QTimer(self)
+        self.request_timer.setSingleShot(True)
+        self.request_timer.setInterval(100)
+        self.request_timer.timeout.connect(self._request)
+        self.setMinimumHeight(150)
+        self.setVisible(False)
+
+    def set_dataset(self, key: str, length: int):
+        self.key, self.length = key, length
+        self.envelope = None
+        self.x_range = (0.0, float(length))
+        self.request_timer.start(0)
+
+    def set_envelope(self, envelope: h5io.Envelope):
+        if envelope.key == self.key:
+            self.envelope = envelope
+            self.update()
+
+    def plot_rect(self) -> QtCore.QRectF:
+        return QtCore.QRectF(self.rect().marginsRemoved(self.MARGINS))
+
+    def _request(self):
+        if self.key is None or not self.isVisible():
+            return
+        start, stop = int(np.floor(self.x_range[0])), int(np.ceil(self.x_range[1])) + 1
+        self.range_requested.emit(start, stop, max(int(self.plot_rect().width()), 1))
+
+    def set_x_range(self, x0: float, x1: float):
+        span = min(max(x1 - x0, 10.0), float(max(self.length, 1)))
+        x0 = min(max(x0, 0.0), max(self.length - span, 0.0))
+        self.x_range = (x0, x0 + span)
+        self.update()
+        self.request_timer.start()
+
+    def _y_range(self) -> Tuple[float, float]:
+        envelope = self.envelope
+        if envelope is None:
+            return 0.0, 1.0
+        visible = (envelope.x + envelope.bin_size > self.x_range[0]) & (envelope.x < self.x_range[1])
+        with np.errstate(invalid="ignore"):
+            y0 = np.nanmin(envelope.ymin[visible], initial=np.inf)
+            y1 = np.nanmax(envelope.ymax[visible], initial=-np.inf)
+        if not np.isfinite(y0) or not np.isfinite(y1):
+            return 0.0, 1.0
+        if y0 == y1:
+            return y0 - 0.5, y1 + 0.5
+        margin = (y1 - y0) * 0.05
+        return y0 - margin, y1 + margin
+
+    def paintEvent(self, event):  # pylint: disable=invalid-name
+        del event
+        painter = QtGui.QPainter(self)
+        rect = self.plot_rect()
+        foreground = self.palette().color(QtGui.QPalette.ColorRole.Text)
+        painter.setPen(foreground)
+        painter.drawRect(rect)
+        if self.key is None or rect.width() <= 0 or rect.height() <= 0:
+            return
+        (x0, x1), (y0, y1) = self.x_range, self._y_range()
+
+        def to_x(x):
+            return rect.left() + (x - x0) / (x1 - x0) * rect.width()
+
+        def to_y(y):
+            return rect.bottom() - (y - y0) / (y1 - y0) * rect.height()
+
+        for i in range(self.TICKS):
+            x, y = x0 + (x1 - x0) * i / (self.TICKS - 1), y0 + (y1 - y0) * i / (self.TICKS - 1)
+            painter.drawText(
+                QtCore.QRectF(to_x(x) - 50, rect.bottom() + 3, 100, 20),
+                QtCore.Qt.AlignmentFlag.AlignHCenter | QtCore.Qt.AlignmentFlag.AlignTop, f"{x:.6g}"
+            )
+            painter.drawText(
+                QtCore.QRectF(0, to_y(y) - 10, rect.left() - 5, 20),
+                QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter, f"{y:.4g}"
+            )
+
+        envelope = self.envelope
+        if envelope is None:
+            return
+        painter.setClipRect(rect)
+        painter.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing, envelope.bin_size == 1)
+        # Each bin is drawn as a vertical segment from its min to its max, joined to the next bin
+        xs = to_x(envelope.x + (envelope.bin_size - 1) / 2)
+        for curve in range(envelope.ymin.shape[1]):
+            ys = np.column_stack((to_y(envelope.ymin[:, curve]), to_y(envelope.ymax[:, curve]))).ravel()
+            points = np.column_stack((np.repeat(xs, 2), ys))
+            points = points[np.isfinite(ys)]
+            painter.setPen(QtGui.QColor(self.COLORS[curve % len(self.COLORS)]))
+            painter.drawPolyline(QtGui.QPolygonF([QtCore.QPointF(x, y) for x, y in points]))
+
+    def wheelEvent(self, event):  # pylint: disable=invalid-name
+        rect = self.plot_rect()
+        if self.key is None or rect.width() <= 0:
+            return
+        x0, x1 = self.x_range
+        center = x0 + (event.position().x() - rect.left()) / rect.width() * (x1 - x0)
+        factor = 0.8 ** (event.angleDelta().y() / 120)
+        self.set_x_range(center - (center - x0) * factor, center + (x1 - center) * factor)
+
+    def mousePressEvent(self, event):  # pylint: disable=invalid-name
+        self._drag_x = event.position().x()
+
+    def mouseMoveEvent(self, event):  # pylint: disable=invalid-name
+        rect = self.plot_rect()
+        if self._drag_x is None or rect.width() <= 0:
+            return
+        x0, x1 = self.x_range
+        shift = (self._drag_x - event.position().x()) / rect.width() * (x1 - x0)
+        self._drag_x = event.position().x()
+        self.set_x_range(x0 + shift, x1 + shift)
+
+    def mouseReleaseEvent(self, event):  # pylint: disable=invalid-name
+        del event
+        self._drag_x = None
+
+    def mouseDoubleClickEvent(self, event):  # pylint: disable=invalid-name
+        del event
+        self.set_x_range(0.0, float(self.length))
+
+    def resizeEvent(self, event):  # pylint: disable=invalid-name
+        super().resizeEvent(event)
+        self.request_timer.start()
+
+    def showEvent(self, event):  # pylint: disable=invalid-name
+        super().showEvent(event)
+        self.request_timer.start(0)
+
+
+def thumbnail_image(thumbnail: np.ndarray) -> QtGui.QImage:
+    """Grayscale image of the thumbnail scaled from its min (black) to its max (white). NaN are black."""
+    with np.errstate(invalid="ignore"):
+        low, high = np.nanmin(thumbnail, initial=np.inf), np.nanmax(thumbnail, initial=-np.inf)
+        scale = 255 / (high - low) if np.isfinite(low) and high > low else 0
+        pixels = np.nan_to_num((thumbnail - low) * scale, nan=0, posinf=0, neginf=0)
+    pixels = np.ascontiguousarray(pixels.clip(0, 255).astype(np.uint8))
+    height, width = pixels.shape
+    return QtGui.QImage(pixels.tobytes(), width, height, width, QtGui.QImage.Format.Format_Grayscale8).copy()
+
 
 class CentralWidget(QtWidgets.QWidget):
+    # Size in pixels of the thumbnails of the 2D datasets
+    THUMBNAIL_SIZE = 256
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.table_text = ""
         self.lay = QtWidgets.QVBoxLayout()
 
-        self.find_field = QFindField()
-        self.find_field.returnPressed.connect(self.find_text)
-        self.lay.addWidget(self.find_field)
-
         self.text_edit = QTextCode()  # QtWidgets.QTextEdit()
         self.text_edit.setAcceptDrops(False)
+
+        self.find_bar = QFindBar(self.text_edit)
+        self.find_field = self.find_bar.field
+        self.lay.addWidget(self.find_bar)
         self.lay.addWidget(self.text_edit)
 
+        self.table_info = QtWidgets.QLabel()
+        self.table_info.setVisible(False)
+        self.lay.addWidget(self.table_info)
+
+        self.thumbnail = QtWidgets.QLabel()
+        self.thumbnail.setVisible(False)
+        self.lay.addWidget(self.thumbnail)
+
+        self.table = QTableDataset()
+        self.lay.addWidget(self.table)
+
+        self.plot = PlotWidget()
+        self.lay.addWidget(self.plot, 1)
+
+        self.plot_button = QtWidgets.QPushButton("Plot")
+        self.plot_button.setCheckable(True)
+        self.plot_button.setVisible(False)
+        self.plot_button.toggled.connect(self._show_plot)
+        self.lay.addWidget(self.plot_button)
+
         self.run_analysis_button = QtWidgets.QPushButton("Run analysis")
         self.run_analysis_button.setVisible(False)
         self.lay.addWidget(self.run_analysis_button)
 
+        self.stop_analysis_button = QtWidgets.QPushButton("Stop analysis")
+        self.stop_analysis_button.setVisible(False)
+        self.lay.addWidget(self.stop_analysis_button)
+
+        self.restart_kernel_button = QtWidgets.QPushButton("Restart analysis kernel")
+        self.restart_kernel_button.setToolTip("Import init_analyse.py again on the next run")
+        self.restart_kernel_button.setVisible(False)
+        self.lay.addWidget(self.restart_kernel_button)
+
         self.preview_button = QtWidgets.QPushButton("Show preview")
         self.preview_button.setVisible(False)
         self.lay.addWidget(self.preview_button)
 
+        self.pager = QPager()
+        self.lay.addWidget(self.pager)
+
         self.setLayout(self.lay)
 
-    def find_text(self):
-        text_to_find = self.find_field.text()
+    def set_table(self, model: Optional[DatasetTableModel], info: str = ""):
+        """Show the table with the `model` instead of the text, or back the text if model is None."""
+        old_model = self.table.model()
+        self.table.setModel(model)
+        if isinstance(old_model, DatasetTableModel):
+            old_model.close()
+            old_model.deleteLater()
+        self.table_info.setText(info)
+        self.table_info.setVisible(model is not None)
+        self.table.setVisible(model is not None)
+        self.text_edit.setVisible(model is None)
+        self.table_text = info
+        self.thumbnail.setVisible(False)
+        self.set_plot(None)
+
+    def set_summary(self, model: DatasetTableModel, summary: thumbnails.Summary):
+        """Show the thumbnail and the statistics of the 2D dataset of the table `model`."""
+        if self.table.model() is not model:
+            # Another dataset was selected while the summary was computed
+            return
+        self.table_info.setText(f"{self.table_text}, {summary.describe()}")
+        self.thumbnail.setPixmap(
+            QtGui.QPixmap.fromImage(thumbnail_image(summary.thumbnail)).scaled(
+                self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE,
+                QtCore.Qt.AspectRatioMode.KeepAspectRatio, QtCore.Qt.TransformationMode.FastTransformation
+            )
+        )
+        self.thumbnail.setVisible(True)
 
-        cursor = self.text_edit.textCursor()
-        if cursor.hasSelection():
-            start = cursor.selectionEnd()
+    def set_plot(self, key: Optional[str], length: int = 0):
+        """Allow to plot the dataset `key` instead of its table, or forbid the plot if key is None."""
+        self.plot_button.setVisible(key is not None)
+        if key is not None:
+            self.plot.set_dataset(key, length)
         else:
-            start = 0
-        text = self.text_edit.toPlainText()[start:]
-        pos = text.find(text_to_find)
-        if pos < 0:
-            if start > 0:
-                cursor.clearSelection()
-                self.text_edit.setTextCursor(cursor)
-                return self.find_text()
-            return
-        cursor.setPosition(pos + start)
-        cursor.select(cursor.SelectionType.WordUnderCursor)
-        self.setFocus()
-        self.text_edit.setFocus()
-        self.text_edit.setTextCursor(cursor)
-        self.text_edit.ensureCursorVisible()
-        self.find_field.setFocus()
+            self.plot.key = None
+        self._show_plot(self.plot_button.isChecked())
+
+    def _show_plot(self, checked: bool):
+        show = checked and self.plot.key is not None
+        self.plot.setVisible(show)
+        self.table.setVisible(not show and self.table.model() is not None)
 
 
 # ====== Left menu ======
-class TreeWidgetItem(QtWidgets.QTreeWidgetItem):
-    def __init__(self, parent, txt):
+class H5TreeModel(QtCore.QAbstractItemModel):
+    """Model of the keys of the file, read from the file on demand.
+
+    Nodes are stored in flat lists indexed by the node id (the id is kept as
+    the internalId of the QModelIndex). Node 0 is the root of the file.
+    Children of a group are listed the first time the view asks for them and
+    are inserted by batches of `FETCH_BATCH` rows.
+    """
+
+    GROUP, DATASET, OUTLINE = range(3)
+    # Kind of the nodes removed from the tree by sync()
+    REMOVED = -1
+    FETCH_BATCH = 1000
+
+    file_path: Optional[str] = None
+    loader: Optional[Loader] = None
+
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.setText(0, txt)
+        self._cached_tree: recent.KeyTree = {}
+        self._init_nodes()
+
+    def _init_nodes(self):
+        self._names: List[str] = [""]
+        self._parents: List[int] = [-1]
+        self._rows: List[int] = [0]
+        self._kinds: List[int] = [self.GROUP]
+        # None means that the children were not listed yet
+        self._children: List[Optional[List[int]]] = [None]
+        # Children that were listed, but not yet inserted into the model
+        self._pending: Dict[int, List[Tuple[str, int]]] = {}
+        # Groups which children are being listed by the loader
+        self._loading: Set[int] = set()
+        # Path being found by find() and the callback of its index
+        self._finding: Optional[Tuple[List[str], Callable[[QtCore.QModelIndex], None]]] = None
+
+    def set_file(
+        self,
+        file_path: Optional[str],
+        children: Optional[List[Tuple[str, bool]]] = None,
+        cached_tree: Optional[recent.KeyTree] = None,
+    ):
+        """Show the `file_path`. Top-level `children` can be given if they were already listed.
+
+        Groups inside the `cached_tree` are not listed again when they are expanded.
+        """
+        self.beginResetModel()
+        self._init_nodes()
+        self.file_path = file_path
+        self._cached_tree = dict(cached_tree or {})
+        if children is None:
+            children = self._cached_tree.pop("", None)
+        if children is not None:
+            self._children[0] = []
+            self._pending[0] = self._to_nodes(children)
+        self.endResetModel()
+
+    def listed_tree(self) -> recent.KeyTree:
+        """Children of all the groups listed so far, to be cached."""
+        tree = dict(self._cached_tree)
+        for node, children in enumerate(self._children):
+            if self._kinds[node] != self.GROUP or children is None or node in self._loading:
+                continue
+            names = [(self._names[child], self._kinds[child] == self.GROUP) for child in children]
+            names += [(name, kind == self.GROUP) for name, kind in self._pending.get(node, [])]
+            tree["/".join(self.path(self.node_index(node)))] = names
+        return tree
+
+    def _list_children(self, node: int) -> List[Tuple[str, bool]]:
+        key = "/".join(self.path(self.node_index(node)))
+        if key in self._cached_tree:
+            return self._cached_tree.pop(key)
+        return h5io.list_children(self.file_path, key)  # type: ignore
+
+    # ====== Nodes ======
+    def node(self, index: QtCore.QModelIndex) -> int:
+        return index.internalId() if index.isValid() else 0
+
+    def node_index(self, node: int) -> QtCore.QModelIndex:
+        if node == 0:
+            return QtCore.QModelIndex()
+        return self.createIndex(self._rows[node], 0, node)
+
+    def kind(self, index: QtCore.QModelIndex) -> int:
+        return self._kinds[self.node(index)]
+
+    def name(self, index: QtCore.QModelIndex) -> str:
+        return self._names[self.node(index)]
+
+    def path(self, index: QtCore.QModelIndex) -> List[str]:
+        """Names from the root to the node."""
+        node = self.node(index)
+        names = []
+        while node > 0:
+            names.append(self._names[node])
+            node = self._parents[node]
+        return names[::-1]
+
+    def key(self, index: QtCore.QModelIndex) -> str:
+        """Key of the node inside the file. Outline nodes return the key of their dataset."""
+        node = self.node(index)
+        while self._kinds[node] == self.OUTLINE:
+            node = self._parents[node]
+        return "/".join(self.path(self.node_index(node)))
+
+    def _add_children(self, parent: int, children: List[Tuple[str, int]]):
+        parent_index = self.node_index(parent)
+        nodes = self._children[parent]
+        if nodes is None:
+            nodes = self._children[parent] = []
+        first = len(nodes)
+        self.beginInsertRows(parent_index, first, first + len(children) - 1)
+        for row, (name, kind) in enumerate(children, start=first):
+            nodes.append(len(self._names))
+            self._names.append(name)
+            self._parents.append(parent)
+            self._rows.append(row)
+            self._kinds.append(kind)
+            self._children.append(None if kind == self.GROUP else [])
+        self.endInsertRows()
+
+    def _to_nodes(self, children: List[Tuple[str, bool]]) -> List[Tuple[str, int]]:
+        return [(name, self.GROUP if is_group else self.DATASET) for name, is_group in children]
+
+    def _children_listed(self, node: int, file_path: str, children: List[Tuple[str, bool]]):
+        if file_path != self.file_path or node not in self._loading:
+            return
+        self._loading.discard(node)
+        self._pending[node] = self._to_nodes(children)
+        self.fetchMore(self.node_index(node))
+        if self._finding is not None:
+            self._continue_find()
+
+    # ====== Sync with the file ======
+    def listed_groups(self) -> Dict[int, str]:
+        """Keys of the groups which children were listed, by their node."""
+        return {
+            node: "/".join(self.path(self.node_index(node)))
+            for node, children in enumerate(self._children)
+            if self._kinds[node] == self.GROUP and children is not None and node not in self._loading
+        }
 
+    def sync(self, file_path: str, listed: Dict[int, Optional[List[Tuple[str, bool]]]]):
+        """Update the groups to their children `listed` again. Only the changed rows are inserted or removed,
+        so the expanded and selected items are kept."""
+        if file_path != self.file_path:
+            return
+        self._cached_tree = {}
+        for node, children in listed.items():
+            if self._kinds[node] == self.GROUP and children is not None and node not in self._loading:
+                self._sync_children(node, dict(self._to_nodes(children)))
+
+    def _sync_children(self, node: int, kinds: Dict[str, int]):
+        nodes: List[int] = self._children[node]  # type: ignore
+        for row in reversed(range(len(nodes))):
+            if kinds.get(self._names[nodes[row]]) != self._kinds[nodes[row]]:
+                self._remove_row(node, row)
+
+        had_pending = node in self._pending
+        pending = [(name, kind) for name, kind in self._pending.pop(node, []) if kinds.get(name) == kind]
+        known = {self._names[child] for child in nodes} | {name for name, _ in pending}
+        last_name = self._names[nodes[-1]] if nodes else None
+        for name, kind in sorted(kinds.items()):
+            if name in known:
+                continue
+            if last_name is not None and name < last_name:
+                names = [self._names[child] for child in nodes]
+                self._insert_row(node, bisect.bisect_left(names, name), name, kind)
+            else:
+                # New names after the shown rows are inserted by batches as the listed ones
+                bisect.insort(pending, (name, kind))
+        if pending:
+            self._pending[node] = pending
+            if not had_pending:
+                self.fetchMore(self.node_index(node))
+
+    def _insert_row(self, parent: int, row: int, name: str, kind: int):
+        nodes: List[int] = self._children[parent]  # type: ignore
+        self.beginInsertRows(self.node_index(parent), row, row)
+        nodes.insert(row, len(self._names))
+        self._names.append(name)
+        self._parents.append(parent)
+        self._rows.append(row)
+        self._kinds.append(kind)
+        self._children.append(None if kind == self.GROUP else [])
+        for next_row in range(row + 1, len(nodes)):
+            self._rows[nodes[next_row]] = next_row
+        self.endInsertRows()
+
+    def _remove_row(self, parent: int, row: int):
+        nodes: List[int] = self._children[parent]  # type: ignore
+        self.beginRemoveRows(self.node_index(parent), row, row)
+        removed = [nodes.pop(row)]
+        for next_row in range(row, len(nodes)):
+            self._rows[nodes[next_row]] = next_row
+        while removed:
+            node = removed.pop()
+            self._kinds[node] = self.REMOVED
+            self._pending.pop(node, None)
+            self._loading.discard(node)
+            removed.extend(self._children[node] or ())
+        self.endRemoveRows()
+
+    def add_outline(self, index: QtCore.QModelIndex, names: List[str]):
+        node = self.node(index)
+        if self._kinds[node] != self.DATASET or self._children[node] or not names:
+            return
+        self._add_children(node, [(name, self.OUTLINE) for name in names])
 
-class StructureWidget(QtWidgets.QTreeWidget):
-    last_tree_index = None
+    def find(self, path: List[str], on_found: Callable[[QtCore.QModelIndex], None]):
+        """Call `on_found` with the index of the node with the `path`, or with an invalid index.
+
+        The missing groups of the path are listed by the loader, so `on_found` may be called later.
+        A new find replaces the previous one if it's still waiting.
+        """
+        self._finding = (path, on_found)
+        self._continue_find()
+
+    def _continue_find(self):
+        path, on_found = self._finding  # type: ignore
+        node = 0
+        for name in path:
+            if self._kinds[node] != self.GROUP:
+                break
+            if self._children[node] is None or node in self._loading:
+                # _children_listed continues the search once the group is listed
+                if node not in self._loading:
+                    self.fetchMore(self.node_index(node))
+                return
+            children: List[int] = self._children[node]  # type: ignore
+            found = [child for child in children if self._names[child] == name]
+            while not found and node in self._pending:
+                first = len(children)
+                self.fetchMore(self.node_index(node))
+                found = [child for child in children[first:] if self._names[child] == name]
+            if not found:
+                break
+            node = found[0]
+        else:
+            self._finding = None
+            on_found(self.node_index(node))
+            return
+        self._finding = None
+        on_found(QtCore.QModelIndex())
+
+    # ====== QAbstractItemModel ======
+    def index(self, row: int, column: int, parent=QtCore.QModelIndex()) -> QtCore.QModelIndex:
+        children = self._children[self.node(parent)]
+        if column != 0 or children is None or not 0 <= row < len(children):
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, children[row])
+
+    def parent(self, index: QtCore.QModelIndex) -> QtCore.QModelIndex:  # type: ignore
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        return self.node_index(self._parents[index.internalId()])
+
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        return len(self._children[self.node(parent)] or ())
+
+    def columnCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 1
+
+    def hasChildren(self, parent=QtCore.QModelIndex()) -> bool:
+        node = self.node(parent)
+        if self._children[node] is None or node in self._pending or node in self._loading:
+            return self._kinds[node] == self.GROUP and self.file_path is not None
+        return len(self._children[node]) > 0  # type: ignore
+
+    def data(self, index: QtCore.QModelIndex, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if index.isValid() and role == QtCore.Qt.ItemDataRole.DisplayRole:
+            return self._names[index.internalId()]
+        return None
+
+    def canFetchMore(self, parent: QtCore.QModelIndex) -> bool:
+        node = self.node(parent)
+        if self.file_path is None or self._kinds[node] != self.GROUP or node in self._loading:
+            return False
+        return self._children[node] is None or node in self._pending
+
+    def fetchMore(self, parent: QtCore.QModelIndex) -> None:
+        node = self.node(parent)
+        if self._children[node] is None:
+            self._children[node] = []
+            self._loading.add(node)
+            key = "/".join(self.path(parent))
+            on_result = partial(self._children_listed, node, self.file_path)
+            if key in self._cached_tree:
+                on_result(self._cached_tree.pop(key))
+            elif self.loader is None:
+                on_result(h5io.list_children(self.file_path, key))  # type: ignore
+            else:
+                self.loader.run(None, on_result, h5io.list_children, self.file_path, key)
+            return
+        pending = self._pending.pop(node, [])
+        if len(pending) > self.FETCH_BATCH:
+            self._pending[node] = pending[self.FETCH_BATCH:]
+            pending = pending[: self.FETCH_BATCH]
+        if pending:
+            self._add_children(node, pending)
+
+
+class StructureWidget(QtWidgets.QTreeView):
+    """Tree of the keys of the file backed by the H5TreeModel.
+
+    Each tab of the window has its own StructureWidget, which also keeps the
+    state of the file shown in the tab.
+    """
+
+    last_tree_index: Optional[QtCore.QPersistentModelIndex] = None
+    file_path: Optional[str] = None
+    data: Optional[SyncData] = None
+    # (mtime, size) of the file when its tree was listed
+    file_state: Optional[Tuple[float, int]] = None
+    # Key to select once the file being opened is loaded
+    pending_keys: Optional[List[str]] = None
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setHeaderHidden(True)
+        self.setUniformRowHeights(True)
+        self.tree_model = H5TreeModel(self)
+        self.setModel(self.tree_model)
+        self.last_tree_structure = ["none"]
 
-    def get_row_tree_reversed(self, index: QtCore.QModelIndex) -> List[str]:
-        # print("get_row_tree", index, index.data())
-        info = [index.data()]
-        if index.parent().isValid():
-            info.extend(self.get_row_tree_reversed(index.parent()))
-        return info
-
-    def get_row_tree(self, index) -> List[str]:
-        info = list(reversed(self.get_row_tree_reversed(index)))
-        # print("info", info)
-        return info
+    def get_row_tree(self, index: QtCore.QModelIndex) -> List[str]:
+        return self.tree_model.path(index)
 
-    def update(self, structure: dict):
-        # print("structure", structure)
-        self.clear()
-        self.add_to_node(self, structure)
-        self.collapseAll()
+    def update(  # type: ignore
+        self,
+        file_path: str,
+        children: Optional[List[Tuple[str, bool]]] = None,
+        cached_tree: Optional[recent.KeyTree] = None,
+    ):
+        self.last_tree_index = None
+        self.tree_model.set_file(file_path, children, cached_tree)
 
     def clear(self) -> None:
         self.last_tree_index = None
-        return super().clear()
-
-    def add_to_node(self, node, structure: dict, path=None):
-        if path is None:
-            path = [0]
-        structure = sorted(list(structure.items()))
-        for i, (key, value) in enumerate(structure):
-            path[-1] = i
-            row = TreeWidgetItem(node, key)
-            if isinstance(value, dict):
-                self.add_to_node(row, value, path)
+        self.tree_model.set_file(None)
+
+    @catch_and_log
+    def fetch_children(self, index: QtCore.QModelIndex):
+        if self.tree_model.canFetchMore(index):
+            self.tree_model.fetchMore(index)
 
     def close_last_open_tree_item(self):
-        if self.last_tree_index is None:
+        if self.last_tree_index is None or not self.last_tree_index.isValid():
             return
-        last_item = self.itemFromIndex(self.last_tree_index)
-        if has_outline(last_item.text(0)):
-            self.collapse(self.last_tree_index)
+        last_index = QtCore.QModelIndex(self.last_tree_index)
+        if has_outline(self.tree_model.name(last_index)):
+            self.collapse(last_index)
+
+
+# ====== Folder browser ======
+class FolderModel(QtCore.QAbstractTableModel):
+    """The `.h5` files of a folder and its subfolders.
+
+    The number of top-level keys is read only for the rows that are shown,
+    by batches of PEEK_BATCH files inside the loader.
+    """
+
+    COLUMNS = ("Name", "Modified", "Size", "Keys")
+    PEEK_BATCH = 200
+
+    loader: Optional[Loader] = None
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.folder: Optional[str] = None
+        self.entries: List[h5io.FileEntry] = []
+        # Number of keys by (path, mtime). None means that the file cannot be read
+        self.key_counts: Dict[Tuple[str, float], Optional[int]] = {}
+        self._to_peek: Dict[str, float] = {}
+        self._peeking: Set[str] = set()
+        self._sort = (1, QtCore.Qt.SortOrder.DescendingOrder)
+        self.peek_timer = QtCore.QTimer(self)
+        self.peek_timer.setSingleShot(True)
+        self.peek_timer.timeout.connect(self._peek)
+
+    def set_entries(self, folder: str, entries: List[h5io.FileEntry]):
+        self.beginResetModel()
+        self.folder = folder
+        self.entries = entries
+        self._to_peek.clear()
+        self._sort_entries()
+        self.endResetModel()
+
+    def entry(self, index: QtCore.QModelIndex) -> h5io.FileEntry:
+        return self.entries[index.row()]
+
+    def key_count(self, entry: h5io.FileEntry) -> Optional[int]:
+        count = self.key_counts.get((entry.path, entry.mtime), -1)
+        if count == -1 and entry.path not in self._peeking:
+            self._to_peek[entry.path] = entry.mtime
+            self.peek_timer.start(0)
+        return count
+
+    @catch_and_log
+    def _peek(self):
+        if self.loader is None or not self._to_peek:
+            return
+        paths = list(self._to_peek)[: self.PEEK_BATCH]
+        batch = {path: self._to_peek.pop(path) for path in paths}
+        self._peeking.update(paths)
+        self.loader.run(None, partial(self._peeked, batch), h5io.peek_key_counts, paths)
+
+    def _peeked(self, batch: Dict[str, float], counts: Dict[str, Optional[int]]):
+        self._peeking.difference_update(batch)
+        for path, mtime in batch.items():
+            self.key_counts[(path, mtime)] = counts.get(path)
+        if self.entries:
+            self.dataChanged.emit(self.index(0, 3), self.index(len(self.entries) - 1, 3))
+        if self._to_peek:
+            self.peek_timer.start(0)
+
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.entries)
+
+    def columnCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def data(self, index: QtCore.QModelIndex, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.entries[index.row()]
+        if role == QtCore.Qt.ItemDataRole.ToolTipRole:
+            return entry.path
+        if role != QtCore.Qt.ItemDataRole.DisplayRole:
+            return None
+        column = index.column()
+        if column == 0:
+            return osp.relpath(entry.path, self.folder)
+        if column == 1:
+            return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.mtime))
+        if column == 2:
+            return format_size(entry.size)
+        count = self.key_count(entry)
+        return "" if count == -1 else "?" if count is None else str(count)
+
+    def headerData(self, section: int, orientation, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if role == QtCore.Qt.ItemDataRole.DisplayRole and orientation == QtCore.Qt.Orientation.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def sort(self, column: int, order=QtCore.Qt.SortOrder.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self._sort = (column, order)
+        self._sort_entries()
+        self.layoutChanged.emit()
+
+    def _sort_entries(self):
+        column, order = self._sort
+        keys: List[Callable] = [
+            lambda entry: entry.path,
+            lambda entry: entry.mtime,
+            lambda entry: entry.size,
+            # Unknown counts are sorted as -1, they are not read for the sorting
+            lambda entry: self.key_counts.get((entry.path, entry.mtime), -1) or -1,
+        ]
+        self.entries.sort(key=keys[column], reverse=order == QtCore.Qt.SortOrder.DescendingOrder)
+
+
+def format_size(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class FolderBrowser(QtWidgets.QWidget):
+    """List of the files of the folder of the current file. Activating a file opens it."""
+
+    file_activated = QtCore.pyqtSignal(str)
+    refresh_requested = QtCore.pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.folder_label = QtWidgets.QLabel()
+        self.folder_label.setWordWrap(True)
+        self.refresh_button = QtWidgets.QPushButton("Refresh")
+        self.refresh_button.clicked.connect(lambda: self.refresh_requested.emit())
+        self.folder_model = FolderModel(self)
+        self.view = QtWidgets.QTreeView()
+        self.view.setRootIsDecorated(False)
+        self.view.setUniformRowHeights(True)
+        self.view.setModel(self.folder_model)
+        self.view.setSortingEnabled(True)
+        self.view.sortByColumn(1, QtCore.Qt.SortOrder.DescendingOrder)
+        self.view.activated.connect(self._activated)
+
+        header = QtWidgets.QHBoxLayout()
+        header.addWidget(self.folder_label, 1)
+        header.addWidget(self.refresh_button, 0)
+        lay = QtWidgets.QVBoxLayout()
+        lay.setContentsMargins(0, 0, 0, 0)
+        lay.addLayout(header)
+        lay.addWidget(self.view)
+        self.setLayout(lay)
+
+    def set_entries(self, folder: str, entries: List[h5io.FileEntry]):
+        self.folder_label.setText(f"{folder} ({len(entries)} files)")
+        self.folder_model.set_entries(folder, entries)
+
+    @catch_and_log
+    def _activated(self, index: QtCore.QModelIndex):
+        self.file_activated.emit(self.folder_model.entry(index).path)
+
+
+# ====== Folder search ======
+class SearchWidget(QtWidgets.QWidget):
+    """Search field and the list of the (file, key) found by the search index."""
+
+    query_changed = QtCore.pyqtSignal(str)
+    hit_selected = QtCore.pyqtSignal(object)
+
+    DEBOUNCE_MS = 200
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.field = QtWidgets.QLineEdit()
+        self.field.setPlaceholderText("Search in folder")
+        self.field.setClearButtonEnabled(True)
+        self.results = QtWidgets.QListWidget()
+        self.results.setVisible(False)
+        self.results.itemActivated.connect(self._item_activated)
+
+        # Search starts once the typing is paused
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.DEBOUNCE_MS)
+        self.timer.timeout.connect(lambda: self.query_changed.emit(self.field.text()))
+        self.field.textChanged.connect(lambda _: self.timer.start())
+
+        lay = QtWidgets.QVBoxLayout()
+        lay.setContentsMargins(0, 0, 0, 0)
+        lay.addWidget(self.field)
+        lay.addWidget(self.results)
+        self.setLayout(lay)
+
+    def set_hits(self, hits: List[searchindex.SearchHit], folder: str):
+        self.results.clear()
+        for hit in hits:
+            item = QtWidgets.QListWidgetItem(f"{osp.relpath(hit.filepath, folder)}  #{hit.key.replace('/', '.')}")
+            item.setData(QtCore.Qt.ItemDataRole.UserRole, hit)
+            self.results.addItem(item)
+        if not hits:
+            self.results.addItem("Nothing found")
+        self.results.setVisible(bool(self.field.text().strip()))
+
+    @catch_and_log
+    def _item_activated(self, item: QtWidgets.QListWidgetItem):
+        hit = item.data(QtCore.Qt.ItemDataRole.UserRole)
+        if hit is not None:
+            self.hit_selected.emit(hit)
+
+
+# ====== File comparison ======
+class FileDifferenceDialog(QtWidgets.QDialog):
+    """Tree of the keys that differ between two files. Double click selects the key in the main tree."""
+
+    COLORS = {diff.ADDED: "#08A045", diff.REMOVED: "#FFCCCC", diff.CHANGED: "#FFE08A"}
+    key_selected = QtCore.pyqtSignal(list)
+
+    def __init__(self, title: str, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.resize(600, 500)
+        self.tree = QtWidgets.QTreeWidget()
+        self.tree.setHeaderLabels(["Key", "Difference"])
+        self.tree.itemDoubleClicked.connect(self._item_double_clicked)
+        self.summary = QtWidgets.QLabel("Comparing...")
+        layout = QtWidgets.QVBoxLayout()
+        layout.addWidget(self.summary, 0)
+        layout.addWidget(self.tree, 1)
+        self.setLayout(layout)
+
+    def set_differences(self, differences: List[diff.KeyDifference]):
+        self.tree.clear()
+        if not differences:
+            self.summary.setText("Files are identical")
+            return
+        counts = {status: sum(1 for d in differences if d.status == status) for status in self.COLORS}
+        self.summary.setText(", ".join(f"{count} {status}" for status, count in counts.items()))
+
+        items: Dict[str, QtWidgets.QTreeWidgetItem] = {}
+
+        def get_item(key: str) -> QtWidgets.QTreeWidgetItem:
+            if key not in items:
+                parent_key, _, name = key.rpartition("/")
+                parent = get_item(parent_key) if parent_key else self.tree.invisibleRootItem()
+                items[key] = QtWidgets.QTreeWidgetItem(parent, [name, ""])  # type: ignore
+                items[key].setData(0, QtCore.Qt.ItemDataRole.UserRole, key)
+            return items[key]
+
+        for difference in differences:
+            item = get_item(difference.key)
+            item.setText(1, f"{difference.status}: {difference.detail}")
+            for column in (0, 1):
+                item.setBackground(column, QtGui.QColor(self.COLORS[difference.status]))
+        self.tree.expandToDepth(1)
+        self.tree.resizeColumnToContents(0)
+
+    @catch_and_log
+    def _item_double_clicked(self, item: QtWidgets.QTreeWidgetItem, column: int):
+        self.key_selected.emit(item.data(0, QtCore.Qt.ItemDataRole.UserRole).split("/"))
 
 
 # ====== Main menu ======
 class EditorWindow(QtWidgets.QMainWindow):
-    data: Optional[SyncData] = None
-    file_path = None
     last_tree_index = None
     previous_data: Optional[SyncData] = None
+    text_difference: Optional[diff.TextDifference] = None
+
+    DIFF_HUNKS_PER_PAGE = 50
+    SEARCH_RESCAN_MS = 60 * 1000
+    CLOSE_IDLE_FILES_MS = 1000
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -332,8 +2002,40 @@ class EditorWindow(QtWidgets.QMainWindow):
 
         self.key_label.setText("#")
 
-        self.structure = StructureWidget()
-        self.structure.doubleClicked.connect(self.tree_double_click)
+        self.loader = Loader(self)
+        os.makedirs(DATA_PATH, exist_ok=True)
+        self.hash_index = hashindex.HashIndex(osp.join(DATA_PATH, "hash_index.sqlite"))
+        self.search_index = searchindex.SearchIndex(osp.join(DATA_PATH, "search_index.sqlite"))
+        self.path_resolver = resolver.PathResolver()
+        self.thumbnail_cache = thumbnails.ThumbnailCache(osp.join(CACHE_PATH, "thumbnails"))
+
+        # Files not used by any tab for a while are closed
+        self.handles_timer = QtCore.QTimer(self)
+        self.handles_timer.setInterval(self.CLOSE_IDLE_FILES_MS)
+        self.handles_timer.timeout.connect(h5io.HANDLES.close_idle)
+        self.handles_timer.start()
+
+        self.search = SearchWidget()
+        self.search.query_changed.connect(self.search_folder)
+        self.search.hit_selected.connect(self.open_search_hit)
+        # New and modified files of the folder are indexed regularly
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setInterval(self.SEARCH_RESCAN_MS)
+        self.search_timer.timeout.connect(self.index_folder)
+        self.search_timer.start()
+
+        self.tabs = QtWidgets.QTabWidget()
+        self.tabs.setTabsClosable(True)
+        self.tabs.setMovable(True)
+        self.tabs.setDocumentMode(True)
+        self.tabs.tabCloseRequested.connect(self.close_tab)
+        self.new_tab_button = QtWidgets.QToolButton()
+        self.new_tab_button.setText("+")
+        self.new_tab_button.setToolTip("New tab (Ctrl+T)")
+        self.new_tab_button.clicked.connect(lambda: self.add_tab())
+        self.tabs.setCornerWidget(self.new_tab_button)
+        self.add_tab()
+        self.tabs.currentChanged.connect(self.tab_changed)
 
         self.logTextBox = QTextLogger()
 
@@ -348,6 +2050,11 @@ class EditorWindow(QtWidgets.QMainWindow):
         self.dif_button.setVisible(False)
         self.dif_button.setText("Compare with previous file")
 
+        self.file_dif_button = QtWidgets.QPushButton()
+        self.file_dif_button.clicked.connect(self.show_file_difference)
+        self.file_dif_button.setVisible(False)
+        self.file_dif_button.setText("Compare whole files")
+
         self.open_from_clipboard_button = QtWidgets.QPushButton()
         self.open_from_clipboard_button.clicked.connect(self.open_from_clipboard)
         self.open_from_clipboard_button.setText("Open from clipboard")
@@ -356,14 +2063,47 @@ class EditorWindow(QtWidgets.QMainWindow):
         self.open_in_finder_button.clicked.connect(self.open_in_finder)
         self.open_in_finder_button.setText("Open in finder")
 
+        self.recent_menu = QtWidgets.QMenu(self)
+        self.recent_menu.aboutToShow.connect(self.fill_recent_menu)
+        self.recent_button = QtWidgets.QPushButton()
+        self.recent_button.setText("Recent files")
+        self.recent_button.setMenu(self.recent_menu)
+
+        self.folder_browser = FolderBrowser()
+        self.folder_browser.folder_model.loader = self.loader
+        self.folder_browser.file_activated.connect(self.open_file)
+        self.folder_browser.refresh_requested.connect(lambda: self.scan_folder(force=True))
+        self.folder_dock = QtWidgets.QDockWidget("Folder", self)
+        self.folder_dock.setObjectName("folder_dock")
+        self.folder_dock.setWidget(self.folder_browser)
+        self.folder_dock.visibilityChanged.connect(lambda visible: visible and self.scan_folder())
+        self.addDockWidget(QtCore.Qt.DockWidgetArea.LeftDockWidgetArea, self.folder_dock)
+        self.folder_dock.setVisible(False)
+        self.folder_button = QtWidgets.QPushButton()
+        self.folder_button.setText("Folder browser")
+        self.folder_button.clicked.connect(lambda: self.folder_dock.setVisible(not self.folder_dock.isVisible()))
+
+        self.watch_checkbox = QtWidgets.QCheckBox("Watch changes")
+        self.watch_checkbox.setToolTip("Update the tree when the file is modified, e.g. by the acquisition")
+        self.watch_checkbox.toggled.connect(self.watch_toggled)
+        self.file_watcher = FileWatcher(self)
+        self.file_watcher.changed.connect(self.file_changed)
+
         vhlayout = QtWidgets.QVBoxLayout()
         vhlayout.addWidget(self.key_label, 0)
-        vhlayout.addWidget(self.structure, 10)
-        vhlayout.addWidget(self.logTextBox.widget, 3)
-        vhlayout.addWidget(self.dif_button, 0)
+        vhlayout.addWidget(self.search, 0)
+        vhlayout.addWidget(self.tabs, 10)
+        vhlayout.addWidget(self.logTextBox.panel, 3)
+        dif_buttons = QtWidgets.QHBoxLayout()
+        dif_buttons.addWidget(self.dif_button, 1)
+        dif_buttons.addWidget(self.file_dif_button, 1)
+        vhlayout.addLayout(dif_buttons, 0)
         buttons = QtWidgets.QHBoxLayout()
         buttons.addWidget(self.open_in_finder_button, 1)
         buttons.addWidget(self.open_from_clipboard_button, 1)
+        buttons.addWidget(self.recent_button, 1)
+        buttons.addWidget(self.folder_button, 1)
+        vhlayout.addWidget(self.watch_checkbox, 0)
         vhlayout.addLayout(buttons, 0)
 
         vhwidget = QtWidgets.QWidget()
@@ -372,9 +2112,16 @@ class EditorWindow(QtWidgets.QMainWindow):
 
         self.central_widget = CentralWidget(self)
         self.text_edit = self.central_widget.text_edit
+        self.central_widget.find_bar.loader = self.loader
 
+        self.analysis_runner = AnalysisRunner(self)
+        self.analysis_runner.running_changed.connect(self.analysis_running_changed)
         self.central_widget.run_analysis_button.clicked.connect(self.run_analysis)
+        self.central_widget.stop_analysis_button.clicked.connect(self.analysis_runner.stop)
+        self.central_widget.restart_kernel_button.clicked.connect(self.analysis_runner.restart)
         self.central_widget.preview_button.clicked.connect(self.preview_mermaid)
+        self.central_widget.pager.page_requested.connect(self.page_requested)
+        self.central_widget.plot.range_requested.connect(self.plot_range_requested)
 
         hlayout.addWidget(self.central_widget, 3)
 
@@ -385,11 +2132,47 @@ class EditorWindow(QtWidgets.QMainWindow):
 
         self.setAcceptDrops(True)
 
-        self.last_tree_structure = ["none"]
-
         self.settings = self.load_settings()
+        self.watch_checkbox.setChecked(self.settings.watch_file)
+        self.logTextBox.set_max_lines(self.settings.log_lines)
+        self.logTextBox.set_level(self.settings.log_level)
+        self.logTextBox.level_box.currentTextChanged.connect(lambda level: SETTINGS.setValue("log_level", level))
+        self.recent_files = recent.RecentFiles(
+            osp.join(DATA_PATH, "recent_files.json"), self.settings.recent_files_count
+        )
+        app = QtCore.QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.save_recent_files)
 
     # ====== Properties ======
+    # The state of the file belongs to the current tab
+
+    @property
+    def structure(self) -> StructureWidget:
+        return self.tabs.currentWidget()  # type: ignore
+
+    @property
+    def data(self) -> Optional[SyncData]:
+        return self.structure.data
+
+    @property
+    def file_path(self) -> Optional[str]:
+        return self.structure.file_path
+
+    @property
+    def file_state(self) -> Optional[Tuple[float, int]]:
+        return self.structure.file_state
+
+    @property
+    def last_tree_structure(self) -> List[str]:
+        return self.structure.last_tree_structure
+
+    @last_tree_structure.setter
+    def last_tree_structure(self, value: List[str]):
+        self.structure.last_tree_structure = value
+
+    def tab_widgets(self) -> List[StructureWidget]:
+        return [self.tabs.widget(i) for i in range(self.tabs.count())]  # type: ignore
 
     @property
     def filename(self):
@@ -406,20 +2189,23 @@ class EditorWindow(QtWidgets.QMainWindow):
     # ====== Drag and drop ======
     @catch_and_log
     def dragEnterEvent(self, event: QtGui.QDropEvent):  # pylint: disable=C0103
-        if len(event.mimeData().urls()) == 1:
+        if event.mimeData().urls():
             event.accept()
-            logger.warning("dropped, but it should be just one file")
 
     @catch_and_log
     def dropEvent(self, event: QtGui.QDropEvent):  # pylint: disable=C0103
+        # Several files are opened in new tabs, the first one in the current tab if it's empty
+        several = len(event.mimeData().urls()) > 1
+        opened = 0
         for url in event.mimeData().urls():
             logger.debug("File dropped %s", str(url))
             if url.isLocalFile():
                 file = url.path()  # url.url().replace("file://", "")
                 if os.name == "nt" and file[0] == "/":
                     file = file[1:]
-                self.open_file(file)
-            break
+                # The previous files are still loading, so the tab of each file is chosen here
+                self.open_file(file, new_tab=several and (opened > 0 or self.file_path is not None))
+                opened += 1
 
     @catch_and_log
     def open_from_clipboard(self, event):
@@ -436,55 +2222,27 @@ class EditorWindow(QtWidgets.QMainWindow):
 
     @catch_and_log
     def open_from_string(self, string):
+        """Open the file of a labmate link or file name, and select its `#a.b` key if any."""
         logger.info("Open from string: '%s'", string)
 
         old_file_path = self.file_path or self.settings.file_path
         if not old_file_path:
             logger.warning("Cannot open file from string because there is no file yet opened.")
             return
-        working_dir = os.path.dirname(old_file_path)
-        path = os.path.join(working_dir, string)
-        if os.path.exists(path):
-            self.open_file(path)
-            return
-
-        filepath = labmate.utils.get_path_from_filename(string)  # pylint: disable=no-member
-
-        if isinstance(filepath, tuple):
-            folders, filename = (filepath[0],), filepath[1]
-        else:
-            filepath = filepath.replace("\\", "/")
-            if "/" in filepath:
-                paths = filepath.split("/")
-                folders, filename = paths[:-1], paths[-1]
-            else:
-                folders, filename = [], filepath
-
-        if "#" in filename:
-            filename, fileindex = filename.split("#")[:2]
-        else:
-            fileindex = None
-
-        if not filename.endswith(".h5"):
-            filename = filename + ".h5"
-
-        path = os.path.join(working_dir, *folders, filename)
-        current_suffix = "a"
-
-        while current_suffix and working_dir and not os.path.exists(path):
-            working_dir, current_suffix = os.path.split(working_dir)
-            path = os.path.join(working_dir, *folders, filename)
-            # logger.warning("Testing %s", path)
-
-        if not os.path.exists(path):
-            logger.warning("File %s not found", f'{"/".join(folders)}/{filename}')
+        resolved = self.path_resolver.resolve(string, os.path.dirname(old_file_path))
+        if resolved is None:
+            logger.warning("File %s not found", string)
             return
+        self.open_file(resolved.path, resolved.keys)
 
-        self.open_file(path)
-
-        if fileindex:
-            # TODO
-            pass
+    @catch_and_log
+    def fill_recent_menu(self):
+        self.recent_menu.clear()
+        for file_path in self.recent_files.paths():
+            action = self.recent_menu.addAction(file_path)
+            action.triggered.connect(lambda _=False, path=file_path: self.open_file(path))  # type: ignore
+        if self.recent_menu.isEmpty():
+            self.recent_menu.addAction("No recent files").setEnabled(False)  # type: ignore
 
     @catch_and_log
     def open_in_finder(self, event):
@@ -505,26 +2263,234 @@ class EditorWindow(QtWidgets.QMainWindow):
             subprocess.Popen(["nautilus", "--select", os.path.dirname(self.file_path)])
 
     @catch_and_log
-    def open_file(self, file_path: str):
-        if file_path.startswith("labmate://file/"):
-            file_path = file_path[len("labmate://file/") :]
+    def open_file(self, file_path: str, keys: Optional[List[str]] = None, new_tab: bool = False):
+        """Open the file in the background in the current tab, or in a `new_tab`.
+
+        The `keys` item is selected once it's loaded.
+        """
+        if file_path.startswith(resolver.LINK_PREFIX):
             return self.open_from_string(file_path)
 
         logger.info("Opening file %s", file_path)
+        tab = self.add_tab() if new_tab else self.structure
+        tab.pending_keys = keys
+        self.loader.cancel("select")
+        self.loader.cancel(self.tab_channel("open", tab))
+
+        cached_tree = self.recent_files.get_tree(file_path)
+        if cached_tree and "" in cached_tree:
+            # The file didn't change since it was open last time, so its keys are already known
+            logger.debug("Keys of %s are taken from the recent files", file_path)
+            state = recent.file_state(file_path)
+            self.file_loaded(tab, (file_path, SyncData(file_path, open_on_init=False), None, state), cached_tree)
+            return
+        self.loader.run(self.tab_channel("open", tab), partial(self.file_loaded, tab), load_file, file_path)
 
-        if self.data:
-            self.previous_data = SyncData(self.data.filepath, open_on_init=False)
-            self.dif_button.setVisible(True)
-            self.previous_data.close_key(every=True)
+    @catch_and_log
+    def remember_file(self, tab: Optional[StructureWidget] = None):
+        """Keep the keys listed so far for the next opening of the file of the tab."""
+        tab = tab or self.structure
+        if tab.file_path is not None and tab.file_state is not None:
+            self.recent_files.add(tab.file_path, tab.tree_model.listed_tree(), tab.file_state)
 
-        self.file_path = file_path
+    @catch_and_log
+    def save_recent_files(self):
+        for tab in self.tab_widgets():
+            self.remember_file(tab)
+        self.recent_files.save()
 
-        self.structure.clear()
+    @catch_and_log
+    def file_loaded(self, tab: StructureWidget, result, cached_tree: Optional[recent.KeyTree] = None):
+        file_path, data, children, state = result
+        if self.tabs.indexOf(tab) < 0:
+            return
+        self.remember_file(tab)
 
-        self.data = SyncData(file_path, open_on_init=False)
-        self.structure.update(self.data.keys_tree())
-        self.setWindowTitle(osp.split(file_path)[1])
+        if tab.data:
+            # Values are read directly from the file, so SyncData holds only the keys
+            self.previous_data = tab.data
+            self.dif_button.setVisible(True)
+            self.file_dif_button.setVisible(True)
+
+        tab.file_path = file_path
+        tab.file_state = state
+        tab.data = data
+        tab.update(file_path, children, cached_tree)
+        self.tabs.setTabText(self.tabs.indexOf(tab), osp.split(file_path)[1])
+        self.tabs.setTabToolTip(self.tabs.indexOf(tab), file_path)
+        self.recent_files.add(file_path, state=state)
+        self.loader.run("recent", lambda _: None, self.recent_files.save, background=True)
+        # workers=1: forking processes from a thread of the Qt process isn't safe, so the thread hashes itself
+        self.loader.run("index", self.file_indexed, self.hash_index.index_file, file_path, 1, background=True)
+        self.loader.run(
+            "thumbnails",
+            lambda count: logger.debug("Thumbnails: %d datasets summarized", count),
+            self.thumbnail_cache.summarize_file, file_path,
+            background=True,
+        )
+
+        if tab is not self.structure:
+            return
+        self.central_widget.set_table(None)
+        self.show_current_file()
         self.save_settings()
+        self.index_folder()
+
+        if tab.pending_keys is not None:
+            keys, tab.pending_keys = tab.pending_keys, None
+            self.select_key(keys)
+
+    # ====== Tabs ======
+    @staticmethod
+    def tab_channel(channel: str, tab: StructureWidget) -> str:
+        """Loader channel of the tab, so the tabs don't cancel the tasks of each other."""
+        return f"{channel}:{id(tab)}"
+
+    def add_tab(self) -> StructureWidget:
+        tab = StructureWidget()
+        tab.tree_model.loader = self.loader
+        tab.doubleClicked.connect(self.tree_double_click)
+        tab.setContextMenuPolicy(QtCore.Qt.ContextMenuPolicy.CustomContextMenu)
+        tab.customContextMenuRequested.connect(partial(self.tree_context_menu, tab))
+        self.tabs.addTab(tab, "New tab")
+        self.tabs.setCurrentWidget(tab)
+        return tab
+
+    @catch_and_log
+    def close_tab(self, index: int):
+        tab: StructureWidget = self.tabs.widget(index)  # type: ignore
+        self.remember_file(tab)
+        self.loader.cancel(self.tab_channel("open", tab))
+        if self.tabs.count() == 1:
+            self.add_tab()
+        self.tabs.removeTab(self.tabs.indexOf(tab))
+        tab.deleteLater()
+
+    @catch_and_log
+    def tab_changed(self, index: int):
+        del index
+        self.loader.cancel("select")
+        self.loader.cancel("refresh")
+        self.loader.cancel("summary")
+        self.text_difference = None
+        for button in (
+            self.central_widget.run_analysis_button,
+            self.central_widget.restart_kernel_button,
+            self.central_widget.preview_button,
+            self.central_widget.pager,
+        ):
+            button.setVisible(False)
+        self.central_widget.set_table(None)
+        self.show_current_file()
+
+        last_index = self.structure.last_tree_index
+        if last_index is not None and last_index.isValid():
+            self.structure_selected(QtCore.QModelIndex(last_index))
+        else:
+            self.text_edit.clear()
+            self.key_label.setText("#")
+
+    def show_current_file(self):
+        """Title, the watcher and the folder browser follow the file of the current tab."""
+        self.setWindowTitle(self.filename if self.file_path is not None else "")
+        if self.watch_checkbox.isChecked():
+            self.file_watcher.watch(self.file_path, self.file_state)
+        self.scan_folder()
+        if self.file_path is not None:
+            self.loader.run(
+                "index_links",
+                lambda count: logger.debug("Link index: %d files", count),
+                self.path_resolver.index_folder,
+                resolver.measurement_tree(self.filedir),
+                background=True,
+            )
+
+    # ====== Folder browser ======
+    @catch_and_log
+    def scan_folder(self, force: bool = False):
+        """List the files of the folder of the current file, if the browser is shown."""
+        if self.file_path is None or not self.folder_dock.isVisible():
+            return
+        folder = self.filedir
+        if not force and folder == self.folder_browser.folder_model.folder:
+            return
+        self.folder_browser.folder_label.setText(f"{folder} (scanning...)")
+        self.loader.run("scan_folder", partial(self.folder_browser.set_entries, folder), h5io.scan_folder, folder)
+
+    # ====== Watch changes ======
+    @catch_and_log
+    def watch_toggled(self, checked: bool):
+        SETTINGS.setValue("watch_file", checked)
+        if not checked:
+            self.file_watcher.watch(None)
+            self.loader.cancel("refresh")
+        elif self.file_path is not None:
+            self.file_watcher.watch(self.file_path, self.file_state)
+            self.file_watcher.check()
+
+    @catch_and_log
+    def file_changed(self, file_path: str):
+        if self.file_path is None or h5io.h5_filepath(self.file_path) != file_path:
+            return
+        tab = self.structure
+        self.loader.run(
+            "refresh", partial(self.file_refreshed, tab, self.file_path),
+            refresh_groups, self.file_path, tab.tree_model.listed_groups()
+        )
+
+    @catch_and_log
+    def file_refreshed(self, tab: StructureWidget, file_path: str, result):
+        state, listed = result
+        if self.tabs.indexOf(tab) < 0 or file_path != tab.file_path:
+            return
+        if listed is None:
+            # The file is being written, it will be read on the next change or poll
+            logger.debug("File %s is busy, retry later", file_path)
+            return
+        tab.tree_model.sync(file_path, listed)
+        tab.file_state = state
+        if tab is self.structure:
+            self.file_watcher.set_state(state)
+        logger.debug("Tree of %s is updated", osp.split(file_path)[1])
+
+    @catch_and_log
+    def file_indexed(self, hashed: int):
+        logger.debug("Hash index: %d datasets hashed", hashed)
+
+    # ====== Folder search ======
+    @catch_and_log
+    def index_folder(self):
+        if self.file_path is None:
+            return
+        self.loader.run(
+            "search_index", self.folder_indexed, self.search_index.update_folder, self.filedir, background=True
+        )
+
+    @catch_and_log
+    def folder_indexed(self, scan: searchindex.FolderScan):
+        if scan.indexed or scan.removed:
+            logger.debug("Search index: %d files indexed, %d removed", scan.indexed, scan.removed)
+            if self.search.field.text().strip():
+                self.search_folder(self.search.field.text())
+
+    @catch_and_log
+    def search_folder(self, query: str):
+        if self.file_path is None or not query.strip():
+            self.search.results.setVisible(False)
+            return
+        folder = self.filedir
+        self.loader.run(
+            "search", lambda hits: self.search.set_hits(hits, folder),
+            self.search_index.search, query, folder
+        )
+
+    @catch_and_log
+    def open_search_hit(self, hit: searchindex.SearchHit):
+        keys = hit.key.split("/")
+        if self.file_path is not None and osp.abspath(h5io.h5_filepath(self.file_path)) == hit.filepath:
+            self.select_key(keys)
+            return
+        self.open_file(hit.filepath, keys)
 
     # ====== Run Analysis ======
     @catch_and_log
@@ -533,7 +2499,6 @@ class EditorWindow(QtWidgets.QMainWindow):
             raise ValueError("There is no file_path specified. Should open_file first")
 
         analysis_code_original = self.text_edit.toPlainText()
-        init_code = ""
         init_code_file = osp.join(self.filedir, "init_analyse.py")
 
         source = None
@@ -546,29 +2511,16 @@ class EditorWindow(QtWidgets.QMainWindow):
                         break
                     line = file.readline()
 
-            sys.path.append(self.filedir)
-            logger.debug("Import init code")
-            init_code = "from init_analyse import *\n"
+            logger.debug("Kernel imports init code")
 
         # analysis_code = convert_analyse_code(analysis_code_original, self.filename)
 
-        code = init_code + analysis_code_original
-        if source:
-            with open(osp.join(self.filedir, "__code_to_run__.py"), "w", encoding="utf=8") as file:
-                file.write(code)
-            import subprocess  # pylint: disable=C0415
-
-            command = f"{source}&& cd {self.filedir}&& python __code_to_run__.py"
-            print(command)
-            ret = subprocess.run(command, capture_output=True, shell=True, check=False)
+        self.analysis_runner.run(analysis_code_original, self.filedir, source)
 
-            logger.info("from subprocess: %s", ret.stdout.decode())
-            if ret.stderr.decode():
-                logger.error(ret.stderr.decode())
-            os.remove(osp.join(self.filedir, "__code_to_run__.py"))
-
-        else:
-            exec(code)  # pylint: disable=W0122)
+    @catch_and_log
+    def analysis_running_changed(self, running: bool):
+        self.central_widget.run_analysis_button.setEnabled(not running)
+        self.central_widget.stop_analysis_button.setVisible(running)
 
     # ====== Preview mermaid ======
     @catch_and_log
@@ -601,45 +2553,132 @@ class EditorWindow(QtWidgets.QMainWindow):
     def show_difference(self, event):
         if not self.previous_data:
             return
-        import difflib
+        self.text_difference = None
+        self.loader.run(
+            "select", self.difference_loaded,
+            get_difference, self.data, self.previous_data, self.last_tree_structure
+        )
 
-        d = difflib.Differ()
+    @catch_and_log
+    def show_file_difference(self, event):
+        if not self.previous_data or not self.data:
+            return
+        dialog = FileDifferenceDialog(f"{self.data.filename} compared with {self.previous_data.filename}", self)
+        dialog.key_selected.connect(self.select_key)
+        dialog.show()
+        # workers=1: no processes are forked from a thread of the Qt process, see file_loaded
+        self.loader.run(
+            "compare_files", dialog.set_differences,
+            diff.compare_files, self.data.filepath, self.previous_data.filepath, 1, self.hash_index
+        )
 
-        keys = self.last_tree_structure
-        current_data = self.get_data_by_key(self.data, keys)
-        previous_data = self.get_data_by_key(self.previous_data, keys)
+    @catch_and_log
+    def difference_loaded(self, result):
+        message, difference = result
+        logger.debug("Value cache: %s", h5io.VALUE_CACHE.stats())
+        self.central_widget.pager.setVisible(False)
+        self.central_widget.set_table(None)
+        if message is not None:
+            self.text_edit.setPlainText(message)
+            return
 
-        if previous_data is ObjectNotExists:
-            self.text_edit.setPlainText("Previous data doesn't have the following key")
+        self.key_label.setText(f"Diff with: {self.previous_data.filename}")  # type: ignore
+
+        if isinstance(difference, diff.ArrayDifference):
+            self.text_edit.setPlainText(diff.format_array_difference(difference))
             return
 
-        if current_data is ObjectNotExists:
-            self.text_edit.setPlainText("Current data doesn't have the following key")
+        if not difference.hunks:
+            self.text_edit.setPlainText("Values are identical")
             return
+        self.text_difference = difference
+        self.show_difference_page(0)
 
-        self.key_label.setText(f"Diff with: {self.previous_data.filename}")
+    @catch_and_log
+    def show_difference_page(self, page: int):
+        """Only DIFF_HUNKS_PER_PAGE hunks are rendered at once."""
+        if self.text_difference is None:
+            return
+        hunks = self.text_difference.hunks
+        page_count = -(-len(hunks) // self.DIFF_HUNKS_PER_PAGE)
+        start = page * self.DIFF_HUNKS_PER_PAGE
+        self.central_widget.pager.set_page(page, page_count)
+        self.text_edit.setHtml(
+            format_hunks(self.text_difference, hunks[start : start + self.DIFF_HUNKS_PER_PAGE])
+        )
 
-        diff = list(
-            d.compare(
-                to_str(current_data).splitlines(),
-                to_str(previous_data).splitlines(),
-            )
+    # ====== Tree interaction ======
+
+    @catch_and_log
+    def tree_context_menu(self, tab: StructureWidget, position: QtCore.QPoint):
+        index = tab.indexAt(position)
+        if not index.isValid() or tab.file_path is None or tab.tree_model.kind(index) == tab.tree_model.OUTLINE:
+            return
+        key = "/".join(tab.tree_model.path(index))
+        folder = osp.abspath(osp.dirname(tab.file_path))
+        menu = QtWidgets.QMenu(self)
+        action = menu.addAction("Export this key from all the files of the folder...")
+        action.triggered.connect(lambda: self.export_key(key, folder))  # type: ignore
+        menu.exec(tab.viewport().mapToGlobal(position))
+
+    @catch_and_log
+    def export_key(self, key: str, folder: str):
+        """Write the `key` of all the `.h5` files of the folder and its subfolders into one table."""
+        filters = ["CSV (*.csv)", "NumPy (*.npz)"]
+        if importlib.util.find_spec("pyarrow") is not None:
+            filters.append("Parquet (*.parquet)")
+        output, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Export key", osp.join(folder, key.replace("/", "_") + ".csv"), ";;".join(filters)
         )
+        if not output:
+            return
+        logger.info("Exporting %s of the files of %s to %s", key, folder, output)
+
+        # The export starts its own worker processes, so it runs in a process of its own: `h5viewer collect`
+        arguments = ["collect", key, folder, "--output", output]
+        process = QtCore.QProcess(self)
+        if getattr(sys, "frozen", False):
+            # The bundle runs the command line itself, see main()
+            program = sys.executable
+        else:
+            program, arguments = sys.executable, ["-m", "h5viewer.cli"] + arguments
+            env = QtCore.QProcessEnvironment.systemEnvironment()
+            env.insert("PYTHONPATH", os.pathsep.join(filter(None, [PACKAGE_PARENT, env.value("PYTHONPATH")])))
+            process.setProcessEnvironment(env)
+        process.finished.connect(partial(self.key_exported, process, output))
+        process.errorOccurred.connect(partial(self.export_failed, process, output))
+        process.start(program, arguments)
 
-        # print("\n".join(diff))
-        diff_result = []
-        for line in diff:
-            if line.startswith("- "):
-                diff_result.append(f'<span style="background-color: #FFCCCC;">{line[2:]}</span>')
-            elif line.startswith("+ "):
-                diff_result.append(f'<span style="background-color: #08A045;">{line[2:]}</span>')
-            else:
-                diff_result.append(f"<span>{line[2:]}</span>")
+    @catch_and_log
+    def key_exported(self, process: QtCore.QProcess, output: str, exit_code: int, exit_status: QtCore.QProcess.ExitStatus):
+        message = bytes(process.readAllStandardError().data()).decode(errors="replace").strip()
+        if exit_status == QtCore.QProcess.ExitStatus.NormalExit and exit_code == 0:
+            logger.info("Exported %s", message)
+        else:
+            logger.error("Export to %s failed: %s", output, message or f"exit code {exit_code}")
+        process.deleteLater()
 
-        formatted_html = "<pre>" + "<br>".join(diff_result) + "</pre>"
-        self.text_edit.setHtml(formatted_html)
+    @catch_and_log
+    def export_failed(self, process: QtCore.QProcess, output: str, error: QtCore.QProcess.ProcessError):
+        if error == QtCore.QProcess.ProcessError.FailedToStart:
+            logger.error("Cannot export to %s: %s", output, process.errorString())
+            process.deleteLater()
 
-    # ====== Tree interaction ======
+    @catch_and_log
+    def select_key(self, keys: List[str]):
+        """Select the `keys` item in the tree and show it, once its groups are listed."""
+        self.structure.tree_model.find(keys, partial(self.key_found, self.structure, keys))
+
+    @catch_and_log
+    def key_found(self, tab: StructureWidget, keys: List[str], index: QtCore.QModelIndex):
+        if tab is not self.structure:
+            return
+        if not index.isValid():
+            logger.warning("Current file doesn't have the key %s", "/".join(keys))
+            return
+        self.structure.setCurrentIndex(index)
+        self.structure.scrollTo(index)
+        self.structure_selected(index)
 
     @catch_and_log
     def tree_double_click(self, index: QtCore.QModelIndex) -> None:
@@ -662,74 +2701,115 @@ class EditorWindow(QtWidgets.QMainWindow):
         if data is None:
             data = self.data
 
-        if keys[0] not in data:
-            return ObjectNotExists
-
-        data = data.get_dict(keys[0])
-        for key in keys[1:]:
-            if key not in data:
-                return ObjectNotExists
-            if isinstance(data, dict):
-                data = data.get(key)
-            else:
-                return data
-
-        return data
+        return read_data_by_key(data, keys)
 
     @catch_and_log
     def structure_selected(self, index: QtCore.QModelIndex):
-        tree_to_item = self.structure.get_row_tree(index)
-        item = self.structure.itemFromIndex(index)
+        model = self.structure.tree_model
+        tree_to_item = model.path(index)
 
         self.central_widget.run_analysis_button.setVisible(False)
+        self.central_widget.restart_kernel_button.setVisible(False)
         self.central_widget.preview_button.setVisible(False)
+        self.central_widget.pager.setVisible(False)
+        self.central_widget.set_table(None)
+        self.loader.cancel("summary")
+        self.text_difference = None
 
         self.structure.close_last_open_tree_item()
-        self.structure.last_tree_index = index
-        self.last_tree_structure = tree_to_item
-
-        data = self.data.get_dict(tree_to_item[0])
-        for key in tree_to_item[1:]:
-            if isinstance(data, dict):
-                # print(key, data)
-                data = data.get(key)
-            else:
-                cursor = self.text_edit.textCursor()
-                text = self.text_edit.toPlainText()
-                pattern = f"# *={{3,}} *({key}) *={{3,}}"
-                found = re.search(pattern, text)
-                if found is None:
-                    return
-                cursor.setPosition(found.start())
-                self.central_widget.setFocus()
-                self.text_edit.setFocus()
-                self.text_edit.setTextCursor(cursor)
-                self.text_edit.ensureCursorVisible()
+        self.structure.last_tree_index = QtCore.QPersistentModelIndex(index)
+
+        if model.kind(index) == model.OUTLINE:
+            cursor = self.text_edit.textCursor()
+            text = self.text_edit.toPlainText()
+            pattern = f"# *={{3,}} *({tree_to_item[-1]}) *={{3,}}"
+            found = re.search(pattern, text)
+            if found is None:
                 return
+            cursor.setPosition(found.start())
+            self.central_widget.setFocus()
+            self.text_edit.setFocus()
+            self.text_edit.setTextCursor(cursor)
+            self.text_edit.ensureCursorVisible()
+            return
 
+        self.last_tree_structure = tree_to_item
         self.key_label.setText("#" + ".".join(tree_to_item))
         self.key_label.setStyleSheet("")
 
-        if isinstance(data, dict):
-            if item.childCount() == 0:
-                for key in sorted(list(data.keys())):
-                    TreeWidgetItem(item, key)
-            self.text_edit.setText(("It contains more data" if len(data) > 0 else str(data)))
+        if model.kind(index) == model.GROUP:
+            self.loader.cancel("select")
+            self.structure.fetch_children(index)
+            self.text_edit.setText(("It contains more data" if model.hasChildren(index) else "{}"))
         else:
-            if tree_to_item[0].startswith("analysis_cell"):
-                self.central_widget.run_analysis_button.setVisible(True)
-                data = convert_analyse_code(str(data), self.filename)
-            if isinstance(data, str) and "```mermaid" in data:
-                self.central_widget.preview_button.setVisible(True)
+            self.text_edit.setPlainText("Loading...")
+            self.loader.run(
+                "select", partial(self.data_loaded, QtCore.QPersistentModelIndex(index), tree_to_item),
+                read_data_by_key, self.data, tree_to_item, h5io.PREVIEW_SIZE, True
+            )
+
+        return None
 
-            if has_outline(tree_to_item[-1]):
-                if item.childCount() == 0:
-                    for key in get_outline(data):
-                        TreeWidgetItem(item, key)
+    @catch_and_log
+    def data_loaded(self, index: QtCore.QPersistentModelIndex, tree_to_item: List[str], data):
+        logger.debug("Value cache: %s, %s", h5io.VALUE_CACHE.stats(), h5io.HANDLES.stats())
+        if isinstance(data, h5io.ArrayPreview):
+            return self.preview_loaded(data)
+        if isinstance(data, h5io.DatasetInfo):
+            model = DatasetTableModel(self.data.filepath, data.key)  # type: ignore
+            model.loader = self.loader
+            self.central_widget.set_table(model, f"shape: {data.shape}, dtype: {data.dtype}")
+            if h5io.is_plottable(data.shape, data.dtype):
+                self.central_widget.set_plot(data.key, data.shape[0])
+            if thumbnails.is_image(data.shape, data.dtype):
+                summary = self.thumbnail_cache.get(self.data.filepath, data.key)  # type: ignore
+                if summary is not None:
+                    self.central_widget.set_summary(model, summary)
+                else:
+                    self.loader.run(
+                        "summary", partial(self.central_widget.set_summary, model),
+                        self.thumbnail_cache.summary, self.data.filepath, data.key  # type: ignore
+                    )
+            return None
+        if tree_to_item[0].startswith("analysis_cell"):
+            self.central_widget.run_analysis_button.setVisible(True)
+            self.central_widget.restart_kernel_button.setVisible(True)
+            data = convert_analyse_code(str(data), self.filename)
+        if isinstance(data, str) and "```mermaid" in data:
+            self.central_widget.preview_button.setVisible(True)
 
-            self.text_edit.setPlainText(str(data))  # .setText(str(data))
+        if has_outline(tree_to_item[-1]) and index.isValid():
+            self.structure.tree_model.add_outline(QtCore.QModelIndex(index), get_outline(data))
 
-        return None
+        self.text_edit.setPlainText(str(data))  # .setText(str(data))
+
+    @catch_and_log
+    def page_requested(self, page: int):
+        if self.text_difference is not None:
+            self.show_difference_page(page)
+        else:
+            self.show_preview_page(page)
+
+    @catch_and_log
+    def show_preview_page(self, page: int):
+        self.loader.run(
+            "select", self.preview_loaded,
+            read_preview_by_key, self.data, self.last_tree_structure, page
+        )
+
+    @catch_and_log
+    def plot_range_requested(self, start: int, stop: int, bins: int):
+        if self.data is None or self.central_widget.plot.key is None:
+            return
+        self.loader.run(
+            "plot", self.central_widget.plot.set_envelope,
+            h5io.read_envelope, self.data.filepath, self.central_widget.plot.key, start, stop, bins
+        )
+
+    @catch_and_log
+    def preview_loaded(self, preview: h5io.ArrayPreview):
+        self.central_widget.pager.set_page(preview.page, preview.page_count)
+        self.text_edit.setPlainText(h5io.format_preview(preview))
 
     # ====== Shortcuts ======
     def keyPressEvent(self, event):
@@ -737,11 +2817,21 @@ class EditorWindow(QtWidgets.QMainWindow):
             event.modifiers() == QtCore.Qt.KeyboardModifier.ControlModifier
             and event.key() == QtCore.Qt.Key.Key_F
         ):
-            if not self.central_widget.find_field.isVisible():
-                self.central_widget.find_field.setVisible(True)
-                self.central_widget.find_field.setFocus()
+            find_bar = self.central_widget.find_bar
+            if not find_bar.isVisible() or not self.central_widget.find_field.hasFocus():
+                find_bar.setVisible(True)
             else:
-                self.central_widget.find_field.setVisible(False)
+                find_bar.setVisible(False)
+        elif (
+            event.modifiers() == QtCore.Qt.KeyboardModifier.ControlModifier
+            and event.key() == QtCore.Qt.Key.Key_T
+        ):
+            self.add_tab()
+        elif (
+            event.modifiers() == QtCore.Qt.KeyboardModifier.ControlModifier
+            and event.key() == QtCore.Qt.Key.Key_W
+        ):
+            self.close_tab(self.tabs.currentIndex())
         else:
             super().keyPressEvent(event)
 
@@ -759,10 +2849,36 @@ class EditorWindow(QtWidgets.QMainWindow):
     @catch_and_log
     def load_settings(self):
         file_path = SETTINGS.value("file_path")
-        return AppSettings(file_path=file_path)
+        cache_size_mb = int(SETTINGS.value("cache_size_mb", 256))
+        h5io.VALUE_CACHE.set_max_bytes(cache_size_mb * 2**20)
+        recent_files_count = int(SETTINGS.value("recent_files_count", 10))
+        watch_file = str(SETTINGS.value("watch_file", True)).lower() == "true"
+        max_open_files = int(SETTINGS.value("max_open_files", 8))
+        h5io.HANDLES.set_max_handles(max_open_files)
+        log_level = str(SETTINGS.value("log_level", "DEBUG")).upper()
+        if log_level not in QTextLogger.LEVELS:
+            log_level = "DEBUG"
+        log_lines = int(SETTINGS.value("log_lines", 5000))
+        return AppSettings(
+            file_path=file_path,
+            cache_size_mb=cache_size_mb,
+            recent_files_count=recent_files_count,
+            watch_file=watch_file,
+            max_open_files=max_open_files,
+            log_level=log_level,
+            log_lines=log_lines,
+        )
 
 
 def main():
+    # Processes of the file comparison start the bundle again
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1 and sys.argv[1] == "--kernel":
+        kernel.main()
+        return
+    if cli.is_command(sys.argv[1:]):
+        sys.exit(cli.main(sys.argv[1:]))
+
     APP = QtWidgets.QApplication(sys.argv)
     APP.setStyle("fusion")
     style_sheet = """
@@ -790,8 +2906,9 @@ def main():
     EDITOR.show()
 
     if len(sys.argv) > 1:
-        FILE_PATH = sys.argv[1]
-        EDITOR.open_file(FILE_PATH)
+        # Each file given after the first one is opened in a new tab
+        for i, FILE_PATH in enumerate(sys.argv[1:]):
+            EDITOR.open_file(FILE_PATH, new_tab=i > 0)
     else:
         if EDITOR.settings.file_path:
             EDITOR.open_file(EDITOR.settings.file_path)
@@ -0,0 +1,99 @@
+"""
+Recently opened files.
+
+Each entry keeps the mtime and the size of the file and the keys that were
+listed while it was open, so an unchanged file is shown again without being
+read. Entries are stored as json in a single file.
+This module should not depend on PyQt.
+"""
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from . import h5io
+except ImportError:  # started as a script, e.g. from the pyinstaller bundle
+    import h5io  # type: ignore
+
+# Group key ("" for the root) -> sorted (name, is_group) of its children
+KeyTree = Dict[str, List[Tuple[str, bool]]]
+
+
+def file_state(file_path: str) -> Tuple[float, int]:
+    stat = os.stat(h5io.h5_filepath(file_path))
+    return stat.st_mtime, stat.st_size
+
+
+class RecentFiles:
+    """Most recently used files stored in the json file `path`, the last one first.
+
+    Changes are kept in memory until save() is called.
+    """
+
+    def __init__(self, path: str, max_count: int = 10):
+        self.path = path
+        self.max_count = max_count
+        self._lock = threading.Lock()
+        self._entries: List[dict] = []
+        try:
+            with open(path, encoding="utf-8") as file:
+                self._entries = json.load(file)
+        except (OSError, ValueError):
+            self._entries = []
+
+    def paths(self) -> List[str]:
+        return [entry["file_path"] for entry in self._entries]
+
+    def _find(self, file_path: str) -> Optional[dict]:
+        file_path = os.path.abspath(file_path)
+        for entry in self._entries:
+            if entry["file_path"] == file_path:
+                return entry
+        return None
+
+    def get_tree(self, file_path: str) -> Optional[KeyTree]:
+        """Keys cached for the file, or None if the file changed since."""
+        entry = self._find(file_path)
+        if entry is None:
+            return None
+        try:
+            if tuple(entry["state"]) != file_state(file_path):
+                return None
+        except OSError:
+            return None
+        return {key: [(name, is_group) for name, is_group in children] for key, children in entry["tree"].items()}
+
+    def add(self, file_path: str, tree: Optional[KeyTree] = None, state: Optional[Tuple[float, int]] = None):
+        """Move the file to the top.
+
+        The `tree` replaces the cached keys if given. `state` is the (mtime, size)
+        of the file when the tree was listed, the current one by default.
+        """
+        file_path = os.path.abspath(file_path)
+        with self._lock:
+            entry = self._find(file_path)
+            if entry is not None:
+                self._entries.remove(entry)
+            try:
+                state = state or file_state(file_path)
+            except OSError:
+                return
+            if tree is not None or entry is None or tuple(entry["state"]) != tuple(state):
+                entry = {"file_path": file_path, "state": state, "tree": tree or {}}
+            self._entries.insert(0, entry)
+            del self._entries[self.max_count :]
+
+    def set_max_count(self, max_count: int):
+        with self._lock:
+            self.max_count = max_count
+            del self._entries[max_count:]
+
+    def save(self):
+        """Write the entries to the disk. Can be called from another thread."""
+        with self._lock:
+            text = json.dumps(self._entries)
+        temp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(temp_path, self.path)
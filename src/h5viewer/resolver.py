@@ -0,0 +1,176 @@
+"""
+Resolution of the file names found in the notebooks and labmate:// links.
+
+A link is a file name, possibly with some of its folders and a `#a.b` key
+suffix. The files are found with a filename -> paths index of the measurement
+tree, then by looking in the parent folders of the current file. The listings
+of the folders are cached, so a folder of a network drive is read only once.
+This module should not depend on PyQt.
+"""
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import labmate.utils  # pylint: disable=E0401
+
+try:
+    from . import h5io
+except ImportError:  # started as a script, e.g. from the pyinstaller bundle
+    import h5io  # type: ignore
+
+LINK_PREFIX = "labmate://file/"
+
+# Seconds a folder listing or the index of a folder is trusted without being read again
+LISTING_TTL = 30
+
+
+class Link(NamedTuple):
+    folders: Tuple[str, ...]
+    filename: str
+    keys: Optional[List[str]]
+
+
+class Resolved(NamedTuple):
+    path: str
+    keys: Optional[List[str]]
+
+
+def parse_link(string: str) -> Link:
+    """Folders, file name and keys of `labmate://file/folder/name#a.b` or of `folder/name#a.b`."""
+    string = string.strip()
+    if string.startswith(LINK_PREFIX):
+        string = string[len(LINK_PREFIX) :]
+    string, _, key = string.partition("#")
+    keys = [part for part in key.split(".") if part] or None
+
+    get_path_from_filename = getattr(labmate.utils, "get_path_from_filename", None)
+    filepath = get_path_from_filename(string) if get_path_from_filename else string
+    if isinstance(filepath, tuple):
+        folders, filename = (filepath[0],), filepath[1]
+    else:
+        *folders, filename = filepath.replace("\\", "/").split("/")
+
+    if not filename.endswith(".h5"):
+        filename = filename + ".h5"
+    return Link(tuple(folder for folder in folders if folder), filename, keys)
+
+
+def _direct_path(string: str, working_dir: str) -> Optional[str]:
+    """Path of an absolute path or of a path relative to `working_dir`, if the file exists."""
+    string = string.strip()
+    if string.startswith(LINK_PREFIX):
+        string = string[len(LINK_PREFIX) :]
+    string = string.partition("#")[0]
+    if not string:
+        return None
+    path = os.path.join(working_dir, string)
+    for candidate in (path, h5io.h5_filepath(path)):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+class PathResolver:
+    """Finds the files of the links. Can be used from several threads."""
+
+    def __init__(self, ttl: float = LISTING_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Folder -> (time of the listing, names of the entries)
+        self._listings: Dict[str, Tuple[float, frozenset]] = {}
+        # Root folder -> (time of the scan, filename -> paths)
+        self._indexes: Dict[str, Tuple[float, Dict[str, List[str]]]] = {}
+
+    def _listing(self, folder: str) -> frozenset:
+        now = time.monotonic()
+        with self._lock:
+            listing = self._listings.get(folder)
+        if listing is not None and now - listing[0] < self.ttl:
+            return listing[1]
+        try:
+            names = frozenset(os.listdir(folder))
+        except OSError:
+            names = frozenset()
+        with self._lock:
+            self._listings[folder] = (now, names)
+        return names
+
+    def exists(self, path: str) -> bool:
+        """Whether the path exists, using the cached listings of its folders."""
+        folder, name = os.path.split(os.path.abspath(path))
+        return name in self._listing(folder)
+
+    def index_folder(self, root: str, force: bool = False) -> int:
+        """Index the `.h5` files of the folder and its subfolders by name. Return the number of files."""
+        root = os.path.abspath(root)
+        with self._lock:
+            index = self._indexes.get(root)
+        if index is not None and not force and time.monotonic() - index[0] < self.ttl:
+            return sum(len(paths) for paths in index[1].values())
+        paths: Dict[str, List[str]] = {}
+        entries = h5io.scan_folder(root)
+        for entry in entries:
+            paths.setdefault(os.path.basename(entry.path), []).append(entry.path)
+        with self._lock:
+            self._indexes[root] = (time.monotonic(), paths)
+        return len(entries)
+
+    def _lookup(self, link: Link, working_dir: str) -> Optional[str]:
+        """Path of the link in the indexes. The closest to `working_dir` if there are several."""
+        suffix = os.sep + os.path.join(*link.folders, link.filename)
+        with self._lock:
+            indexes = [paths for _, paths in self._indexes.values()]
+        candidates = [
+            path for paths in indexes for path in paths.get(link.filename, []) if path.endswith(suffix)
+        ]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda path: len(os.path.commonpath([path, working_dir])))
+
+    def resolve(self, string: str, working_dir: str) -> Optional[Resolved]:
+        """File of the link relative to `working_dir` or to one of its parents, None if not found."""
+        working_dir = os.path.abspath(working_dir)
+        link = parse_link(string)
+        path = _direct_path(string, working_dir)
+        if path is not None:
+            return Resolved(path, link.keys)
+
+        path = self._lookup(link, working_dir)
+        if path is not None and os.path.exists(path):
+            return Resolved(path, link.keys)
+
+        path = self._walk_up(link, working_dir)
+        if path is None:
+            # The file may have been created after the folders were listed
+            with self._lock:
+                self._listings.clear()
+            path = self._walk_up(link, working_dir)
+        return None if path is None else Resolved(path, link.keys)
+
+    def _walk_up(self, link: Link, folder: str) -> Optional[str]:
+        while True:
+            if self._exists_in(folder, link.folders, link.filename):
+                return os.path.join(folder, *link.folders, link.filename)
+            folder, name = os.path.split(folder)
+            if not name:
+                return None
+
+    def _exists_in(self, folder: str, folders: Sequence[str], filename: str) -> bool:
+        for name in folders:
+            if name not in self._listing(folder):
+                return False
+            folder = os.path.join(folder, name)
+        return filename in self._listing(folder)
+
+
+def measurement_tree(folder: str) -> str:
+    """Folder to index for the files of `folder`: its parent, which holds the other measurement folders.
+
+    The folder itself is used if its parent is a drive or the home folder.
+    """
+    folder = os.path.abspath(folder)
+    parent = os.path.dirname(folder)
+    if parent == os.path.dirname(parent) or parent == os.path.expanduser("~"):
+        return folder
+    return parent
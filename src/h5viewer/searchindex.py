@@ -0,0 +1,158 @@
+"""
+Search of the keys and the text values of all the files of a folder.
+
+The names of the keys and the string values (analysis cells, configs, ...)
+are split into words and stored into an inverted index (word -> file, key)
+inside a SQLite database. Only the files added or modified since the last
+scan are read again.
+This module should not depend on PyQt.
+"""
+import os
+import re
+import sqlite3
+from contextlib import closing, contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import h5py
+
+try:
+    from . import h5io
+except ImportError:  # started as a script, e.g. from the pyinstaller bundle
+    import h5io  # type: ignore
+
+# String values longer than this number of characters are not indexed
+MAX_TEXT_SIZE = 2**20
+
+WORD_PATTERN = re.compile(r"\w+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    filepath TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS words (
+    word TEXT NOT NULL,
+    filepath TEXT NOT NULL,
+    key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS words_word ON words (word);
+CREATE INDEX IF NOT EXISTS words_filepath ON words (filepath);
+"""
+
+
+class SearchHit(NamedTuple):
+    filepath: str
+    key: str
+
+
+class FolderScan(NamedTuple):
+    indexed: int
+    removed: int
+
+
+def split_words(text: str) -> Set[str]:
+    return {word.lower() for word in WORD_PATTERN.findall(text)}
+
+
+def file_words(filepath: str) -> List[Tuple[str, str]]:
+    """(word, key) pairs of the names of all the keys and of the string values of the file."""
+    pairs: Set[Tuple[str, str]] = set()
+
+    def visit(key: str, item):
+        words = split_words(key)
+        if isinstance(item, h5py.Dataset) and item.shape == () and item.dtype.kind in "OSU":
+            value = item[()]
+            # Object datasets can also hold references
+            if isinstance(value, (bytes, str)) and len(value) <= MAX_TEXT_SIZE:
+                value = value.decode(errors="replace") if isinstance(value, bytes) else str(value)
+                words |= split_words(value)
+        pairs.update((word, key) for word in words)
+
+    with h5py.File(h5io.h5_filepath(filepath), "r") as file:
+        file.visititems(visit)
+    return sorted(pairs)
+
+
+def _prefix_end(prefix: str) -> str:
+    """Smallest string bigger than all the strings starting with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class SearchIndex:
+    """Inverted index of the files stored in the SQLite file `path`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """New connection for each request, so the index can be used from any thread."""
+        with closing(sqlite3.connect(self.path, timeout=30)) as connection:
+            with connection:
+                yield connection
+
+    def update_folder(self, folder: str) -> FolderScan:
+        """Index the `.h5` files of the folder and its subfolders that changed since the last scan."""
+        folder = os.path.abspath(folder)
+        found: Dict[str, Tuple[float, int]] = {}
+        for root, _, filenames in os.walk(folder):
+            for filename in filenames:
+                if filename.endswith(".h5"):
+                    filepath = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(filepath)
+                    except OSError:
+                        continue
+                    found[filepath] = (stat.st_mtime, stat.st_size)
+
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT filepath, mtime, size FROM files WHERE filepath >= ? AND filepath < ?",
+                (folder + os.sep, _prefix_end(folder + os.sep)),
+            )
+            known = {filepath: (mtime, size) for filepath, mtime, size in rows}
+
+        removed = [filepath for filepath in known if filepath not in found]
+        changed = [filepath for filepath, state in found.items() if known.get(filepath) != state]
+        with self._connect() as connection:
+            for filepath in removed:
+                connection.execute("DELETE FROM words WHERE filepath = ?", (filepath,))
+                connection.execute("DELETE FROM files WHERE filepath = ?", (filepath,))
+
+        indexed = 0
+        for filepath in changed:
+            try:
+                words = file_words(filepath)
+            except OSError:  # the file is still being written or is not an hdf5 file
+                continue
+            with self._connect() as connection:
+                connection.execute("DELETE FROM words WHERE filepath = ?", (filepath,))
+                connection.executemany(
+                    "INSERT INTO words VALUES (?, ?, ?)", [(word, filepath, key) for word, key in words]
+                )
+                connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (filepath, *found[filepath]))
+            indexed += 1
+        return FolderScan(indexed, len(removed))
+
+    def search(self, query: str, folder: Optional[str] = None, limit: int = 200) -> List[SearchHit]:
+        """Keys which names or values contain words starting with every word of the query."""
+        words = sorted(split_words(query))
+        if not words:
+            return []
+        condition = " INTERSECT ".join(
+            ["SELECT filepath, key FROM words WHERE word >= ? AND word < ?"] * len(words)
+        )
+        arguments: List[str] = []
+        for word in words:
+            arguments += [word, _prefix_end(word)]
+        if folder is not None:
+            folder = os.path.abspath(folder) + os.sep
+            condition = f"SELECT * FROM ({condition}) WHERE filepath >= ? AND filepath < ?"
+            arguments += [folder, _prefix_end(folder)]
+        with self._connect() as connection:
+            rows = connection.execute(f"{condition} ORDER BY filepath DESC, key LIMIT {int(limit)}", arguments)
+            return [SearchHit(filepath, key) for filepath, key in rows]
@@ -0,0 +1,197 @@
+"""
+Thumbnails and summary statistics of the 2D datasets (maps, spectrograms, ...).
+
+The datasets are read once by blocks of rows and columns to compute a
+block-averaged thumbnail and their min, max, mean and NaN count. The results
+are stored as `.npz` files in a cache folder, named after the file path, its
+mtime and size and the key, so a modified file is summarized again.
+This module should not depend on PyQt.
+"""
+import hashlib
+import os
+import threading
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+import h5py
+import numpy as np
+
+try:
+    from . import h5io
+except ImportError:  # started as a script, e.g. from the pyinstaller bundle
+    import h5io  # type: ignore
+
+# Maximum number of pixels of a thumbnail along each axis
+THUMBNAIL_SIZE = 128
+
+# Number of elements read at once
+CHUNK_SIZE = 2**22
+
+# The oldest summaries are removed once the cache is bigger than this
+MAX_CACHE_BYTES = 256 * 2**20
+
+# Temporary files older than this were left by an interrupted write
+STALE_TEMP_SECONDS = 3600
+
+
+class Summary(NamedTuple):
+    shape: Tuple[int, ...]
+    dtype: str
+    min: float
+    max: float
+    mean: float
+    nan_count: int
+    # Mean of the blocks of the dataset, at most THUMBNAIL_SIZE x THUMBNAIL_SIZE
+    thumbnail: np.ndarray
+
+    def describe(self) -> str:
+        return f"min: {self.min:.6g}, max: {self.max:.6g}, mean: {self.mean:.6g}, NaN: {self.nan_count}"
+
+
+def is_image(shape: Tuple[int, ...], dtype) -> bool:
+    """Real 2D datasets with too many columns to be plotted as curves."""
+    return len(shape) == 2 and shape[0] > 1 and shape[1] > h5io.MAX_CURVES and np.dtype(dtype).kind in "iufb"
+
+
+def summarize(dataset: h5py.Dataset, chunk_size: int = CHUNK_SIZE) -> Summary:
+    """Read the 2D dataset by blocks of rows and columns to compute its Summary."""
+    rows, columns = dataset.shape
+    bin_rows, bin_columns = -(-rows // THUMBNAIL_SIZE), -(-columns // THUMBNAIL_SIZE)
+    # Blocks hold whole bins: as many columns as fit inside chunk_size, then as many rows
+    chunk_columns = min(max(1, chunk_size // (bin_rows * bin_columns)) * bin_columns, -(-columns // bin_columns) * bin_columns)
+    chunk_rows = max(1, chunk_size // (bin_rows * chunk_columns)) * bin_rows
+
+    sums = np.zeros((-(-rows // bin_rows), -(-columns // bin_columns)))
+    counts = np.zeros_like(sums)
+    low, high, total, count, nan_count = np.inf, -np.inf, 0.0, 0, 0
+    for row in range(0, rows, chunk_rows):
+        for column in range(0, columns, chunk_columns):
+            values = dataset[row : row + chunk_rows, column : column + chunk_columns].astype(np.float64, copy=False)
+            finite = np.isfinite(values)
+            nan_count += int(np.isnan(values).sum())
+            if finite.any():
+                low = min(low, float(values[finite].min()))
+                high = max(high, float(values[finite].max()))
+                total += float(values[finite].sum())
+                count += int(finite.sum())
+
+            # Sum of the finite values of each bin, padding the block up to whole bins
+            padded_rows = -(-values.shape[0] // bin_rows) * bin_rows
+            padded_columns = -(-values.shape[1] // bin_columns) * bin_columns
+            blocks = np.zeros((padded_rows, padded_columns))
+            weights = np.zeros((padded_rows, padded_columns))
+            blocks[: values.shape[0], : values.shape[1]] = np.where(finite, values, 0)
+            weights[: values.shape[0], : values.shape[1]] = finite
+            shape = (padded_rows // bin_rows, bin_rows, padded_columns // bin_columns, bin_columns)
+            first_row, first_column = row // bin_rows, column // bin_columns
+            bins = (slice(first_row, first_row + shape[0]), slice(first_column, first_column + shape[2]))
+            sums[bins] += blocks.reshape(shape).sum(axis=(1, 3))
+            counts[bins] += weights.reshape(shape).sum(axis=(1, 3))
+
+    with np.errstate(invalid="ignore"):
+        thumbnail = (sums / counts).astype(np.float32)
+    return Summary(
+        shape=dataset.shape,
+        dtype=str(dataset.dtype),
+        min=low if count else np.nan,
+        max=high if count else np.nan,
+        mean=total / count if count else np.nan,
+        nan_count=nan_count,
+        thumbnail=thumbnail,
+    )
+
+
+class ThumbnailCache:
+    """Summaries of the 2D datasets stored in the folder `path`. Can be used from several threads."""
+
+    def __init__(self, path: str, max_bytes: int = MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def _cache_path(self, filepath: str, key: str) -> str:
+        filepath = os.path.abspath(h5io.h5_filepath(filepath))
+        stat = os.stat(filepath)
+        name = f"{filepath}\0{stat.st_mtime}\0{stat.st_size}\0{key}"
+        return os.path.join(self.path, hashlib.blake2b(name.encode(), digest_size=16).hexdigest() + ".npz")
+
+    def get(self, filepath: str, key: str) -> Optional[Summary]:
+        """Cached summary of the dataset, None if it isn't computed yet."""
+        try:
+            with np.load(self._cache_path(filepath, key)) as cached:
+                stats = cached["stats"]
+                return Summary(
+                    shape=tuple(int(i) for i in cached["shape"]),
+                    dtype=str(cached["dtype"]),
+                    min=float(stats[0]),
+                    max=float(stats[1]),
+                    mean=float(stats[2]),
+                    nan_count=int(stats[3]),
+                    thumbnail=cached["thumbnail"],
+                )
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, filepath: str, key: str, summary: Summary):
+        path = self._cache_path(filepath, key)
+        # Not a .npz name, so prune() doesn't count it as a summary
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            np.savez(
+                file,
+                shape=np.array(summary.shape),
+                dtype=np.array(summary.dtype),
+                stats=np.array([summary.min, summary.max, summary.mean, summary.nan_count]),
+                thumbnail=summary.thumbnail,
+            )
+        os.replace(temp_path, path)
+
+    def summary(self, filepath: str, key: str) -> Summary:
+        """Summary of the dataset, computed and cached if needed."""
+        summary = self.get(filepath, key)
+        if summary is None:
+            with h5io.HANDLES.open(filepath) as file:
+                summary = summarize(file[key])
+            self.put(filepath, key, summary)
+        return summary
+
+    def summarize_file(self, filepath: str) -> int:
+        """Compute the missing summaries of the 2D datasets of the file. Return the number computed."""
+        keys: List[str] = []
+
+        def visit(name: str, item):
+            if isinstance(item, h5py.Dataset) and is_image(item.shape, item.dtype):
+                keys.append(name)
+
+        with h5io.HANDLES.open(filepath) as file:
+            file.visititems(visit)
+        missing = [key for key in keys if self.get(filepath, key) is None]
+        for key in missing:
+            self.summary(filepath, key)
+        if missing:
+            self.prune()
+        return len(missing)
+
+    def prune(self):
+        """Remove the oldest summaries while the cache is bigger than max_bytes, and the stale temporary files."""
+        entries = []
+        now = time.time()
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".tmp"):
+                try:
+                    if now - entry.stat().st_mtime > STALE_TEMP_SECONDS:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+            elif entry.name.endswith(".npz"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
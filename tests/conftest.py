@@ -0,0 +1,22 @@
+import os
+import sys
+
+import h5py
+import numpy as np
+import pytest
+
+# The modules are tested from the source tree, without PyQt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+@pytest.fixture
+def h5_file(tmp_path):
+    """File with a group, numeric, string, vlen and scalar datasets."""
+    filepath = str(tmp_path / "data.h5")
+    with h5py.File(filepath, "w") as file:
+        file["numbers"] = np.arange(12, dtype=np.float64).reshape(3, 4)
+        file["fit/params"] = np.array([1.0, 2.0, 3.0])
+        file["fit/model"] = "linear fit"
+        file["names"] = np.array([b"alpha", b"beta", b"gamma"], dtype="S6")
+        file.create_dataset("ragged", data=["a", "bb", "ccc"], dtype=h5py.string_dtype())
+    return filepath
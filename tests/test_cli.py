@@ -0,0 +1,63 @@
+import h5py
+import numpy as np
+import pytest
+
+from h5viewer import cli
+
+
+def test_ls(h5_file, tmp_path, capsys):
+    assert cli.main(["ls", h5_file]) == 0
+    assert "numbers" in capsys.readouterr().out
+    assert cli.main(["ls", h5_file, str(tmp_path / "missing.h5")]) == 1
+
+
+def test_cat(h5_file, capsys):
+    assert cli.main(["cat", h5_file, "fit/model"]) == 0
+    assert "linear fit" in capsys.readouterr().out
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(["cat", h5_file, "missing"])
+    assert exit_info.value.code == 2
+
+
+def test_diff(h5_file, tmp_path):
+    other = str(tmp_path / "other.h5")
+    with h5py.File(other, "w") as file:
+        file["numbers"] = np.zeros((3, 4))
+    assert cli.main(["diff", h5_file, h5_file, "-j", "1"]) == 0
+    assert cli.main(["diff", h5_file, other, "-j", "1"]) == 1
+    assert cli.main(["diff", h5_file, h5_file, "numbers"]) == 0
+    assert cli.main(["diff", h5_file, other, "numbers"]) == 1
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(["diff", h5_file, other, "names"])
+    assert exit_info.value.code == 2
+
+
+def test_export(h5_file, tmp_path):
+    output = str(tmp_path / "numbers.npy")
+    assert cli.main(["export", h5_file, "numbers", "-o", output]) == 0
+    np.testing.assert_array_equal(np.load(output), np.arange(12.0).reshape(3, 4))
+
+    output = str(tmp_path / "all.npz")
+    assert cli.main(["export", h5_file, "-o", output]) == 0
+    with np.load(output, allow_pickle=True) as archive, h5py.File(h5_file, "r") as file:
+        for name in ("numbers", "fit/params", "names"):
+            np.testing.assert_array_equal(archive[name], file[name][()])
+
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(["export", h5_file, "ragged", "-o", str(tmp_path / "ragged.npy")])
+    assert exit_info.value.code == 2
+
+
+@pytest.mark.parametrize("argv", [["--help"], ["-h"], ["ls", "--help"]])
+def test_help(argv, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(argv)
+    assert exit_info.value.code == 0
+    assert "usage: h5viewer" in capsys.readouterr().out
+
+
+def test_is_command():
+    assert cli.is_command(["ls", "file.h5"])
+    assert cli.is_command(["--help"])
+    assert not cli.is_command([])
+    assert not cli.is_command(["file.h5"])
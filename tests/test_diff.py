@@ -0,0 +1,122 @@
+import random
+
+import h5py
+import numpy as np
+import pytest
+
+from h5viewer import diff
+
+
+def lcs_length(a, b) -> int:
+    """Length of the longest common subsequence, by dynamic programming."""
+    previous = [0] * (len(b) + 1)
+    for line in a:
+        current = [0]
+        for j, other in enumerate(b):
+            current.append(previous[j] + 1 if line == other else max(previous[j + 1], current[j]))
+        previous = current
+    return previous[-1]
+
+
+def apply_opcodes(a, b, opcodes):
+    """Rebuild `b` from `a`, checking that the opcodes are contiguous and that equal lines are equal."""
+    result = []
+    i = j = 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        assert (i1, j1) == (i, j)
+        if tag == "equal":
+            assert a[i1:i2] == b[j1:j2]
+            result += a[i1:i2]
+        else:
+            result += b[j1:j2]
+        i, j = i2, j2
+    assert (i, j) == (len(a), len(b))
+    return result
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_myers_opcodes_are_minimal(seed):
+    generator = random.Random(seed)
+    a = [generator.choice("abcd") for _ in range(generator.randrange(30))]
+    b = [generator.choice("abcd") for _ in range(generator.randrange(30))]
+    opcodes = diff.myers_opcodes(a, b)
+    assert apply_opcodes(a, b, opcodes) == b
+    assert sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == "equal") == lcs_length(a, b)
+
+
+def test_myers_opcodes_stop_at_the_cost():
+    generator = random.Random(0)
+    a = [str(generator.randrange(100)) for _ in range(300)]
+    b = [str(generator.randrange(100)) for _ in range(300)]
+    opcodes = diff.myers_opcodes(a, b, max_cost=10)
+    assert apply_opcodes(a, b, opcodes) == b
+    assert any(tag == "replace" for tag, *_ in opcodes)
+
+
+def test_compare_text_hunks():
+    lines_a = [str(i) for i in range(20)]
+    lines_b = lines_a[:5] + ["changed"] + lines_a[6:]
+    difference = diff.compare_text("\n".join(lines_a), "\n".join(lines_b), context=2)
+    assert difference.hunks == [[("equal", 3, 5, 3, 5), ("replace", 5, 6, 5, 6), ("equal", 6, 8, 6, 8)]]
+    assert diff.compare_text("same\ntext", "same\ntext").hunks == []
+
+
+@pytest.mark.parametrize(
+    "values, dtype",
+    [
+        (np.arange(1000, dtype=np.int64), None),
+        (np.array([b"value%d" % (i % 10) for i in range(1000)], dtype="S6"), None),
+        (np.array(["x" * (i % 7) for i in range(1000)], dtype=object), h5py.string_dtype()),
+    ],
+)
+def test_dataset_checksum_sees_the_middle(tmp_path, values, dtype):
+    changed = values.copy()
+    changed[500] = changed[501]
+    with h5py.File(tmp_path / "checksum.h5", "w") as file:
+        file.create_dataset("a", data=values, dtype=dtype)
+        file.create_dataset("b", data=changed, dtype=dtype)
+        file.create_dataset("c", data=values, dtype=dtype)
+        checksums = [diff.dataset_checksum(file[key], chunk_size=64) for key in "abc"]
+    assert checksums[0] != checksums[1]
+    assert checksums[0] == checksums[2]
+
+
+def test_compare_files(tmp_path, h5_file):
+    other = str(tmp_path / "other.h5")
+    with h5py.File(h5_file, "r") as source, h5py.File(other, "w") as file:
+        for key in ("numbers", "names", "ragged"):
+            source.copy(key, file)
+        file["numbers"][1, 1] = -1
+        file["names"].attrs["unit"] = "none"
+        file["added"] = [1, 2]
+
+    differences = diff.compare_files(other, h5_file, workers=1)
+    assert differences == sorted(
+        [
+            diff.KeyDifference("added", diff.ADDED, "(2,) int64"),
+            diff.KeyDifference("fit", diff.REMOVED, "group"),
+            diff.KeyDifference("fit/model", diff.REMOVED, "() object"),
+            diff.KeyDifference("fit/params", diff.REMOVED, "(3,) float64"),
+            diff.KeyDifference("numbers", diff.CHANGED, "content"),
+        ]
+    )
+    assert diff.compare_files(h5_file, h5_file, workers=1) == []
+
+
+def test_compare_keys(tmp_path, h5_file):
+    other = str(tmp_path / "other.h5")
+    with h5py.File(other, "w") as file:
+        file["numbers"] = np.arange(12, dtype=np.float64).reshape(3, 4) * 2
+        file["fit/model"] = "quadratic fit"
+
+    difference = diff.compare_keys(h5_file, other, "numbers")
+    assert isinstance(difference, diff.ArrayDifference)
+    assert difference.changed == 11
+    assert difference.max_deviation == 11
+
+    difference = diff.compare_keys(h5_file, other, "fit/model")
+    assert isinstance(difference, diff.TextDifference)
+    assert difference.lines_a == ["linear fit"] and difference.lines_b == ["quadratic fit"]
+
+    with pytest.raises(KeyError):
+        diff.compare_keys(h5_file, other, "names")
@@ -0,0 +1,82 @@
+import os
+
+import h5py
+import numpy as np
+import pytest
+
+from h5viewer import h5io
+
+
+@pytest.mark.parametrize(
+    "shape, page_size",
+    [((10,), 3), ((7, 5), 10), ((4, 3, 50), 20), ((2, 3, 4, 5), 7), ((1000,), 1000), ((3, 2), 100)],
+)
+def test_pages_cover_the_dataset(tmp_path, shape, page_size):
+    values = np.arange(int(np.prod(shape))).reshape(shape)
+    filepath = str(tmp_path / "pages.h5")
+    with h5py.File(filepath, "w") as file:
+        file["values"] = values
+
+    first = h5io.read_preview(filepath, "values", 0, page_size)
+    seen = np.zeros(shape, dtype=int)
+    for page in range(first.page_count):
+        preview = h5io.read_preview(filepath, "values", page, page_size)
+        assert preview.page == page
+        assert preview.values.size <= max(page_size, shape[-1])
+        region = preview.index + (slice(preview.start, preview.stop),)
+        np.testing.assert_array_equal(preview.values, values[region])
+        seen[region] += 1
+    assert (seen == 1).all()
+
+    last = h5io.read_preview(filepath, "values", -1, page_size)
+    assert last.page == first.page_count - 1
+    h5io.HANDLES.close_all()
+
+
+def test_empty_dataset_has_one_page(tmp_path):
+    filepath = str(tmp_path / "empty.h5")
+    with h5py.File(filepath, "w") as file:
+        file["values"] = np.zeros((0, 3))
+    preview = h5io.read_preview(filepath, "values")
+    assert (preview.page_count, preview.start, preview.stop) == (1, 0, 0)
+    h5io.HANDLES.close_all()
+
+
+def test_read_key(h5_file):
+    h5io.VALUE_CACHE.clear()
+    np.testing.assert_array_equal(h5io.read_key(h5_file, "fit/params"), [1.0, 2.0, 3.0])
+    preview = h5io.read_key(h5_file, "numbers", max_size=5)
+    assert isinstance(preview, h5io.ArrayPreview)
+    assert preview.values.size <= 5
+    info = h5io.read_key(h5_file, "numbers", tables=True)
+    assert info == h5io.DatasetInfo(key="numbers", shape=(3, 4), dtype="float64")
+    assert set(h5io.read_key(h5_file, "fit")) == {"params", "model"}
+    with pytest.raises(KeyError):
+        h5io.read_key(h5_file, "missing")
+    h5io.HANDLES.close_all()
+
+
+def test_handle_pool_reopens_modified_files(tmp_path):
+    pool = h5io.HandlePool(max_handles=2, max_idle=0)
+    filepaths = [str(tmp_path / f"{i}.h5") for i in range(3)]
+    for i, filepath in enumerate(filepaths):
+        with h5py.File(filepath, "w") as file:
+            file["value"] = i
+
+    for i, filepath in enumerate(filepaths):
+        with pool.open(filepath) as file:
+            assert file["value"][()] == i
+    assert pool.stats() == "2/2 files open"
+
+    with pool.open(filepaths[0]) as file:
+        first = file
+    # Written again while it is open, as by the acquisition of a new file with the same name
+    with h5py.File(str(tmp_path / "new.h5"), "w") as file:
+        file["value"] = 10
+    os.replace(str(tmp_path / "new.h5"), filepaths[0])
+    with pool.open(filepaths[0]) as file:
+        assert file is not first
+        assert file["value"][()] == 10
+
+    pool.close_idle()
+    assert pool.stats() == "0/2 files open"
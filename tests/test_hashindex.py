@@ -0,0 +1,44 @@
+import os
+import sqlite3
+
+import h5py
+
+from h5viewer import diff, hashindex
+
+
+def test_checksums_are_stored(tmp_path, h5_file, monkeypatch):
+    index = hashindex.HashIndex(str(tmp_path / "index.sqlite"))
+    assert index.describe(h5_file) == diff.describe_file(h5_file)
+    assert index.index_file(h5_file, workers=1) == 5
+    expected = diff.hash_files({h5_file: ["numbers", "names"]}, workers=1)[h5_file]
+
+    def fail(*args):
+        raise AssertionError("the file should not be read")
+
+    monkeypatch.setattr(diff, "hash_files", fail)
+    assert index.checksums(h5_file, ["numbers", "names"]) == expected
+    assert index.index_file(h5_file, workers=1) == 0
+
+
+def test_checksums_of_modified_files(tmp_path, h5_file):
+    index = hashindex.HashIndex(str(tmp_path / "index.sqlite"))
+    before = index.checksums(h5_file, ["numbers"], workers=1)
+    with h5py.File(h5_file, "a") as file:
+        file["numbers"][0, 0] = 100
+    os.utime(h5_file, (1, 1))
+    after = index.checksums(h5_file, ["numbers"], workers=1)
+    assert before != after
+    assert after == diff.hash_files({h5_file: ["numbers"]}, workers=1)[h5_file]
+
+
+def test_checksums_of_another_version_are_cleared(tmp_path, h5_file):
+    path = str(tmp_path / "index.sqlite")
+    hashindex.HashIndex(path).index_file(h5_file, workers=1)
+    with sqlite3.connect(path) as connection:
+        connection.execute(f"PRAGMA user_version = {hashindex.CHECKSUM_VERSION - 1}")
+
+    index = hashindex.HashIndex(path)
+    with sqlite3.connect(path) as connection:
+        (count,) = connection.execute("SELECT COUNT(*) FROM datasets WHERE checksum IS NOT NULL").fetchone()
+    assert count == 0
+    assert index.index_file(h5_file, workers=1) == 5
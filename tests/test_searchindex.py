@@ -0,0 +1,34 @@
+import os
+
+import h5py
+
+from h5viewer import searchindex
+
+
+def test_split_words():
+    assert searchindex.split_words("Fit_params, T=4K") == searchindex.split_words("fit_params t 4k")
+
+
+def test_file_words(h5_file):
+    words = searchindex.file_words(h5_file)
+    assert ("linear", "fit/model") in words
+    assert ("params", "fit/params") in words or ("fit", "fit/params") in words
+
+
+def test_search(tmp_path, h5_file):
+    index = searchindex.SearchIndex(str(tmp_path / "search.sqlite"))
+    assert index.update_folder(str(tmp_path)) == searchindex.FolderScan(indexed=1, removed=0)
+    assert index.update_folder(str(tmp_path)) == searchindex.FolderScan(indexed=0, removed=0)
+
+    filepath = os.path.abspath(h5_file)
+    assert index.search("LIN") == [searchindex.SearchHit(filepath, "fit/model")]
+    assert index.search("linear fit") == [searchindex.SearchHit(filepath, "fit/model")]
+    assert index.search("linear numbers") == []
+    assert index.search("linear", folder=str(tmp_path / "other")) == []
+    assert index.search("") == []
+
+    with h5py.File(tmp_path / "sub.h5", "w") as file:
+        file["sample"] = "linear"
+    os.remove(h5_file)
+    assert index.update_folder(str(tmp_path)) == searchindex.FolderScan(indexed=1, removed=1)
+    assert index.search("linear") == [searchindex.SearchHit(str(tmp_path / "sub.h5"), "sample")]
@@ -0,0 +1,73 @@
+import os
+import time
+
+import h5py
+import numpy as np
+import pytest
+
+from h5viewer import thumbnails
+
+
+def nanmean_bins(values: np.ndarray) -> np.ndarray:
+    """Reference thumbnail: the nanmean of each bin."""
+    bin_rows = -(-values.shape[0] // thumbnails.THUMBNAIL_SIZE)
+    bin_columns = -(-values.shape[1] // thumbnails.THUMBNAIL_SIZE)
+    thumbnail = np.full((-(-values.shape[0] // bin_rows), -(-values.shape[1] // bin_columns)), np.nan)
+    for i in range(thumbnail.shape[0]):
+        for j in range(thumbnail.shape[1]):
+            block = values[i * bin_rows : (i + 1) * bin_rows, j * bin_columns : (j + 1) * bin_columns]
+            if np.isfinite(block).any():
+                thumbnail[i, j] = np.mean(block[np.isfinite(block)])
+    return thumbnail
+
+
+@pytest.mark.parametrize("shape", [(300, 500), (129, 257), (50, 20)])
+@pytest.mark.parametrize("chunk_size", [1, 1000, 2**22])
+def test_summarize(tmp_path, shape, chunk_size):
+    values = np.random.default_rng(0).normal(size=shape)
+    values[values > 2] = np.nan
+    values[:3, :] = np.inf
+    with h5py.File(tmp_path / "image.h5", "w") as file:
+        file["image"] = values
+        summary = thumbnails.summarize(file["image"], chunk_size)
+
+    finite = values[np.isfinite(values)]
+    assert summary.shape == shape
+    assert summary.nan_count == np.isnan(values).sum()
+    assert summary.min == pytest.approx(finite.min())
+    assert summary.max == pytest.approx(finite.max())
+    assert summary.mean == pytest.approx(finite.mean())
+    np.testing.assert_allclose(summary.thumbnail, nanmean_bins(values), rtol=1e-5)
+
+
+def test_cache(tmp_path):
+    filepath = str(tmp_path / "image.h5")
+    with h5py.File(filepath, "w") as file:
+        file["image"] = np.arange(200.0).reshape(10, 20)
+        file["curves"] = np.zeros((10, 2))
+    cache = thumbnails.ThumbnailCache(str(tmp_path / "cache"))
+    assert cache.get(filepath, "image") is None
+    assert cache.summarize_file(filepath) == 1
+    assert cache.summarize_file(filepath) == 0
+    summary = cache.get(filepath, "image")
+    assert summary.describe() == "min: 0, max: 199, mean: 99.5, NaN: 0"
+    np.testing.assert_array_equal(summary.thumbnail, np.arange(200.0).reshape(10, 20))
+    assert [name for name in os.listdir(cache.path) if not name.endswith(".npz")] == []
+
+
+def test_prune(tmp_path):
+    cache = thumbnails.ThumbnailCache(str(tmp_path / "cache"), max_bytes=2500)
+    old = time.time() - 2 * thumbnails.STALE_TEMP_SECONDS
+    for i in range(4):
+        path = os.path.join(cache.path, f"{i}.npz")
+        with open(path, "wb") as file:
+            file.write(b"0" * 1000)
+        os.utime(path, (old + i, old + i))
+    for name, mtime in (("stale.npz.1.tmp", old), ("fresh.npz.1.tmp", time.time())):
+        path = os.path.join(cache.path, name)
+        with open(path, "wb") as file:
+            file.write(b"0" * 1000)
+        os.utime(path, (mtime, mtime))
+
+    cache.prune()
+    assert sorted(os.listdir(cache.path)) == ["2.npz", "3.npz", "fresh.npz.1.tmp"]